@@ -2,21 +2,60 @@
 渗透测试工具调用框架
 类似 Dawn Launcher 风格的工具管理器
 """
+import time
+_STARTUP_T0 = time.perf_counter()  # 启动计时起点，必须在其他导入之前
+
 import sys
+import csv
+import functools
+import argparse
+import asyncio
+import base64
+import concurrent.futures
 import json
+import logging
+import logging.handlers
 import subprocess
 import os
 import ctypes
+import hashlib
+import hmac
+import io
+import ipaddress
+import itertools
+import heapq
+import http.server
+import math
+import mmap
+import queue
+import re
+import secrets
+import shlex
+import shutil
+import signal
+import sqlite3
+import threading
+import urllib.parse
+import uuid
+import zipfile
+from array import array
+from bisect import bisect_left
+from xml.etree import ElementTree
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timedelta, time as dt_time
 from pathlib import Path
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QListWidget, QListWidgetItem, QPushButton, QLineEdit, QLabel,
     QTextEdit, QCheckBox, QDialog, QFormLayout, QComboBox,
     QMessageBox, QSplitter, QFrame, QScrollArea, QGridLayout,
-    QMenu, QAction, QInputDialog, QGroupBox, QTabWidget, QSizePolicy
+    QMenu, QAction, QInputDialog, QGroupBox, QTabWidget, QSizePolicy,
+    QFileDialog, QTableWidget, QTableWidgetItem, QHeaderView, QSpinBox
 )
-from PyQt5.QtCore import Qt, QSize, QMimeData, pyqtSignal
-from PyQt5.QtGui import QFont, QIcon, QColor, QPalette, QDrag, QPixmap
+from PyQt5.QtCore import (Qt, QObject, QSize, QRect, QMimeData, QTimer, QDir, QLockFile, QBuffer, QIODevice,
+                          pyqtSignal)
+from PyQt5.QtGui import QFont, QIcon, QColor, QPalette, QDrag, QPixmap, QTextCursor, QImage, QPainter
+from PyQt5.QtNetwork import QAbstractSocket, QLocalServer, QLocalSocket, QTcpSocket
 
 
 CONFIG_FILE = "tools_config.json"
@@ -28,16 +67,3656 @@ def resource_path(relative_path):
     return os.path.join(os.path.abspath("."), relative_path)
 
 
-class AddToolDialog(QDialog):
-    """添加/编辑工具对话框"""
-    def __init__(self, parent=None, categories=None, tool_data=None):
+class StartupProfiler:
+    """记录启动各阶段耗时，配合 --startup-report 输出"""
+    def __init__(self, start):
+        self.start = start
+        self.last = start
+        self.phases = []  # [(阶段名称, 耗时秒数), ...]
+
+    def mark(self, name):
+        """结束当前阶段，耗时从上一次 mark 开始计算"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        lines = ["启动阶段耗时:"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<12}{seconds * 1000:9.1f} ms")
+        lines.append(f"  {'总计':<12}{(self.last - self.start) * 1000:9.1f} ms")
+        return "\n".join(lines)
+
+
+STARTUP = StartupProfiler(_STARTUP_T0)
+
+
+class MetricsRegistry:
+    """进程内的计数器、仪表和直方图，按 Prometheus 文本格式导出
+
+    每个指标先用 describe 声明类型；同名指标按标签区分。gauge 也可以登记为取值函数，
+    在导出时读取。各方法可以在任意线程调用。
+    """
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.meta = {}  # {名称: (类型, 说明, 桶)}
+        self.values = {}  # {名称: {标签元组: 值}}，直方图的值为 [各桶计数..., 总和, 总数]
+        self.functions = {}  # {名称: 返回当前值的函数}
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self.meta[name] = (kind, help_text, tuple(buckets or self.DEFAULT_BUCKETS) if kind == "histogram" else ())
+        self.values.setdefault(name, {})
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.values[name]
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.values[name][tuple(sorted(labels.items()))] = value
+
+    def set_function(self, name, function):
+        self.functions[name] = function
+
+    def observe(self, name, value, **labels):
+        buckets = self.meta[name][2]
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self.values[name]
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * len(buckets) + [0.0, 0]
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def timed(self, name, **labels):
+        """装饰器：把函数每次调用的耗时记入直方图"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, **labels)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _labels(key, extra=()):
+        pairs = list(key) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        """Prometheus 文本格式"""
+        for name, function in self.functions.items():
+            try:
+                self.set(name, function())
+            except Exception as e:
+                print(f"读取指标 {name} 失败: {e}")
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in self.meta.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(self.values[name].items()):
+                    if kind != "histogram":
+                        lines.append(f"{name}{self._labels(key)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets, value):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_bucket{self._labels(key, [('le', '+Inf')])} {value[-1]}")
+                    lines.append(f"{name}_sum{self._labels(key)} {value[-2]}")
+                    lines.append(f"{name}_count{self._labels(key)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+METRICS.describe("stars_falling_jobs_submitted_total", "counter", "提交到任务队列的任务数")
+METRICS.describe("stars_falling_jobs_finished_total", "counter", "结束的任务数（按工具和结束状态）")
+METRICS.describe("stars_falling_jobs_queued", "gauge", "排队中的任务数")
+METRICS.describe("stars_falling_jobs_running", "gauge", "运行中的任务数（含工作节点）")
+METRICS.describe("stars_falling_job_spawn_seconds", "histogram", "启动任务进程的耗时（远程为发出任务到节点确认启动）")
+METRICS.describe("stars_falling_job_duration_seconds", "histogram", "任务运行时长（按工具）")
+METRICS.describe("stars_falling_config_save_seconds", "histogram", "保存配置文件的耗时")
+METRICS.describe("stars_falling_config_bytes", "gauge", "配置文件大小")
+METRICS.describe("stars_falling_ui_refresh_seconds", "histogram", "界面刷新耗时（按视图操作）")
+METRICS.describe("stars_falling_event_loop_lag_seconds", "histogram", "Qt 事件循环的调度延迟",
+                 buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+METRICS.describe("stars_falling_ui_stalls_total", "counter", "超过卡顿阈值的界面卡顿次数")
+
+
+TOOL_FIELDS = ("id", "name", "category", "subcategory", "path", "command", "startdir", "description")
+# 在大量工具之间高度重复的字段，加载时驻留（intern）以共享同一个字符串对象
+INTERNED_FIELDS = frozenset(("category", "subcategory", "path", "startdir"))
+
+
+def new_tool_id():
+    """生成工具的稳定标识，运行历史等数据按此关联工具"""
+    return uuid.uuid4().hex[:12]
+
+
+class ToolRecord:
+    """紧凑的工具记录
+
+    使用 __slots__ 代替 dict 存储，分类、子分类等重复字段驻留共享。
+    提供 get / [] / copy 等与 dict 相同的接口，序列化格式与原 JSON 配置一致，
+    未知字段保存在 extra 中原样写回。
+    """
+    __slots__ = TOOL_FIELDS + ("extra",)
+
+    def __init__(self, data=None):
+        for field in TOOL_FIELDS:
+            object.__setattr__(self, field, "")
+        self.extra = None
+        if data:
+            self.update(data)
+        if not self.id:
+            self.id = new_tool_id()
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        return cls(data)
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in TOOL_FIELDS}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def get(self, key, default=None):
+        if key in TOOL_FIELDS:
+            return getattr(self, key)
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        if key in TOOL_FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in TOOL_FIELDS:
+            if value is None:
+                value = ""
+            if key in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in TOOL_FIELDS or bool(self.extra and key in self.extra)
+
+    def keys(self):
+        return list(TOOL_FIELDS) + list(self.extra or ())
+
+    def items(self):
+        for field in TOOL_FIELDS:
+            yield field, getattr(self, field)
+        if self.extra:
+            yield from self.extra.items()
+
+    def update(self, other):
+        items = other.items() if hasattr(other, "items") else other
+        for key, value in items:
+            self[key] = value
+
+    def clear(self):
+        for field in TOOL_FIELDS:
+            setattr(self, field, "")
+        self.extra = None
+
+    def duplicate(self):
+        """复制为一个新工具（分配新的 id）"""
+        new = self.copy()
+        new.id = new_tool_id()
+        return new
+
+    def copy(self):
+        # 字段全部是不可变字符串，复制时直接共享引用（包括 id）
+        new = ToolRecord.__new__(ToolRecord)
+        for field in TOOL_FIELDS:
+            setattr(new, field, getattr(self, field))
+        new.extra = dict(self.extra) if self.extra else None
+        return new
+
+    def __repr__(self):
+        return f"ToolRecord({self.name!r}, category={self.category!r})"
+
+
+TAG_SPLIT_RE = re.compile(r"[,，;；\s]+")
+
+
+def normalize_tags(value):
+    """把逗号/空格分隔的字符串或列表整理为去重、保持顺序的标签列表"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = TAG_SPLIT_RE.split(value)
+    return list(dict.fromkeys(sys.intern(str(tag).strip().lstrip("#")) for tag in value
+                              if str(tag).strip().lstrip("#")))
+
+
+class TagIndex:
+    """标签 → 工具位图索引
+
+    工具按在列表中的位置编号，每个标签对应一个整数位图（第 n 位为 1 表示第 n 个工具带有该标签），
+    任意 AND / OR 标签组合都只是整数之间的按位运算，结果按工具列表原有顺序取回。
+    工具列表变化后调用 invalidate()，下次查询前由 ensure() 重建。
+    """
+
+    def __init__(self):
+        self.tools = []  # 位号 → 工具
+        self.masks = {}  # {标签: 位图}
+        self.stale = True
+
+    def invalidate(self):
+        self.stale = True
+
+    def ensure(self, tools):
+        if self.stale:
+            self.rebuild(tools)
+
+    def rebuild(self, tools):
+        self.tools = list(tools)
+        size = (len(self.tools) + 7) // 8
+        buffers = {}  # 先按字节置位，最后一次性转换为整数，避免反复创建大整数
+        for bit, tool in enumerate(self.tools):
+            for tag in tool.get("tags") or ():
+                buffer = buffers.get(tag)
+                if buffer is None:
+                    buffer = buffers[tag] = bytearray(size)
+                buffer[bit >> 3] |= 1 << (bit & 7)
+        self.masks = {tag: int.from_bytes(buffer, "little") for tag, buffer in sorted(buffers.items())}
+        self.stale = False
+
+    def count(self, tag):
+        return bin(self.masks.get(tag, 0)).count("1")
+
+    def query(self, tags, mode="or"):
+        """返回带有任一（mode="or"）或全部（mode="and"）标签的工具位图"""
+        masks = [self.masks.get(tag, 0) for tag in tags]
+        if not masks:
+            return (1 << len(self.tools)) - 1
+        result = masks[0]
+        for mask in masks[1:]:
+            result = result & mask if mode == "and" else result | mask
+        return result
+
+    def members(self, mask):
+        """位图 → 工具列表（保持工具列表中的顺序）"""
+        tools = self.tools
+        return [tools[bit] for bit, flag in enumerate(bin(mask)[:1:-1]) if flag == "1"]
+
+
+class SelectionModel(QObject):
+    """按工具 id 保存的选中状态
+
+    与卡片控件分离：切换分类、编辑、拖拽等重新渲染卡片时选中状态不变，不在当前视图中的工具也保持选中。
+    ids 是按选中顺序排列的 dict，切换单个工具和获取选中数量都是 O(1)。
+    """
+    changed = pyqtSignal(int)  # 选中数量
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, tool_id):
+        return tool_id in self.ids
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def set_selected(self, tool_id, selected):
+        if selected:
+            self.ids[tool_id] = None
+        else:
+            self.ids.pop(tool_id, None)
+        self.changed.emit(len(self.ids))
+
+    def toggle(self, tool_id):
+        """切换选中状态，返回切换后是否选中"""
+        self.set_selected(tool_id, tool_id not in self.ids)
+        return tool_id in self.ids
+
+    def update(self, tool_ids, selected=True):
+        for tool_id in tool_ids:
+            if selected:
+                self.ids[tool_id] = None
+            else:
+                self.ids.pop(tool_id, None)
+        self.changed.emit(len(self.ids))
+
+    def replace(self, tool_ids):
+        self.ids = dict.fromkeys(tool_ids)
+        self.changed.emit(len(self.ids))
+
+    def clear(self):
+        self.replace(())
+
+    def retain(self, valid_ids):
+        """去掉已删除工具的 id"""
+        stale = [tool_id for tool_id in self.ids if tool_id not in valid_ids]
+        if stale:
+            self.update(stale, False)
+
+
+def benchmark_tool_memory(count=50000):
+    """对比 dict 与 ToolRecord 加载同一份配置时每个工具占用的内存"""
+    import tracemalloc
+
+    payload = json.dumps({"tools": [
+        {
+            "id": f"{i:012x}",
+            "name": f"tool-{i}",
+            "category": f"分类{i % 12}",
+            "subcategory": f"子分类{i % 5}" if i % 3 else "",
+            "path": "C:\\Tools\\cmder\\Cmder.exe",
+            "command": f"scan -t {{url}} --profile {i}",
+            "startdir": f"D:\\pentest\\tools\\set{i % 20}",
+            "description": "",
+        }
+        for i in range(count)
+    ]}, ensure_ascii=False)
+
+    results = {}
+    for label, factory in (("dict", None), ("ToolRecord", ToolRecord.from_dict)):
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        tools = json.loads(payload)["tools"]
+        if factory:
+            tools = [factory(t) for t in tools]
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[label] = (current - base) / count
+        del tools
+
+    print(f"工具数量: {count}")
+    for label, per_tool in results.items():
+        print(f"{label:>10}: {per_tool:8.1f} 字节/工具")
+    print(f"{'节省':>10}: {1 - results['ToolRecord'] / results['dict']:8.1%}")
+    return results
+
+
+NEXT_OBJECT_RE = re.compile(r",\s*\{")
+
+
+class CatalogImporter:
+    """工具目录批量导入器
+
+    支持 JSON（数组或配置文件格式）、JSON Lines、CSV 和 YAML，
+    流式读取文件并分批校验，按 名称+分类+命令 去重。
+    """
+    BATCH_SIZE = 500
+    CHUNK_SIZE = 64 * 1024
+    MAX_ELEMENT = 1024 * 1024  # 单个数组元素的最大长度，超过时视为格式错误并跳到下一个元素
+    FIELDS = ("name", "category", "subcategory", "path", "command", "startdir", "description")
+
+    def __init__(self, existing_tools=()):
+        self.seen = {self.dedup_key(tool) for tool in existing_tools}
+        self.accepted = []
+        self.rejected = []  # [(行号, 原因), ...]
+        self.duplicates = 0
+        self.rows = 0
+        self.elapsed = 0.0
+
+    @staticmethod
+    def dedup_key(tool):
+        return (
+            str(tool.get("name", "")).strip(),
+            str(tool.get("category", "")).strip(),
+            str(tool.get("command", "")).strip(),
+        )
+
+    def run(self, path):
+        """读取并校验整个文件，结果保存在 accepted / rejected 中"""
+        start = time.perf_counter()
+        batch = []
+        for row in self.iter_rows(path):
+            batch.append(row)
+            if len(batch) >= self.BATCH_SIZE:
+                self.validate_batch(batch)
+                batch = []
+        if batch:
+            self.validate_batch(batch)
+        self.elapsed = time.perf_counter() - start
+        return self.accepted
+
+    def iter_rows(self, path):
+        """按文件类型流式产出 (行号, 原始记录)"""
+        suffix = Path(path).suffix.lower()
+        if suffix == ".csv":
+            return self._iter_csv(path)
+        if suffix in (".jsonl", ".ndjson"):
+            return self._iter_jsonl(path)
+        if suffix in (".yaml", ".yml"):
+            return self._iter_yaml(path)
+        return self._iter_json(path)
+
+    def _iter_csv(self, path):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+    def _iter_jsonl(self, path):
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError as e:
+                    yield line_no, ValueError(f"JSON 格式错误: {e}")
+
+    def _iter_yaml(self, path):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("导入 YAML 需要安装 PyYAML (pip install pyyaml)")
+        with open(path, "r", encoding="utf-8-sig") as f:
+            index = 0
+            for doc in yaml.safe_load_all(f):
+                if isinstance(doc, dict) and isinstance(doc.get("tools"), list):
+                    doc = doc["tools"]
+                for item in (doc if isinstance(doc, list) else [doc]):
+                    index += 1
+                    yield index, item
+
+    def _iter_json(self, path):
+        """增量解析顶层数组，不一次性读入整个文件；配置文件格式（含 tools 字段）则整体加载"""
+        decoder = json.JSONDecoder()
+        with open(path, "r", encoding="utf-8-sig") as f:
+            buf = f.read(self.CHUNK_SIZE)
+            pos = len(buf) - len(buf.lstrip())
+            if buf[pos:pos + 1] != "[":
+                data = json.loads(buf + f.read())
+                items = data.get("tools", []) if isinstance(data, dict) else [data]
+                for index, item in enumerate(items, 1):
+                    yield index, item
+                return
+            pos += 1
+            index = 0
+            eof = False
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n,":
+                    pos += 1
+                if pos >= len(buf) or (not eof and len(buf) - pos < self.CHUNK_SIZE // 4):
+                    more = f.read(self.CHUNK_SIZE)
+                    eof = not more
+                    buf = buf[pos:] + more
+                    pos = 0
+                    if not buf:
+                        return
+                    continue
+                if buf[pos] == "]":
+                    return
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except ValueError as e:
+                    end, resync = self._element_end(buf, pos)
+                    if end is None and not eof and len(buf) - pos < self.MAX_ELEMENT:
+                        # 元素还没读完整
+                        more = f.read(self.CHUNK_SIZE)
+                        eof = not more
+                        buf = buf[pos:] + more
+                        pos = 0
+                        continue
+                    # 只拒绝这一个元素，从它之后继续解析
+                    index += 1
+                    yield index, ValueError(f"JSON 格式错误: {e}")
+                    end = end if end is not None else resync
+                    if end is None:
+                        return
+                    pos = end
+                    continue
+                index += 1
+                yield index, item
+                pos = end
+
+    @staticmethod
+    def _element_end(buf, pos):
+        """从 pos 处的数组元素向后扫描（跳过字符串内容），返回 (元素之后的顶层 , 或 ] 的位置, 重新同步的位置)
+
+        括号不配对时第一个位置为 None，只能从嵌套最浅的 ",{"（最可能是下一个元素的开头）重新同步；
+        都找不到时为 None。
+        """
+        depth = 0
+        in_string = escaped = False
+        resync = None
+        resync_depth = None
+        for i in range(pos, len(buf)):
+            ch = buf[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in "{[":
+                depth += 1
+            elif ch in "}]":
+                depth -= 1
+                if depth < 0:
+                    return i, resync
+            elif ch == ",":
+                if depth == 0:
+                    return i, resync
+                if (resync_depth is None or depth < resync_depth) and NEXT_OBJECT_RE.match(buf, i):
+                    resync, resync_depth = i, depth
+        return None, resync
+
+    def validate_batch(self, batch):
+        """校验一批记录，合格的加入 accepted，不合格的记录原因"""
+        for line_no, raw in batch:
+            self.rows += 1
+            if isinstance(raw, Exception):
+                self.rejected.append((line_no, str(raw)))
+                continue
+            if not isinstance(raw, dict):
+                self.rejected.append((line_no, "记录不是对象"))
+                continue
+            tool = {}
+            error = None
+            for field in self.FIELDS:
+                value = raw.get(field, "")
+                if value is None:
+                    value = ""
+                if isinstance(value, (dict, list)):
+                    error = f"字段 {field} 类型无效"
+                    break
+                tool[field] = str(value).strip()
+            tags = normalize_tags(raw.get("tags"))
+            if tags:
+                tool["tags"] = tags
+            if error is None and not tool["name"]:
+                error = "缺少工具名称"
+            if error is None and not tool["category"]:
+                error = "缺少分类"
+            if error is None and not (tool["path"] or tool["command"]):
+                error = "路径和参数不能同时为空"
+            if error:
+                self.rejected.append((line_no, error))
+                continue
+            key = self.dedup_key(tool)
+            if key in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(key)
+            self.accepted.append(ToolRecord(tool))
+
+    def summary(self):
+        rate = self.rows / self.elapsed if self.elapsed > 0 else float(self.rows)
+        lines = [
+            f"读取 {self.rows} 条，导入 {len(self.accepted)} 条，"
+            f"重复 {self.duplicates} 条，拒绝 {len(self.rejected)} 条",
+            f"耗时 {self.elapsed:.2f} 秒（{rate:.0f} 条/秒）",
+        ]
+        if self.rejected:
+            lines.append("")
+            lines.append("被拒绝的记录：")
+            for line_no, reason in self.rejected[:20]:
+                lines.append(f"  第 {line_no} 条: {reason}")
+            if len(self.rejected) > 20:
+                lines.append(f"  ... 另有 {len(self.rejected) - 20} 条")
+        return "\n".join(lines)
+
+
+HISTORY_DIR = "run_history"
+OUTPUT_DIR = "run_output"
+
+
+def percentile(sorted_values, pct):
+    """最近秩法百分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 60:
+        return f"{seconds:.1f} 秒"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} 分钟"
+    return f"{seconds / 3600:.1f} 小时"
+
+
+class RunHistory:
+    """工具运行历史
+
+    每次运行追加一行紧凑 JSON 到 run_history/runs.jsonl，文件超过
+    MAX_FILE_BYTES 时滚动为 runs.1.jsonl ... runs.N.jsonl，最多保留 KEEP_FILES 个。
+    内存中只按工具保留最近 SAMPLE_SIZE 次的耗时用于统计。
+    """
+    FILE_NAME = "runs.jsonl"
+    MAX_FILE_BYTES = 4 * 1024 * 1024
+    KEEP_FILES = 5
+    SAMPLE_SIZE = 200
+
+    def __init__(self, directory=HISTORY_DIR):
+        self.directory = Path(directory)
+        self.durations = {}  # {tool_id: deque([秒数, ...])}
+        self.runs = {}  # {tool_id: 运行次数}
+        self.failures = {}  # {tool_id: 失败次数}
+        self.names = {}  # {tool_id: 最近一次运行时的工具名}
+        self.last_run = {}  # {tool_id: 最近一次开始时间}
+        self.loaded = False
+
+    def history_files(self):
+        """按时间从旧到新返回所有历史文件"""
+        rolled = [self.directory / f"runs.{i}.jsonl" for i in range(self.KEEP_FILES - 1, 0, -1)]
+        return [p for p in rolled + [self.directory / self.FILE_NAME] if p.exists()]
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def load(self):
+        """从磁盘重建统计数据"""
+        if self.loaded:
+            return
+        self.loaded = True
+        for path in self.history_files():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            self._account(json.loads(line))
+                        except ValueError:
+                            continue  # 崩溃时可能留下半行，忽略
+            except OSError as e:
+                print(f"读取运行历史失败: {e}")
+
+    def _account(self, record):
+        tool_id = record.get("tool")
+        if not tool_id:
+            return
+        if record.get("name"):
+            self.names[tool_id] = record["name"]
+        if record.get("start") is not None:
+            self.last_run[tool_id] = max(self.last_run.get(tool_id, 0), record["start"])
+        if record.get("interactive"):
+            return  # 耗时和退出码取决于用户何时关闭窗口，不计入统计
+        self.runs[tool_id] = self.runs.get(tool_id, 0) + 1
+        if record.get("exit") not in (0, None):
+            self.failures[tool_id] = self.failures.get(tool_id, 0) + 1
+        if record.get("start") is not None and record.get("end") is not None:
+            samples = self.durations.setdefault(tool_id, deque(maxlen=self.SAMPLE_SIZE))
+            samples.append(max(0.0, record["end"] - record["start"]))
+
+    def append(self, record):
+        """追加一条运行记录并更新统计"""
+        self.ensure_loaded()
+        self._account(record)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / self.FILE_NAME
+            if path.exists() and path.stat().st_size >= self.MAX_FILE_BYTES:
+                self._rollover()
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        except OSError as e:
+            print(f"写入运行历史失败: {e}")
+
+    def _rollover(self):
+        oldest = self.directory / f"runs.{self.KEEP_FILES - 1}.jsonl"
+        if oldest.exists():
+            oldest.unlink()
+        for i in range(self.KEEP_FILES - 2, 0, -1):
+            src = self.directory / f"runs.{i}.jsonl"
+            if src.exists():
+                src.replace(self.directory / f"runs.{i + 1}.jsonl")
+        (self.directory / self.FILE_NAME).replace(self.directory / "runs.1.jsonl")
+
+    def iter_records(self):
+        """按时间从旧到新逐条读取运行记录"""
+        for path in self.history_files():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue
+            except OSError as e:
+                print(f"读取运行历史失败: {e}")
+
+    def stats(self, tool_id):
+        """返回 (运行次数, p50, p95, 失败率)"""
+        self.ensure_loaded()
+        samples = sorted(self.durations.get(tool_id, ()))
+        runs = self.runs.get(tool_id, 0)
+        failure_rate = self.failures.get(tool_id, 0) / runs if runs else None
+        return runs, percentile(samples, 50), percentile(samples, 95), failure_rate
+
+    def expected_duration(self, tool_id):
+        """预估耗时（p50），没有历史时返回 None"""
+        self.ensure_loaded()
+        samples = self.durations.get(tool_id)
+        if not samples:
+            return None
+        return percentile(sorted(samples), 50)
+
+
+FINDINGS_DB = "findings.db"
+RESULT_PARSERS = {}  # {解析器名称: 解析器类}
+
+
+def register_result_parser(name):
+    """注册结果解析器的类装饰器，工具的 parser 字段按名称引用"""
+    def decorator(cls):
+        cls.name = name
+        RESULT_PARSERS[name] = cls
+        return cls
+    return decorator
+
+
+def create_result_parser(name):
+    cls = RESULT_PARSERS.get(name or "")
+    return cls() if cls else None
+
+
+def target_host(target):
+    """从目标（URL、host:port 或主机名）中取出主机部分"""
+    target = target.strip()
+    if "://" in target:
+        return urllib.parse.urlsplit(target).hostname or target
+    host = target.split("/", 1)[0]
+    if host.count(":") == 1:
+        host = host.split(":", 1)[0]
+    return host
+
+
+def make_finding(kind, host="", port=None, service="", path="", severity="info", detail=""):
+    return {"kind": kind, "host": host, "port": port, "service": service,
+            "path": path, "severity": severity, "detail": detail}
+
+
+class ResultParser:
+    """流式结果解析器基类
+
+    feed() 接收捕获到的输出块（bytes），返回本块中新解析出的发现；
+    close() 在输出结束时调用，返回剩余的发现。解析器只保留未完成的部分，不缓存整个输出。
+    """
+    name = ""
+
+    def feed(self, chunk):
+        raise NotImplementedError
+
+    def close(self):
+        return []
+
+
+class LineResultParser(ResultParser):
+    """按行解析的解析器基类，子类实现 parse_line()"""
+    def __init__(self):
+        self._pending = b""
+
+    def feed(self, chunk):
+        data = self._pending + chunk
+        lines = data.split(b"\n")
+        self._pending = lines.pop()
+        findings = []
+        for line in lines:
+            findings.extend(self.parse_line(line.decode("utf-8", "replace").rstrip("\r")))
+        return findings
+
+    def close(self):
+        findings = []
+        if self._pending:
+            findings.extend(self.parse_line(self._pending.decode("utf-8", "replace").rstrip("\r")))
+            self._pending = b""
+        return findings
+
+    def parse_line(self, line):
+        raise NotImplementedError
+
+
+@register_result_parser("lines")
+class LinesParser(LineResultParser):
+    """每个非空行作为一个目标（适用于子域名收集等输出主机列表的工具）"""
+    def parse_line(self, line):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            return []
+        return [make_finding("target", host=line.split()[0])]  # 行内其余的列不属于目标
+
+
+@register_result_parser("nmap-xml")
+class NmapXmlParser(ResultParser):
+    """nmap XML 输出（-oX -），每解析完一个 host 元素就产出其开放端口"""
+    def __init__(self):
+        self._parser = ElementTree.XMLPullParser(events=("start", "end"))
+        self._root = None  # nmaprun 元素
+        self._depth = 0
+
+    def feed(self, chunk):
+        self._parser.feed(chunk)
+        return self._drain()
+
+    def close(self):
+        try:
+            self._parser.close()
+        except ElementTree.ParseError:
+            pass  # 扫描被中断时 XML 不完整，已解析的部分仍然有效
+        return self._drain()
+
+    def _drain(self):
+        findings = []
+        try:
+            for event, elem in self._parser.read_events():
+                if event == "start":
+                    if self._root is None:
+                        self._root = elem
+                    self._depth += 1
+                    continue
+                self._depth -= 1
+                if self._depth == 1:
+                    # 根节点的直接子节点（host、taskprogress 等）处理完就从树中摘掉，内存占用与输出大小无关
+                    self._root.remove(elem)
+                if elem.tag != "host":
+                    continue
+                host = ""
+                for address in elem.iter("address"):
+                    if address.get("addrtype") in ("ipv4", "ipv6"):
+                        host = address.get("addr", "")
+                        break
+                hostname = elem.find("hostnames/hostname")
+                for port in elem.iter("port"):
+                    state = port.find("state")
+                    if state is None or state.get("state") != "open":
+                        continue
+                    service = port.find("service")
+                    name = service.get("name", "") if service is not None else ""
+                    detail = " ".join(filter(None, (
+                        service.get("product", "") if service is not None else "",
+                        service.get("version", "") if service is not None else "",
+                        hostname.get("name", "") if hostname is not None else "",
+                    )))
+                    findings.append(make_finding("port", host=host, port=int(port.get("portid", 0)),
+                                                 service=name, detail=detail))
+                elem.clear()
+        except ElementTree.ParseError as e:
+            print(f"nmap XML 解析失败: {e}")
+        return findings
+
+
+@register_result_parser("nmap-grep")
+class NmapGrepParser(LineResultParser):
+    """nmap grepable 输出（-oG -）"""
+    HOST_RE = re.compile(r"^Host:\s+(\S+)\s+\(([^)]*)\)\s+Ports:\s+(.*)$")
+
+    def parse_line(self, line):
+        match = self.HOST_RE.match(line)
+        if not match:
+            return []
+        host, hostname, ports = match.groups()
+        findings = []
+        for entry in ports.split("\t")[0].split(","):
+            fields = entry.strip().split("/")
+            if len(fields) < 5 or fields[1] != "open":
+                continue
+            detail = " ".join(filter(None, (fields[6] if len(fields) > 6 else "", hostname)))
+            findings.append(make_finding("port", host=host, port=int(fields[0]), service=fields[4], detail=detail))
+        return findings
+
+
+@register_result_parser("dirsearch")
+class DirsearchParser(LineResultParser):
+    """dirsearch 输出，例如 "[12:00:00] 200 -  1KB  - /admin" 或报告中的 "200  1KB  http://host/admin" """
+    LINE_RE = re.compile(r"\b([1-5]\d\d)\s+-?\s*(\d+(?:\.\d+)?\s*[KMG]?B)\s+-?\s*(\S+)")
+    ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+    def parse_line(self, line):
+        match = self.LINE_RE.search(self.ANSI_RE.sub("", line))
+        if not match:
+            return []
+        status, size, path = match.groups()
+        host = ""
+        if "://" in path:
+            parsed = urllib.parse.urlsplit(path)
+            host, path = parsed.hostname or "", parsed.path or "/"
+        severity = "low" if status.startswith("2") else "info"
+        return [make_finding("path", host=host, path=path, service=f"http {status}", severity=severity, detail=size)]
+
+
+@register_result_parser("sqlmap")
+class SqlmapParser(LineResultParser):
+    """sqlmap 日志：记录存在注入的参数及注入类型"""
+    PARAM_RE = re.compile(r"^Parameter:\s+(.+?)\s+\((\w+)\)")
+    TYPE_RE = re.compile(r"^\s*Type:\s+(.+)$")
+
+    def __init__(self):
+        super().__init__()
+        self._parameter = None
+
+    def parse_line(self, line):
+        match = self.PARAM_RE.match(line)
+        if match:
+            self._parameter = f"{match.group(2)} {match.group(1)}"
+            return []
+        match = self.TYPE_RE.match(line)
+        if match and self._parameter:
+            return [make_finding("vuln", path=self._parameter, service="sqli",
+                                 severity="high", detail=match.group(1).strip())]
+        return []
+
+
+class FindingsStore:
+    """发现结果库（SQLite）
+
+    相同的 类型+主机+端口+路径 视为同一条发现，跨工具、跨目标去重；
+    sightings 表记录每条发现由哪个工具在哪次运行中发现。写入来自输出读取线程，用锁串行化。
+    result_cache 表记录每个 工具+命令+目标 最近一次成功运行的位置，供结果缓存使用。
+    findings_fts 是主机/服务/路径/详情的 FTS5 三元组索引，由触发器与 findings 同步，用于子串查询；
+    SQLite 不带 FTS5 时退回逐行 LIKE 扫描。
+    """
+    def __init__(self, path=FINDINGS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.fts = False
+
+    def connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS findings (
+                    id INTEGER PRIMARY KEY,
+                    fingerprint TEXT UNIQUE NOT NULL,
+                    kind TEXT, host TEXT, port INTEGER, service TEXT, path TEXT,
+                    severity TEXT, detail TEXT,
+                    first_seen REAL, last_seen REAL, hits INTEGER DEFAULT 1
+                );
+                CREATE TABLE IF NOT EXISTS sightings (
+                    finding_id INTEGER, tool_id TEXT, target TEXT, run_id TEXT, seen REAL,
+                    PRIMARY KEY (finding_id, tool_id, target, run_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_findings_host ON findings(host);
+                CREATE INDEX IF NOT EXISTS idx_findings_port ON findings(port);
+                CREATE INDEX IF NOT EXISTS idx_findings_service ON findings(service);
+                CREATE INDEX IF NOT EXISTS idx_findings_host_lower ON findings(lower(host));
+                CREATE INDEX IF NOT EXISTS idx_findings_service_lower ON findings(lower(service));
+                CREATE INDEX IF NOT EXISTS idx_findings_last_seen ON findings(last_seen);
+                CREATE INDEX IF NOT EXISTS idx_sightings_run ON sightings(run_id, tool_id, target);
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    key TEXT PRIMARY KEY,
+                    tool_id TEXT, target TEXT, run_id TEXT, outdir TEXT,
+                    finished REAL, output_size INTEGER
+                );
+            """)
+            self._create_fts()
+        return self._conn
+
+    def _create_fts(self):
+        conn = self._conn
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'findings_fts'").fetchone()
+        try:
+            conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS findings_fts USING fts5(
+                    host, service, path, detail, content = 'findings', content_rowid = 'id', tokenize = 'trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS findings_fts_insert AFTER INSERT ON findings BEGIN
+                    INSERT INTO findings_fts (rowid, host, service, path, detail)
+                    VALUES (new.id, new.host, new.service, new.path, new.detail);
+                END;
+                CREATE TRIGGER IF NOT EXISTS findings_fts_delete AFTER DELETE ON findings BEGIN
+                    INSERT INTO findings_fts (findings_fts, rowid, host, service, path, detail)
+                    VALUES ('delete', old.id, old.host, old.service, old.path, old.detail);
+                END;
+                CREATE TRIGGER IF NOT EXISTS findings_fts_update AFTER UPDATE OF host, service, path, detail
+                ON findings BEGIN
+                    INSERT INTO findings_fts (findings_fts, rowid, host, service, path, detail)
+                    VALUES ('delete', old.id, old.host, old.service, old.path, old.detail);
+                    INSERT INTO findings_fts (rowid, host, service, path, detail)
+                    VALUES (new.id, new.host, new.service, new.path, new.detail);
+                END;
+            """)
+            if not exists:
+                with conn:  # 升级前已有的发现
+                    conn.execute("INSERT INTO findings_fts (findings_fts) VALUES ('rebuild')")
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            print(f"创建发现全文索引失败，查询将逐行扫描: {e}")
+
+    @staticmethod
+    def fingerprint(finding):
+        return "|".join((finding["kind"], finding["host"], str(finding["port"] or ""), finding["path"]))
+
+    def add(self, findings, tool_id, target, run_id):
+        now = time.time()
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                for finding in findings:
+                    fingerprint = self.fingerprint(finding)
+                    conn.execute("""
+                        INSERT INTO findings (fingerprint, kind, host, port, service, path, severity, detail,
+                                              first_seen, last_seen)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(fingerprint) DO UPDATE SET
+                            service = excluded.service, severity = excluded.severity,
+                            detail = excluded.detail, last_seen = excluded.last_seen, hits = hits + 1
+                    """, (fingerprint, finding["kind"], finding["host"], finding["port"], finding["service"],
+                          finding["path"], finding["severity"], finding["detail"], now, now))
+                    conn.execute("""
+                        INSERT OR IGNORE INTO sightings (finding_id, tool_id, target, run_id, seen)
+                        SELECT id, ?, ?, ?, ? FROM findings WHERE fingerprint = ?
+                    """, (tool_id, target, run_id, now, fingerprint))
+
+    def run_findings(self, run_id, tool_id, target):
+        """某次运行中某个工具对某个目标给出的全部发现"""
+        with self._lock:
+            rows = self.connect().execute("""
+                SELECT f.kind, f.host, f.port, f.service, f.path, f.severity, f.detail
+                FROM sightings s JOIN findings f ON f.id = s.finding_id
+                WHERE s.run_id = ? AND s.tool_id = ? AND s.target = ?
+            """, (run_id, tool_id, target)).fetchall()
+        return [make_finding(*row) for row in rows]
+
+    def cache_get(self, key):
+        with self._lock:
+            row = self.connect().execute(
+                "SELECT run_id, outdir, finished, output_size FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"run": row[0], "dir": row[1], "finished": row[2], "out": row[3]}
+
+    def cache_put(self, key, job):
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO result_cache (key, tool_id, target, run_id, outdir, finished, output_size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (key, job.tool.get("id"), job.target, job.run_id, str(job.outdir), job.end, job.output_size))
+
+    def query(self, text="", limit=500):
+        """按主机/服务/路径/详情模糊查询，最近发现的在前
+
+        三个字符以上的查询走三元组索引；更短的查询只按主机和服务的前缀匹配（走 lower() 表达式索引），
+        两者都不区分大小写。
+        纯数字同时按端口精确匹配。
+        """
+        with self._lock:
+            conn = self.connect()
+            sql = "SELECT kind, host, port, service, path, severity, detail, hits, last_seen FROM findings"
+            params = []
+            if text:
+                if not self.fts:
+                    like = f"%{text}%"
+                    conditions = ["host LIKE ?", "service LIKE ?", "path LIKE ?", "detail LIKE ?"]
+                    params = [like, like, like, like]
+                elif len(text) >= 3:
+                    conditions = ["id IN (SELECT rowid FROM findings_fts WHERE findings_fts MATCH ?)"]
+                    params = ['"' + text.replace('"', '""') + '"']
+                else:
+                    # 解析器按原样保存主机名和服务，按小写比较
+                    low = text.lower()
+                    high = low[:-1] + chr(ord(low[-1]) + 1)
+                    conditions = ["(lower(host) >= ? AND lower(host) < ?)",
+                                  "(lower(service) >= ? AND lower(service) < ?)"]
+                    params = [low, high, low, high]
+                if text.isdigit():
+                    conditions.append("port = ?")
+                    params.append(int(text))
+                sql += " WHERE " + " OR ".join(conditions)
+            sql += " ORDER BY last_seen DESC LIMIT ?"
+            params.append(limit)
+            return conn.execute(sql, params).fetchall()
+
+
+def parse_network(text):
+    """text 是 CIDR 网段时返回 ip_network，否则返回 None"""
+    if "/" not in text or "://" in text:
+        return None
+    try:
+        return ipaddress.ip_network(text, strict=False)
+    except ValueError:
+        return None
+
+
+UNSAFE_TARGET_RE = re.compile(r"[;&|`$<>(){}\\\"'*!^\s]")  # 来自扫描结果的目标中不允许出现的 shell 特殊字符
+
+
+def normalize_target(text):
+    """把一行目标规范化为 scheme://host[:port][/path]、host:port 或 host；无法识别时返回空字符串
+
+    主机名转为小写并去掉末尾的点，URL 中与协议默认值相同的端口省略。
+    """
+    text = text.strip()
+    if not text or text.startswith("#"):
+        return ""
+    text = text.split()[0]  # 忽略行内其余的列或注释
+    if "://" in text:
+        parts = urllib.parse.urlsplit(text)
+        try:
+            host, port = (parts.hostname or "").rstrip("."), parts.port
+        except ValueError:
+            return ""
+        if not host:
+            return ""
+        scheme = parts.scheme.lower()
+        netloc = f"[{host}]" if ":" in host else host
+        if port and port != {"http": 80, "https": 443}.get(scheme):
+            netloc += f":{port}"
+        path = "" if parts.path == "/" else parts.path
+        query = f"?{parts.query}" if parts.query else ""
+        return f"{scheme}://{netloc}{path}{query}"
+    if text.startswith("["):
+        host, _, rest = text[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+    elif text.count(":") == 1:
+        host, port = text.split(":")
+    else:
+        host, port = text, ""  # 主机名或不带端口的 IPv6 地址
+    host = host.lower().rstrip(".")
+    if not host or (port and not port.isdigit()):
+        return ""
+    if not port:
+        return host
+    return f"[{host}]:{int(port)}" if ":" in host else f"{host}:{int(port)}"
+
+
+def expand_target(line):
+    """把目标文件中的一行展开为目标；CIDR 网段按地址逐个生成"""
+    text = line.strip()
+    network = parse_network(text.split()[0]) if text and not text.startswith("#") else None
+    if network is None:
+        target = normalize_target(text)
+        if target:
+            yield target
+        return
+    for address in network.hosts():
+        yield str(address)
+
+
+class BloomFilter:
+    """布隆过滤器
+
+    用固定大小的位图记录出现过的元素：不会漏判重复，误判（把新元素当作重复）的概率约为 error_rate。
+    """
+    def __init__(self, capacity, error_rate=1e-6):
+        capacity = max(capacity, 1024)
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, item):
+        """加入元素，元素是新的时返回 True"""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        bits = self.bits
+        new = False
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % self.size
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        return new
+
+
+class TargetSource:
+    """目标文件
+
+    通过 mmap 逐行读取，规范化、展开 CIDR 并去重后逐个产出目标，整个目标列表不会同时保存在内存中。
+    去重容量按展开后的目标数确定：不多于 EXACT_LIMIT 个时用集合精确去重，否则用按该数量分配的布隆过滤器。
+    输入框中以 @ 开头的内容视为目标文件路径。
+    """
+    EXACT_LIMIT = 200_000
+    MAX_TARGETS = 1 << 25  # 约 3300 万个目标（一个 /7 网段），此时布隆过滤器约 115MB
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.estimate = None
+        self.position = None  # 下一个目标的位置 (行首字节偏移, 行内展开序号)，用于中断后继续
+
+    def _lines(self):
+        """逐行产出 (行首字节偏移, 行文本)"""
+        if self.path.stat().st_size == 0:
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            while True:
+                offset = mm.tell()
+                line = mm.readline()
+                if not line:
+                    break
+                yield offset, line.decode("utf-8", "replace")
+
+    def preview(self):
+        """快速统计 (行数, 估计目标数, CIDR 网段数)；不去重，CIDR 按网段大小计数"""
+        lines = targets = networks = 0
+        for _, line in self._lines():
+            lines += 1
+            text = line.strip()
+            if not text or text.startswith("#"):
+                continue
+            network = parse_network(text.split()[0])
+            if network is None:
+                targets += 1
+            else:
+                networks += 1
+                targets += network.num_addresses - 2 if network.num_addresses > 2 else network.num_addresses
+        self.estimate = targets
+        return lines, targets, networks
+
+    def __iter__(self):
+        return self.iter_from(None)
+
+    def iter_from(self, position):
+        """产出去重后的目标；position 为之前记录的 self.position 时从该处继续
+
+        position 之前的目标不再产出，只用于重建去重状态，因此与一次读完时的去重结果完全相同。
+        """
+        if self.estimate is None:
+            self.preview()  # CIDR 网段展开后的目标数远多于文件行数，不能按文件大小估计
+        if self.estimate > self.MAX_TARGETS:
+            raise ValueError(f"目标过多（约 {self.estimate} 个），请拆分网段")
+        if self.estimate <= self.EXACT_LIMIT:
+            seen = set()
+
+            def add(target):
+                if target in seen:
+                    return False
+                seen.add(target)
+                return True
+        else:
+            add = BloomFilter(self.estimate).add
+        position = tuple(position) if position else None
+        for offset, line in self._lines():
+            for index, target in enumerate(expand_target(line)):
+                if add(target) and (position is None or (offset, index) >= position):
+                    self.position = (offset, index + 1)
+                    yield target
+
+
+def make_slug(text, limit=60):
+    """把目标、工具名转换为可用作目录名的片段"""
+    slug = re.sub(r"[^\w.-]+", "_", text).strip("._")
+    return slug[:limit] or "_"
+
+
+def new_run_id():
+    """每次批量启动的运行编号，按时间排序"""
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:4]
+
+
+class Job:
+    """一次工具 × 目标的执行任务"""
+    __slots__ = ("id", "tool", "target", "run_id", "outdir", "command", "cwd", "state",
+                 "start", "end", "exit_code", "output_size", "process", "pipeline", "stage",
+                 "cached", "hashes", "journal_id", "schedule", "worker", "interactive")
+
+    _next_id = 1
+
+    def __init__(self, tool, target, run_id=None):
+        self.id = Job._next_id
+        Job._next_id += 1
+        self.tool = tool
+        self.target = target
+        self.run_id = run_id or new_run_id()
+        # 每次运行、每个目标、每个工具一个输出目录，{outdir} 占位符展开为该目录
+        self.outdir = (Path(OUTPUT_DIR) / self.run_id / make_slug(target)
+                       / f"{make_slug(tool.get('name', ''))}-{tool.get('id', '')[:6]}").resolve()
+        self.command = render_tool_command(tool, target, str(self.outdir))
+        self.cwd = tool.get("startdir", "") or None
+        self.state = "queued"  # queued / running / done / failed / cached / cancelled
+        self.start = None
+        self.end = None
+        self.exit_code = None
+        self.output_size = None
+        self.process = None
+        self.pipeline = None  # 所属的 PipelineRun
+        self.stage = 0
+        self.cached = None  # 命中结果缓存时为缓存记录
+        self.hashes = None  # 捕获输出的 SHA-256: {文件名: 十六进制摘要}
+        self.journal_id = None  # 在持久化任务队列中的行号
+        self.schedule = None  # 所属的 ScheduledRun
+        self.worker = None  # 在工作节点上运行时为 WorkerConnection
+        self.interactive = False  # 在保持打开的控制台窗口中运行：结束时间是窗口关闭的时间
+
+    def cache_key(self):
+        """结果缓存的键：工具 + 渲染后的命令（输出目录保留为占位符）+ 目标"""
+        command = render_tool_command(self.tool, self.target, "{outdir}")
+        raw = "\0".join((self.tool.get("id", ""), command, self.target))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def uses_outdir(self):
+        """是否需要创建输出目录"""
+        return bool(self.tool.get("capture")) or "{outdir}" in self.tool.get("command", "")
+
+    def to_record(self):
+        return {
+            "tool": self.tool.get("id"),
+            "name": self.tool.get("name", ""),
+            "target": self.target,
+            "run": self.run_id,
+            "cmd": self.command,
+            "start": self.start,
+            "end": self.end,
+            "exit": self.exit_code,
+            "out": self.output_size,
+            "dir": str(self.outdir) if self.uses_outdir() else None,
+            "hash": self.hashes,
+            "worker": self.worker.name if self.worker is not None else None,
+            "interactive": self.interactive,
+        }
+
+
+def quote_shell_path(path):
+    """按本平台 shell 的规则给路径或目标加引号（不含空格等特殊字符时原样返回）"""
+    if sys.platform == 'win32':
+        quoted = subprocess.list2cmdline([path])
+        if not quoted.startswith('"') and any(c in quoted for c in "&|<>^()"):
+            quoted = f'"{quoted}"'  # list2cmdline 只处理空白，cmd 的控制字符放在引号内才是普通字符
+        return quoted
+    return shlex.quote(path)
+
+
+def render_tool_command(tool, target, outdir=""):
+    """把工具路径和参数渲染为最终执行的命令行；命令在 shell 中执行，{url} 和 {outdir} 按需加引号
+
+    目标可能来自扫描结果（流水线下游阶段）或其他程序（控制接口），不能让其中的字符被 shell 解释。
+    """
+    path = tool.get("path", "").strip()  # 工具路径
+    if outdir and outdir != "{outdir}":
+        outdir = quote_shell_path(outdir)
+    params = tool.get("command", "").replace("{url}", quote_shell_path(target) if target else target)
+    params = params.replace("{outdir}", outdir)  # 参数
+    if path:
+        return f"{path} {params}".strip()
+    return params
+
+
+JOB_QUEUE_DB = "job_queue.db"
+
+
+class JobJournal:
+    """持久化的任务队列（SQLite，WAL 模式）
+
+    每个任务提交时写入一行，状态每次变化（queued → running → done / failed / cached）都立即提交，
+    目标文件来源记录下一个目标在文件中的位置。启动器关闭或崩溃后，重新启动时据此恢复排队中和被中断的任务，
+    已完成的任务不会重复执行。取消过程中（cancelling）中断的任务在恢复时记为已取消，不再重新执行。
+    """
+    UNFINISHED = ("queued", "running")
+
+    def __init__(self, path=JOB_QUEUE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    run_id TEXT, tool_id TEXT, target TEXT, force INTEGER,
+                    state TEXT, exit_code INTEGER, created REAL, updated REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+                CREATE TABLE IF NOT EXISTS sources (
+                    id INTEGER PRIMARY KEY,
+                    run_id TEXT, path TEXT, tools TEXT, force INTEGER,
+                    consumed INTEGER DEFAULT 0, state TEXT, created REAL
+                );
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sources)")}
+            if "line_offset" not in columns:
+                # 旧版本只记录了已读取的目标数；读取位置为空的来源按目标数跳过
+                self._conn.execute("ALTER TABLE sources ADD COLUMN line_offset INTEGER")
+                self._conn.execute("ALTER TABLE sources ADD COLUMN line_index INTEGER")
+        return self._conn
+
+    def add(self, jobs, force=False, source_id=None, position=None):
+        """记录新提交的任务；来自目标文件时同一事务中推进该来源的读取位置 position"""
+        if not jobs and source_id is None:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                for job in jobs:
+                    cursor = conn.execute("""
+                        INSERT INTO jobs (run_id, tool_id, target, force, state, created, updated)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (job.run_id, job.tool.get("id"), job.target, int(force), job.state, now, now))
+                    job.journal_id = cursor.lastrowid
+                if source_id is not None:
+                    offset, index = position or (None, None)
+                    conn.execute("""
+                        UPDATE sources SET consumed = consumed + 1, line_offset = ?, line_index = ? WHERE id = ?
+                    """, (offset, index, source_id))
+
+    def update(self, job):
+        """记录任务的状态变化"""
+        if job.journal_id is None:
+            return
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                conn.execute("UPDATE jobs SET state = ?, exit_code = ?, updated = ? WHERE id = ?",
+                             (job.state, job.exit_code, time.time(), job.journal_id))
+
+    def add_source(self, run_id, path, tool_ids, force=False):
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                cursor = conn.execute("""
+                    INSERT INTO sources (run_id, path, tools, force, state, created)
+                    VALUES (?, ?, ?, ?, 'queued', ?)
+                """, (run_id, str(path), json.dumps(tool_ids), int(force), time.time()))
+                return cursor.lastrowid
+
+    def finish_source(self, source_id, state="done"):
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                conn.execute("UPDATE sources SET state = ? WHERE id = ?", (state, source_id))
+
+    def unfinished(self):
+        """返回上次未完成的 (任务列表, 目标文件来源列表)，均为字典"""
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                # 用户已经要求取消的任务：进程随启动器一起结束，直接记为已取消
+                conn.execute("UPDATE jobs SET state = 'cancelled', updated = ? WHERE state = 'cancelling'",
+                             (time.time(),))
+            jobs = conn.execute("""
+                SELECT id, run_id, tool_id, target, force, state FROM jobs
+                WHERE state IN ('queued', 'running') ORDER BY id
+            """).fetchall()
+            sources = conn.execute("""
+                SELECT id, run_id, path, tools, force, consumed, line_offset, line_index FROM sources
+                WHERE state = 'queued' ORDER BY id
+            """).fetchall()
+        jobs = [dict(zip(("id", "run", "tool", "target", "force", "state"), row)) for row in jobs]
+        sources = [dict(zip(("id", "run", "path", "tools", "force", "consumed", "offset", "index"), row))
+                   for row in sources]
+        for source in sources:
+            source["tools"] = json.loads(source["tools"])
+            source["position"] = (source["offset"], source["index"]) if source["offset"] is not None else None
+        return jobs, sources
+
+    def active_runs(self):
+        """仍有未完成任务或未读完目标文件的运行编号（包括上次退出前中断、尚未恢复的运行）"""
+        with self._lock:
+            rows = self.connect().execute("""
+                SELECT run_id FROM jobs WHERE state IN ('queued', 'running', 'cancelling')
+                UNION SELECT run_id FROM sources WHERE state = 'queued'
+            """).fetchall()
+        return {row[0] for row in rows}
+
+    def abandon(self, job_ids=None):
+        """放弃上次未完成的任务；job_ids 为 None 时放弃全部（包括目标文件来源）"""
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                if job_ids is None:
+                    conn.execute("""
+                        UPDATE jobs SET state = 'abandoned', updated = ? WHERE state IN ('queued', 'running')
+                    """, (time.time(),))
+                    conn.execute("UPDATE sources SET state = 'abandoned' WHERE state = 'queued'")
+                else:
+                    conn.executemany("UPDATE jobs SET state = 'abandoned', updated = ? WHERE id = ?",
+                                     ((time.time(), job_id) for job_id in job_ids))
+
+    def prune(self, days=7):
+        """删除已结束超过 days 天的记录"""
+        cutoff = time.time() - days * 86400
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                conn.execute("DELETE FROM jobs WHERE state NOT IN ('queued', 'running') AND updated < ?", (cutoff,))
+                conn.execute("DELETE FROM sources WHERE state != 'queued' AND created < ?", (cutoff,))
+
+
+class JobScheduler(QObject):
+    """任务调度器
+
+    按历史耗时把预计运行最久的任务排在前面，在 max_concurrent 的并发上限内
+    启动进程（0 表示不限制），后台线程等待进程结束后把结果写入运行历史。
+    设置了 cache_ttl（分钟）的工具在有效期内重复运行同一命令和目标时直接复用上次的结果。
+    设置了 workers（WorkerPool）时，捕获输出的任务优先分配到有空闲槽位的工作节点，
+    max_concurrent 只限制本机同时运行的任务数。
+    """
+    job_started = pyqtSignal(object)
+    job_finished = pyqtSignal(object)
+    findings_found = pyqtSignal(object, list)  # (job, findings)，由输出读取线程发出
+    _process_exited = pyqtSignal(object, int)  # 由等待线程发出，回到主线程处理
+    SOURCE_CONCURRENCY = 8
+
+    def __init__(self, history, findings=None, max_concurrent=0, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.findings = findings
+        self.max_concurrent = max_concurrent
+        self.queue = deque()
+        self.sources = deque()  # 惰性任务来源: [(每次产出一组任务的迭代器, force, 持久化来源编号, 读取位置), ...]
+        self.running = {}  # {job.id: job}
+        self.journal = None  # JobJournal，设置后任务状态的每次变化都会持久化
+        self.workers = None  # WorkerPool，设置后任务可以分配到工作节点
+        self.validator = None  # ToolValidator，设置后本机启动前检查程序和起始目录，无法启动的任务直接记为失败
+        self._process_exited.connect(self._on_process_exited)
+        self.job_finished.connect(self._record_finished)
+
+    def expected_duration(self, job):
+        return self.history.expected_duration(job.tool.get("id"))
+
+    def order_jobs(self, jobs):
+        """最长处理时间优先；没有历史的任务按已知耗时的平均值估计"""
+        known = [d for d in (self.expected_duration(job) for job in jobs) if d is not None]
+        default = sum(known) / len(known) if known else 0.0
+        def key(job):
+            duration = self.expected_duration(job)
+            return default if duration is None else duration
+        return sorted(jobs, key=key, reverse=True)
+
+    def estimate_completion(self, jobs):
+        """在提交前估算这批任务全部完成还需多久（秒），没有任何历史时返回 None
+
+        按当前并发上限模拟排队：运行中的任务按剩余预计时间占用槽位，
+        已在队列中的任务先于这批任务执行。
+        """
+        batch = [self.expected_duration(job) for job in jobs]
+        known = [d for d in batch if d is not None]
+        if not known:
+            return None
+        default = sum(known) / len(known)
+        ahead = [self.expected_duration(job) for job in self.queue]
+        durations = [default if d is None else d for d in ahead]
+        durations += sorted((default if d is None else d for d in batch), reverse=True)
+        remote = self.workers.capacity() if self.workers is not None else 0
+        slots = self.max_concurrent + remote if self.max_concurrent else len(durations) + len(self.running)
+        # 已在运行的任务占用的槽位按剩余预计时间计入
+        now = time.time()
+        busy = []
+        for job in self.running.values():
+            expected = self.expected_duration(job) or default
+            busy.append(max(0.0, expected - (now - job.start)))
+        finish = sorted(busy)[:slots] + [0.0] * max(0, slots - len(busy))
+        heapq.heapify(finish)
+        for duration in durations:
+            heapq.heappush(finish, heapq.heappop(finish) + duration)
+        return max(finish)
+
+    def cached_result(self, job):
+        """返回任务在有效期内的缓存结果，没有或已过期时返回 None"""
+        ttl = job.tool.get("cache_ttl") or 0
+        if ttl <= 0 or self.findings is None:
+            return None
+        try:
+            entry = self.findings.cache_get(job.cache_key())
+        except sqlite3.Error as e:
+            print(f"读取结果缓存失败: {e}")
+            return None
+        if entry is None or time.time() - entry["finished"] > ttl * 60:
+            return None
+        # 输出目录可能已被清理；压缩归档后仍视为有效
+        outdir = Path(entry["dir"])
+        archive = (Path(OUTPUT_DIR) / entry["run"]).resolve().with_suffix(".zip")
+        if not outdir.exists() and not archive.exists():
+            return None
+        return entry
+
+    def split_cached(self, jobs, force=False):
+        """查询结果缓存：命中的任务记下缓存记录（job.cached），返回需要实际运行的任务"""
+        if force:
+            return list(jobs)
+        fresh = []
+        for job in jobs:
+            job.cached = self.cached_result(job)
+            if job.cached is None:
+                fresh.append(job)
+        return fresh
+
+    def submit(self, jobs, force=False, fresh=None):
+        """提交一批任务，返回排序后的任务列表
+
+        force 为 False 时命中结果缓存的任务不再启动，在下一次事件循环中直接以缓存结果结束。
+        调用方已经用 split_cached 查过缓存时把结果作为 fresh 传入，不再重复查询。
+        """
+        jobs = self._take_fresh(jobs, force, fresh=fresh)
+        self.queue.extend(jobs)
+        self._pump()
+        return jobs
+
+    def submit_source(self, batches, force=False, source_id=None, position=None):
+        """提交惰性的任务来源（例如目标文件），每次产出一个目标的一组任务
+
+        只在有空闲槽位时才从来源中取下一组，任务列表不会一次性生成。
+        未设置并发上限时，来源中的任务最多同时运行 SOURCE_CONCURRENCY 个。
+        source_id 是该来源在持久化任务队列中的编号，position 返回来源当前的读取位置
+        （TargetSource.position），每取出一组任务就与任务一起记录，中断后从该位置继续。
+        """
+        self.sources.append((iter(batches), force, source_id, position))
+        self._pump()
+
+    def _journal(self, method, *args, **kwargs):
+        if self.journal is None:
+            return
+        try:
+            getattr(self.journal, method)(*args, **kwargs)
+        except sqlite3.Error as e:
+            print(f"写入任务队列失败: {e}")
+
+    def _take_fresh(self, jobs, force, source_id=None, position=None, fresh=None):
+        """处理命中缓存的任务，返回需要实际运行的任务（已排序）"""
+        self._journal("add", [job for job in jobs if job.journal_id is None], force, source_id, position)
+        METRICS.inc("stars_falling_jobs_submitted_total", len(jobs))
+        if fresh is None:
+            fresh = self.split_cached(jobs, force)
+        if len(fresh) < len(jobs):
+            for job in jobs:
+                if job.cached is not None:
+                    QTimer.singleShot(0, lambda job=job: self._finish_cached(job))
+        return self.order_jobs(fresh)
+
+    def cancel(self, job):
+        """取消任务：排队中的直接移出队列，运行中的结束其进程树。返回是否已取消"""
+        if job.state == "queued" and job in self.queue:
+            self.queue.remove(job)
+            job.state = "cancelled"
+            job.end = time.time()
+            self._journal("update", job)
+            self.job_finished.emit(job)
+            self._pump()
+            return True
+        if job.state == "running" and job.worker is not None:
+            job.state = "cancelling"
+            self._journal("update", job)
+            job.worker.cancel(job)
+            return True
+        if job.state == "running" and job.process is not None:
+            job.state = "cancelling"  # 进程退出后由 _on_process_exited 记为 cancelled
+            self._journal("update", job)
+            try:
+                if sys.platform == 'win32':
+                    subprocess.run(["taskkill", "/F", "/T", "/PID", str(job.process.pid)],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   creationflags=subprocess.CREATE_NO_WINDOW)
+                else:
+                    os.killpg(job.process.pid, signal.SIGKILL)
+            except OSError as e:
+                print(f"结束进程失败 {job.tool.get('name')}: {e}")
+            return True
+        return False
+
+    def _finish_cached(self, job):
+        entry = job.cached
+        job.state = "cached"
+        job.exit_code = 0
+        job.outdir = Path(entry["dir"])
+        job.output_size = entry["out"]
+        job.start = job.end = entry["finished"]
+        self._journal("update", job)
+        if job.tool.get("parser"):
+            # 缓存的发现照常发出，流水线的下游阶段不受影响
+            try:
+                findings = self.findings.run_findings(entry["run"], job.tool.get("id"), job.target)
+            except sqlite3.Error as e:
+                print(f"读取缓存的发现失败: {e}")
+                findings = []
+            if findings:
+                self.findings_found.emit(job, findings)
+        self.job_finished.emit(job)
+
+    def local_running(self):
+        """本机正在运行的任务数"""
+        return len(self.running) - (self.workers.running_count() if self.workers is not None else 0)
+
+    def _pump(self):
+        while True:
+            if self.queue:
+                worker = self.workers.pick(self.queue[0]) if self.workers is not None else None
+                if worker is None and self.max_concurrent and self.local_running() >= self.max_concurrent:
+                    return
+                job = self.queue.popleft()
+                if worker is None:
+                    self._spawn(job)
+                else:
+                    self._spawn_remote(job, worker)
+            elif self.sources and len(self.running) < self.source_limit():
+                batches, force, source_id, position = self.sources[0]
+                try:
+                    batch = next(batches)
+                except StopIteration:
+                    self.sources.popleft()
+                    if source_id is not None:
+                        self._journal("finish_source", source_id)
+                    continue
+                except Exception as e:
+                    print(f"读取目标失败: {e}")
+                    self.sources.popleft()
+                    continue
+                self.queue.extend(self._take_fresh(batch, force, source_id, position() if position else None))
+            else:
+                return
+
+    def source_limit(self):
+        """从惰性来源取任务时同时运行的任务上限（含工作节点的槽位）"""
+        remote = self.workers.capacity() if self.workers is not None else 0
+        return (self.max_concurrent or self.SOURCE_CONCURRENCY) + remote
+
+    def _spawn(self, job):
+        job.start = time.time()
+        if self.validator is not None:
+            # 控制接口、定时任务、流水线和恢复的任务都经过这里，不依赖界面上的启动确认
+            result = self.validator.check_now([job.tool])[job.tool.get("id")]
+            if result["status"] in ToolValidator.BROKEN:
+                self._fail_start(job, result["message"])
+                return
+        try:
+            job.process = launch_tool_process(job)
+        except Exception as e:
+            self._fail_start(job, e)
+            return
+        METRICS.observe("stars_falling_job_spawn_seconds", time.time() - job.start, where="local")
+        self._mark_running(job)
+        threading.Thread(target=self._wait_process, args=(job,), daemon=True).start()
+
+    def _spawn_remote(self, job, worker):
+        job.start = time.time()
+        try:
+            worker.run(job)
+        except OSError as e:
+            self._fail_start(job, e)
+            return
+        job.worker = worker
+        self._mark_running(job)
+
+    def _fail_start(self, job, error):
+        print(f"启动工具失败 {job.tool.get('name')}: {error}")
+        job.end = time.time()
+        job.exit_code = -1
+        job.state = "failed"
+        self._journal("update", job)
+        self.history.append(job.to_record())
+        self.job_finished.emit(job)
+
+    def _mark_running(self, job):
+        job.state = "running"
+        self._journal("update", job)
+        self.running[job.id] = job
+        self.job_started.emit(job)
+
+    def _record_finished(self, job):
+        tool = job.tool.get("name", "")
+        METRICS.inc("stars_falling_jobs_finished_total", tool=tool, state=job.state)
+        if job.state != "cached" and job.start is not None and job.end is not None:
+            METRICS.observe("stars_falling_job_duration_seconds", job.end - job.start, tool=tool)
+
+    def _on_remote_lost(self, job):
+        """工作节点断开或回复 busy：任务放回队列最前面重新分配，正在取消的直接记为已取消"""
+        if job.state == "cancelling":
+            self._on_process_exited(job, -1)
+            return
+        self.running.pop(job.id, None)
+        job.state = "queued"
+        job.start = None
+        job.worker = None
+        self._journal("update", job)
+        self.queue.appendleft(job)
+        QTimer.singleShot(0, self._pump)
+
+    def _wait_process(self, job):
+        pumps = []
+        parser = None
+        if job.process.stdout is not None:
+            # 捕获输出：边读边写入输出目录，不在内存中累积；stdout 同时交给结果解析器
+            parser = create_result_parser(job.tool.get("parser"))
+            on_chunk = (lambda chunk: self._parse_chunk(job, parser, chunk)) if parser else None
+            for stream, name, callback in ((job.process.stdout, "stdout.log", on_chunk),
+                                           (job.process.stderr, "stderr.log", None)):
+                counter = [0]
+                digest = hashlib.sha256()
+                thread = threading.Thread(target=pump_stream,
+                                          args=(stream, job.outdir / name, counter, callback, digest),
+                                          daemon=True)
+                thread.start()
+                pumps.append((thread, counter, name, digest))
+        code = job.process.wait()
+        for thread, *_ in pumps:
+            thread.join()
+        if pumps:
+            job.output_size = sum(counter[0] for _, counter, *_ in pumps)
+            job.hashes = {name: digest.hexdigest() for *_, name, digest in pumps}
+        elif job.uses_outdir():
+            # 未捕获输出的工具按 {outdir} 中写入的文件计算输出大小
+            try:
+                job.output_size = sum(path.stat().st_size for path in job.outdir.rglob("*") if path.is_file())
+            except OSError as e:
+                print(f"统计输出大小失败 {job.outdir}: {e}")
+        if parser:
+            self._publish_findings(job, parser.close())
+        self._process_exited.emit(job, code)
+
+    def _parse_chunk(self, job, parser, chunk):
+        try:
+            findings = parser.feed(chunk)
+        except Exception as e:
+            print(f"解析 {job.tool.get('name')} 输出失败: {e}")
+            return
+        self._publish_findings(job, findings)
+
+    def _publish_findings(self, job, findings):
+        if not findings:
+            return
+        # 只给出路径的发现（dirsearch 相对路径、sqlmap 参数）归属到任务目标的主机
+        host = target_host(job.target)
+        for finding in findings:
+            if not finding["host"]:
+                finding["host"] = host
+        if self.findings is not None:
+            try:
+                self.findings.add(findings, job.tool.get("id"), job.target, job.run_id)
+            except sqlite3.Error as e:
+                print(f"写入发现结果失败: {e}")
+        # 每次运行的发现另存一份到输出目录，用于运行之间的对比
+        try:
+            with open(job.outdir / "findings.jsonl", "a", encoding="utf-8") as f:
+                for finding in findings:
+                    f.write(json.dumps(finding, ensure_ascii=False, separators=(",", ":")) + "\n")
+        except OSError as e:
+            print(f"写入发现结果失败: {e}")
+        self.findings_found.emit(job, findings)
+
+    def _on_process_exited(self, job, code):
+        job.end = time.time()
+        job.exit_code = code
+        if job.state == "cancelling":
+            job.state = "cancelled"
+        else:
+            job.state = "done" if code == 0 else "failed"
+        job.process = None
+        self._journal("update", job)
+        self.running.pop(job.id, None)
+        record = job.to_record()
+        if record["dir"]:
+            try:
+                with open(job.outdir / "job.json", "w", encoding="utf-8") as f:
+                    json.dump(record, f, ensure_ascii=False, indent=2)
+            except OSError as e:
+                print(f"写入任务信息失败: {e}")
+        self.history.append(record)
+        if code == 0 and record["dir"] and job.tool.get("cache_ttl") and self.findings is not None:
+            try:
+                self.findings.cache_put(job.cache_key(), job)
+            except sqlite3.Error as e:
+                print(f"写入结果缓存失败: {e}")
+        self.job_finished.emit(job)
+        self._pump()
+
+
+WORKER_DEFAULT_PORT = 9700
+
+
+def tool_program(tool):
+    """工具实际执行的程序：有路径时为路径，否则为命令的第一个词；用于检查程序是否存在"""
+    path = tool.get("path", "").strip()
+    if path:
+        return path
+    command = tool.get("command", "")
+    try:
+        # Windows 路径中的反斜杠不是转义符
+        words = shlex.split(command, posix=sys.platform != 'win32')
+    except ValueError:
+        words = command.split()
+    return words[0].strip('"') if words else ""
+
+
+class RemoteOutput:
+    """远程任务的输出：与本地捕获一样写入输出目录、计算摘要并交给结果解析器"""
+
+    def __init__(self, job, scheduler):
+        self.job = job
+        self.scheduler = scheduler
+        job.outdir.mkdir(parents=True, exist_ok=True)
+        self.files = {stream: open(job.outdir / f"{stream}.log", "wb") for stream in ("stdout", "stderr")}
+        self.digests = {stream: hashlib.sha256() for stream in self.files}
+        self.sizes = dict.fromkeys(self.files, 0)
+        self.parser = create_result_parser(job.tool.get("parser"))
+
+    def write(self, stream, data):
+        f = self.files.get(stream)
+        if f is None or f.closed:
+            return
+        f.write(data)
+        self.digests[stream].update(data)
+        self.sizes[stream] += len(data)
+        if stream == "stdout" and self.parser:
+            self.scheduler._parse_chunk(self.job, self.parser, data)
+
+    def write_file(self, name, offset, data):
+        """节点传回的 {outdir} 文件；路径限制在任务的输出目录内"""
+        path = (self.job.outdir / name).resolve()
+        if self.job.outdir not in path.parents:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "r+b" if offset else "wb") as f:
+            f.seek(offset)
+            f.write(data)
+
+    def abort(self):
+        for f in self.files.values():
+            f.close()
+
+    def close(self):
+        self.abort()
+        self.job.output_size = sum(self.sizes.values())
+        self.job.hashes = {f"{stream}.log": digest.hexdigest() for stream, digest in self.digests.items()}
+        if self.parser:
+            self.scheduler._publish_findings(self.job, self.parser.close())
+
+
+class WorkerConnection(QObject):
+    """启动器到一个工作节点（worker_agent.py）的连接
+
+    协议为 TCP 上逐行的 JSON 消息，见 worker_agent.py。连接建立后发送 hello 并附上每个工具
+    实际执行的程序，节点回复可用的工具和并发槽位数；断开后每隔 RECONNECT_INTERVAL 毫秒重连。
+    """
+    RECONNECT_INTERVAL = 10000
+    BUSY_BACKOFF = 2000  # 节点回复 busy 后暂停向它分配任务的毫秒数
+    changed = pyqtSignal()
+
+    def __init__(self, address, token, pool):
+        super().__init__(pool)
+        self.address = address
+        host, _, port = address.rpartition(":")
+        self.host, self.port = (host, int(port)) if host and port.isdigit() else (address, WORKER_DEFAULT_PORT)
+        self.token = token
+        self.pool = pool
+        self.name = address
+        self.ready = False
+        self.slots = 0
+        self.tools = set()  # 节点上可用的工具 id
+        self.probed = set()  # 已询问过的工具 id
+        self.jobs = {}  # {job.id: (job, RemoteOutput)}
+        self.error = ""
+        self.busy_until = 0.0  # 节点的槽位被其他启动器占满时，在此时间（monotonic）之前不再分配
+        self.socket = QTcpSocket(self)
+        self.socket.connected.connect(self._on_connected)
+        self.socket.readyRead.connect(self._on_ready_read)
+        self.socket.stateChanged.connect(self._on_state_changed)
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.connect_to_host)
+
+    def connect_to_host(self):
+        if self.socket.state() == QAbstractSocket.UnconnectedState:
+            self.socket.connectToHost(self.host, self.port)
+
+    def close(self):
+        self.reconnect_timer.stop()
+        self.socket.stateChanged.disconnect(self._on_state_changed)
+        self.socket.abort()
+        self._lost()
+
+    def send(self, message):
+        self.socket.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def free_slots(self):
+        if not self.ready or time.monotonic() < self.busy_until:
+            return 0
+        return self.slots - len(self.jobs)
+
+    def can_run(self, job):
+        tool_id = job.tool.get("id")
+        if tool_id not in self.probed and self.ready:
+            # 连接之后新增的工具：先询问，结果返回后调度器会重新分配
+            self.probed.add(tool_id)
+            self.send({"type": "probe", "tools": {tool_id: tool_program(job.tool)}})
+        return self.free_slots() > 0 and tool_id in self.tools
+
+    def run(self, job):
+        """把任务发送到节点执行；命令中的 {outdir} 由节点展开为它自己的临时目录"""
+        output = RemoteOutput(job, self.pool.scheduler)
+        self.jobs[job.id] = (job, output)
+        self.send({
+            "type": "run",
+            "job": job.id,
+            "command": render_tool_command(job.tool, job.target, "{outdir}"),
+            "capture": True,
+        })
+        self.changed.emit()
+
+    def cancel(self, job):
+        self.send({"type": "cancel", "job": job.id})
+
+    def _on_connected(self):
+        self.socket.setSocketOption(QAbstractSocket.KeepAliveOption, 1)
+        tools = {tool.get("id"): tool_program(tool) for tool in self.pool.tools() if tool.get("capture")}
+        self.probed = set(tools)
+        self.send({"type": "hello", "version": 1, "token": self.token, "tools": tools})
+
+    def _on_state_changed(self, state):
+        if state == QAbstractSocket.UnconnectedState:
+            if not self.ready:
+                self.error = self.socket.errorString()
+            self._lost()
+            self.reconnect_timer.start(self.RECONNECT_INTERVAL)
+
+    def _lost(self):
+        """连接断开：节点上运行的任务重新排队（正在取消的记为已取消）"""
+        self.ready = False
+        jobs, self.jobs = list(self.jobs.values()), {}
+        for job, output in jobs:
+            output.abort()
+            self.pool.scheduler._on_remote_lost(job)
+        self.changed.emit()
+
+    def _on_ready_read(self):
+        while self.socket.canReadLine():
+            try:
+                message = json.loads(bytes(self.socket.readLine()).decode("utf-8"))
+                self._handle(message)
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"处理工作节点 {self.name} 的消息失败: {e}")
+            except OSError as e:
+                print(f"写入远程任务输出失败: {e}")
+
+    def _handle(self, message):
+        kind = message.get("type")
+        if kind == "output":
+            entry = self.jobs.get(message["job"])
+            if entry:
+                entry[1].write(message["stream"], base64.b64decode(message["data"]))
+        elif kind == "file":
+            entry = self.jobs.get(message["job"])
+            if entry:
+                entry[1].write_file(message["name"], message["offset"], base64.b64decode(message["data"]))
+        elif kind == "started":
+            entry = self.jobs.get(message["job"])
+            if entry:
+                METRICS.observe("stars_falling_job_spawn_seconds", time.time() - entry[0].start, where="remote")
+        elif kind == "exit":
+            entry = self.jobs.pop(message["job"], None)
+            if entry:
+                job, output = entry
+                output.close()
+                if message.get("error"):
+                    print(f"工作节点 {self.name} 执行 {job.tool.get('name')} 失败: {message['error']}")
+                self.pool.scheduler._on_process_exited(job, message["code"])
+                self.changed.emit()
+        elif kind == "busy":
+            # 槽位被其他启动器占用：任务放回队列，暂停一段时间再向该节点分配
+            entry = self.jobs.pop(message["job"], None)
+            if entry:
+                job, output = entry
+                output.abort()
+                self.busy_until = time.monotonic() + self.BUSY_BACKOFF / 1000
+                QTimer.singleShot(self.BUSY_BACKOFF, self.pool.scheduler._pump)
+                self.pool.scheduler._on_remote_lost(job)
+                self.changed.emit()
+        elif kind == "ready":
+            self.name = message.get("name") or self.address
+            self.slots = int(message.get("slots", 0))
+            self.tools = set(message.get("tools", []))
+            self.ready = True
+            self.error = ""
+            self.changed.emit()
+            self.pool.scheduler._pump()
+        elif kind == "tools":
+            self.tools.update(message.get("tools", []))
+            self.pool.scheduler._pump()
+        elif kind == "error":
+            self.error = message.get("message", "")
+            print(f"工作节点 {self.address} 拒绝连接: {self.error}")
+
+
+class WorkerPool(QObject):
+    """已登记的工作节点
+
+    调度器优先把捕获输出的任务分配给空闲槽位比例最高、且具备该工具的节点，
+    没有合适的节点时在本机运行。节点的输出实时写入本机的输出目录，之后的历史、
+    缓存、解析和索引与本机任务完全相同。
+    """
+    changed = pyqtSignal()
+
+    def __init__(self, scheduler, tools, parent=None):
+        super().__init__(parent)
+        self.scheduler = scheduler
+        self.tools = tools  # 返回当前工具列表的函数
+        self.workers = []
+
+    def set_workers(self, entries):
+        """按配置 [{"address", "token"}] 建立连接，已有的连接保持不变"""
+        wanted = {(entry["address"], entry.get("token", "")) for entry in entries}
+        for worker in list(self.workers):
+            if (worker.address, worker.token) not in wanted:
+                self.workers.remove(worker)
+                worker.close()
+                worker.deleteLater()
+        existing = {(worker.address, worker.token) for worker in self.workers}
+        for entry in entries:
+            key = (entry["address"], entry.get("token", ""))
+            if key not in existing:
+                worker = WorkerConnection(key[0], key[1], self)
+                worker.changed.connect(self.changed)
+                self.workers.append(worker)
+                worker.connect_to_host()
+                existing.add(key)
+        self.changed.emit()
+
+    def pick(self, job):
+        """为任务选择节点，没有可用节点时返回 None（在本机运行）"""
+        if not job.tool.get("capture"):
+            return None  # 不捕获输出的工具需要本机的控制台窗口
+        candidates = [worker for worker in self.workers if worker.can_run(job)]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda worker: worker.free_slots() / worker.slots)
+
+    def capacity(self):
+        return sum(worker.slots for worker in self.workers if worker.ready)
+
+    def running_count(self):
+        return sum(len(worker.jobs) for worker in self.workers)
+
+
+def finding_to_target(finding, feed, source_target=""):
+    """把上游阶段的发现转换为下游阶段的目标
+
+    feed 为 host（主机）、hostport（主机:端口）或 url（按服务推断协议的 URL）。
+    """
+    host = finding.get("host", "")
+    if not host:
+        return ""
+    port = finding.get("port")
+    netloc = f"[{host}]" if ":" in host else host
+    if feed == "hostport":
+        return f"{netloc}:{port}" if port else host
+    if feed == "url":
+        if finding.get("kind") == "path":
+            scheme = urllib.parse.urlsplit(source_target).scheme if "://" in source_target else "http"
+            return f"{scheme}://{netloc}{finding.get('path') or '/'}"
+        if port:
+            service = finding.get("service", "")
+            scheme = "https" if port in (443, 8443) or "https" in service or "ssl" in service else "http"
+            return f"{scheme}://{netloc}:{port}"
+        return f"http://{netloc}"
+    return host
+
+
+class PipelineRun:
+    """一次流水线执行
+
+    流水线由若干阶段组成，每个阶段是一组工具；上游任务在运行过程中解析出的发现
+    立即转换为下游阶段的目标并提交，不必等待上游阶段结束。每个阶段的目标去重，
+    整条流水线同时运行的任务数不超过 max_concurrent。
+    """
+    def __init__(self, pipeline, tools_by_id, scheduler, run_id=None):
+        self.name = pipeline.get("name", "")
+        self.stages = []  # [(工具列表, feed), ...]
+        for stage in pipeline.get("stages", []):
+            tools = [tools_by_id[tool_id] for tool_id in stage.get("tools", []) if tool_id in tools_by_id]
+            self.stages.append((tools, stage.get("feed", "host")))
+        self.max_concurrent = pipeline.get("max_concurrent", 4) or 4
+        self.scheduler = scheduler
+        self.run_id = run_id or new_run_id()
+        self.seen = [set() for _ in self.stages]  # 下游阶段已接收的目标
+        self.counts = [0] * len(self.stages)  # 每个阶段接收的目标数
+        self.source = None  # 第一阶段的目标，按需读取
+        self.pending = deque()
+        self.active = 0
+        self.finished_jobs = 0
+
+    def start(self, targets):
+        """targets 可以是目标文件这样的惰性迭代器，只在有空闲名额时读取下一个"""
+        self.source = iter(targets)
+        self._pump()
+
+    def add_target(self, stage, target):
+        """把目标加入指定阶段的队列，重复的目标忽略"""
+        self._enqueue(stage, target)
+        self._pump()
+
+    def _enqueue(self, stage, target):
+        if stage >= len(self.stages):
+            return
+        target = target.strip()
+        if stage:
+            # 下游目标来自被扫描主机控制的输出：只接受能规范化、且不含 shell 特殊字符的目标
+            target = normalize_target(target)
+            if not target or UNSAFE_TARGET_RE.search(target):
+                return
+        if not target:
+            return
+        if stage:
+            # 第一阶段的目标来自输入框或已去重的目标文件，不必保存
+            key = target.lower()
+            if key in self.seen[stage]:
+                return
+            self.seen[stage].add(key)
+        self.counts[stage] += 1
+        for tool in self.stages[stage][0]:
+            job = Job(tool, target, self.run_id)
+            job.pipeline = self
+            job.stage = stage
+            self.pending.append(job)
+
+    def _pump(self):
+        batch = []
+        while self.active < self.max_concurrent:
+            if self.pending:
+                batch.append(self.pending.popleft())
+                self.active += 1
+            elif self.source is not None:
+                target = next(self.source, None)
+                if target is None:
+                    self.source = None
+                else:
+                    self._enqueue(0, target)
+            else:
+                break
+        if batch:
+            self.scheduler.submit(batch)
+
+    def on_findings(self, job, findings):
+        next_stage = job.stage + 1
+        if next_stage >= len(self.stages):
+            return
+        feed = self.stages[next_stage][1]
+        for finding in findings:
+            target = finding_to_target(finding, feed, job.target)
+            if target:
+                self.add_target(next_stage, target)
+
+    def on_job_finished(self, job):
+        self.active -= 1
+        self.finished_jobs += 1
+        self._pump()
+
+    def is_done(self):
+        return not self.pending and self.active == 0 and self.source is None
+
+    def stage_counts(self):
+        return list(self.counts)
+
+
+class IntervalTrigger:
+    """固定间隔触发"""
+    def __init__(self, seconds):
+        if seconds < 60:
+            raise ValueError("间隔不能小于 1 分钟")
+        self.seconds = seconds
+
+    def next_after(self, ts):
+        return ts + self.seconds
+
+
+class CronTrigger:
+    """五段 cron 表达式触发：分 时 日 月 周（0 或 7 表示周日），支持 * , - /"""
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 表达式需要 5 段: {expression}")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            sorted(self._parse(field, low, high)) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        # 日和周都有限制时任一满足即可，否则两者都要满足（与 cron 一致：以 * 开头的字段如 */2 视为不限制）
+        self.either_day = not fields[2].startswith("*") and not fields[4].startswith("*")
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(","):
+            part, _, step = part.partition("/")
+            try:
+                step = int(step) if step else 1
+                if part == "*":
+                    start, end = low, high
+                elif "-" in part:
+                    start, end = map(int, part.split("-"))
+                else:
+                    start = int(part)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise ValueError(f"无法解析 cron 字段: {field}")
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"cron 字段超出范围: {field}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays  # cron 中 0 为周日
+        return in_days or in_weekdays if self.either_day else in_days and in_weekdays
+
+    def next_after(self, ts):
+        """ts 之后的下一个触发时间（按天跳过不匹配的日期，不逐分钟遍历）"""
+        start = datetime.fromtimestamp(ts).replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 5):
+            if self.day_matches(day):
+                first = day == start.date()
+                for hour in self.hours:
+                    if first and hour < start.hour:
+                        continue
+                    for minute in self.minutes:
+                        if first and hour == start.hour and minute < start.minute:
+                            continue
+                        return datetime.combine(day, dt_time(hour, minute)).timestamp()
+            day += timedelta(days=1)
+        return None
+
+
+def parse_trigger(text):
+    """解析触发方式：30m / 6h / 1d 这样的间隔，或五段 cron 表达式"""
+    text = text.strip()
+    match = re.fullmatch(r"(\d+)\s*([smhd])", text.lower())
+    if match:
+        return IntervalTrigger(int(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)])
+    return CronTrigger(text)
+
+
+class ScheduledRun:
+    """定时计划的一次运行，用于判断上一次运行是否已经结束"""
+    def __init__(self, name):
+        self.name = name
+        self.outstanding = 0  # 已生成但尚未结束的任务数
+        self.exhausted = False  # 目标是否已全部生成任务
+
+    def is_done(self):
+        return self.exhausted and self.outstanding == 0
+
+
+class ScanScheduler(QObject):
+    """定时扫描
+
+    配置中的每个计划包含工具、目标（可以是 @目标文件）和触发方式（间隔或 cron）。
+    只用一个单次 QTimer，定在最近的到期时间，没有到期的计划时不会周期性唤醒。
+    启动器未运行或系统休眠期间错过的多次运行在恢复后合并补跑一次（catch_up 为 false 时跳过），
+    同一计划的上一次运行尚未结束时跳过本次。
+    """
+    MAX_SLEEP = 3600  # 定时器最长等待秒数，防止系统时间被调整后长时间不触发
+    schedule_fired = pyqtSignal(str, str)  # (计划名称, 结果说明)
+    schedules_changed = pyqtSignal()  # last_run 等字段更新后发出，用于保存配置
+
+    def __init__(self, schedules, launch, parent=None):
+        super().__init__(parent)
+        self.schedules = schedules  # 配置中的计划列表，原地更新
+        self.launch = launch  # launch(schedule) -> ScheduledRun 或 None
+        self.active = {}  # {计划名称: ScheduledRun}
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run_due)
+
+    def next_due(self, schedule):
+        try:
+            trigger = parse_trigger(schedule.get("trigger", ""))
+        except ValueError as e:
+            print(f"定时任务 {schedule.get('name')} 的触发方式无效: {e}")
+            return None
+        return trigger.next_after(schedule.get("last_run") or schedule.get("created") or time.time())
+
+    def reschedule(self):
+        """把定时器定到最近的到期时间"""
+        self.timer.stop()
+        dues = [due for due in (self.next_due(s) for s in self.schedules if s.get("enabled", True))
+                if due is not None]
+        if dues:
+            delay = min(max(0.0, min(dues) - time.time()), self.MAX_SLEEP)
+            self.timer.start(int(delay * 1000))
+
+    def run_due(self):
+        now = time.time()
+        changed = False
+        for schedule in self.schedules:
+            if not schedule.get("enabled", True):
+                continue
+            due = self.next_due(schedule)
+            if due is None or due > now:
+                continue
+            changed = True
+            schedule["last_run"] = now  # 错过的多次运行只补跑一次
+            if not schedule.get("catch_up", True) and now - due > 60:
+                self.schedule_fired.emit(schedule["name"], "错过的运行已跳过")
+                continue
+            self.run_schedule(schedule)
+        if changed:
+            self.schedules_changed.emit()
+        self.reschedule()
+
+    def run_schedule(self, schedule):
+        """立即运行一个计划；上一次运行尚未结束时跳过"""
+        name = schedule["name"]
+        previous = self.active.get(name)
+        if previous is not None and not previous.is_done():
+            self.schedule_fired.emit(name, "上一次运行尚未结束，本次跳过")
+            return
+        run = self.launch(schedule)
+        if run is None:
+            self.active.pop(name, None)
+            self.schedule_fired.emit(name, "没有可执行的工具或目标")
+            return
+        self.active[name] = run
+        self.schedule_fired.emit(name, "已开始运行")
+
+    def on_job_finished(self, job):
+        if job.schedule is not None:
+            job.schedule.outstanding -= 1
+
+
+def launch_tool_process(job):
+    """启动任务对应的进程"""
+    if job.uses_outdir():
+        job.outdir.mkdir(parents=True, exist_ok=True)
+    path = job.tool.get("path", "").strip()
+    # 非 Windows 平台上每个任务单独一个进程组，取消时可以结束整个进程树
+    session = {} if sys.platform == 'win32' else {"start_new_session": True}
+    if job.tool.get("capture"):
+        # 捕获输出时不弹出控制台窗口，stdout/stderr 由后台线程写入输出目录
+        flags = subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+        return subprocess.Popen(job.command, shell=True, cwd=job.cwd, creationflags=flags,
+                                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                **session)
+    if path:
+        # 有路径时直接启动
+        return subprocess.Popen(job.command, shell=True, cwd=job.cwd, **session)
+    if sys.platform == 'win32':
+        # 路径为空时在新的 cmd 窗口中执行并保持窗口打开，便于查看输出；
+        # 窗口关闭才算结束，这类运行不计入耗时统计
+        job.interactive = True
+        return subprocess.Popen(f'cmd /k "{job.command}"', cwd=job.cwd,
+                                creationflags=subprocess.CREATE_NEW_CONSOLE)
+    return subprocess.Popen(job.command, shell=True, cwd=job.cwd, **session)
+
+
+def pump_stream(stream, path, counter, on_chunk=None, digest=None):
+    """把进程输出流按块写入文件，counter[0] 累计字节数，每块同时交给 on_chunk 并计入 digest"""
+    try:
+        with open(path, "wb") as f:
+            while True:
+                chunk = stream.read1(65536)
+                if not chunk:
+                    break
+                f.write(chunk)
+                counter[0] += len(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+                if on_chunk:
+                    on_chunk(chunk)
+    except OSError as e:
+        print(f"写入输出失败 {path}: {e}")
+    finally:
+        stream.close()
+
+
+def open_run_output(outdir, name):
+    """以二进制方式打开某次运行的输出文件；运行目录已被压缩时从 zip 归档中读取"""
+    path = Path(outdir) / name
+    if path.exists():
+        return open(path, "rb")
+    base = Path(OUTPUT_DIR).resolve()
+    relative = Path(outdir).relative_to(base)  # <运行编号>/<目标>/<工具>
+    with zipfile.ZipFile(base / f"{relative.parts[0]}.zip") as zf:
+        return zf.open((Path(*relative.parts[1:]) / name).as_posix())
+
+
+def line_hash(line):
+    """行的 64 位哈希；只在同一进程内比较，直接使用内置的 SipHash"""
+    return hash(line) & 0xFFFFFFFFFFFFFFFF
+
+
+class LineHashSet:
+    """输出行的 64 位哈希集合
+
+    按哈希高 8 位分成 256 个桶，每个桶是排好序的 array('Q')，每行只占 8 字节，
+    几百 MB 的输出也不必整份读入内存。
+    """
+    def __init__(self):
+        self.buckets = [array("Q") for _ in range(256)]
+
+    @classmethod
+    def from_file(cls, opener):
+        hashes = cls()
+        with opener() as f:
+            for line in f:
+                line = line.rstrip()
+                if line:
+                    h = line_hash(line)
+                    hashes.buckets[h >> 56].append(h)
+        hashes.buckets = [array("Q", sorted(set(bucket))) for bucket in hashes.buckets]
+        return hashes
+
+    def __contains__(self, h):
+        bucket = self.buckets[h >> 56]
+        i = bisect_left(bucket, h)
+        return i < len(bucket) and bucket[i] == h
+
+
+def lines_missing_from(opener, other, limit):
+    """逐行扫描文件，返回 (不在 other 中的行数, 前 limit 行的 [(行号, 内容)])"""
+    count = 0
+    lines = []
+    with opener() as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.rstrip()
+            if line and line_hash(line) not in other:
+                count += 1
+                if len(lines) < limit:
+                    lines.append((lineno, line.decode("utf-8", "replace")))
+    return count, lines
+
+
+def load_run_findings(record, store=None):
+    """读取某次运行保存的发现；旧的运行没有 findings.jsonl 时从发现库中查询"""
+    findings = []
+    try:
+        with open_run_output(record["dir"], "findings.jsonl") as f:
+            for line in f:
+                try:
+                    findings.append(json.loads(line))
+                except ValueError:
+                    continue
+        return findings
+    except (OSError, KeyError, ValueError):
+        pass
+    if store is not None:
+        try:
+            return store.run_findings(record["run"], record["tool"], record["target"])
+        except sqlite3.Error as e:
+            print(f"读取发现结果失败: {e}")
+    return findings
+
+
+def diff_runs(old, new, store=None, limit=2000):
+    """对比同一工具对同一目标的两次运行（两条运行记录）
+
+    发现按 类型+主机+端口+路径 匹配，分为新增、消失和变化（服务/等级/详情不同）；
+    输出按行哈希对比，内容哈希相同时直接跳过。
+    """
+    result = {"findings": [], "added": (0, []), "removed": (0, []), "identical": False}
+    old_findings = {FindingsStore.fingerprint(f): f for f in load_run_findings(old, store)}
+    new_findings = {FindingsStore.fingerprint(f): f for f in load_run_findings(new, store)}
+    for key, finding in new_findings.items():
+        before = old_findings.get(key)
+        if before is None:
+            result["findings"].append(("新增", finding))
+        elif any(before.get(k) != finding.get(k) for k in ("service", "severity", "detail")):
+            result["findings"].append(("变化", finding))
+    for key, finding in old_findings.items():
+        if key not in new_findings:
+            result["findings"].append(("消失", finding))
+
+    old_hash = (old.get("hash") or {}).get("stdout.log")
+    if old_hash and old_hash == (new.get("hash") or {}).get("stdout.log"):
+        result["identical"] = True
+        return result
+    old_open = lambda: open_run_output(old["dir"], "stdout.log")
+    new_open = lambda: open_run_output(new["dir"], "stdout.log")
+    result["added"] = lines_missing_from(new_open, LineHashSet.from_file(old_open), limit)
+    result["removed"] = lines_missing_from(old_open, LineHashSet.from_file(new_open), limit)
+    return result
+
+
+OUTPUT_INDEX_DB = "output_index.db"
+TOKEN_RE = re.compile(rb"[a-z0-9_]{2,64}")
+
+
+class OutputIndex:
+    """捕获输出的全文倒排索引（SQLite）
+
+    postings 表记录每个词出现在哪些输出文件中。查询时先按词求交得到候选文件，
+    再只扫描候选文件定位匹配的行。运行结束后在后台线程中增量建立索引。
+    """
+    FILES = ("stdout.log", "stderr.log")
+
+    def __init__(self, path=OUTPUT_INDEX_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._tasks = queue.Queue()
+        self._worker = None
+
+    def connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY,
+                    run_id TEXT, tool_id TEXT, name TEXT, target TEXT,
+                    outdir TEXT, file TEXT, indexed REAL,
+                    UNIQUE (outdir, file)
+                );
+                CREATE TABLE IF NOT EXISTS postings (
+                    token BLOB, doc_id INTEGER,
+                    PRIMARY KEY (token, doc_id)
+                ) WITHOUT ROWID;
+            """)
+        return self._conn
+
+    def _submit(self, task):
+        self._tasks.put(task)
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, daemon=True)
+            self._worker.start()
+
+    def _work(self):
+        while True:
+            task = self._tasks.get()
+            try:
+                task()
+            except Exception as e:
+                print(f"建立输出索引失败: {e}")
+
+    def enqueue(self, record):
+        """在后台为一次运行（运行记录）的输出建立索引"""
+        if record.get("dir"):
+            self._submit(lambda: self.index_record(record))
+
+    def catch_up(self, directory=OUTPUT_DIR):
+        """在后台补建尚未索引的运行目录（例如上次退出前还没来得及索引的运行）"""
+        self._submit(lambda: self._scan(Path(directory)))
+
+    def _scan(self, directory):
+        with self._lock:
+            indexed = {row[0] for row in self.connect().execute("SELECT DISTINCT outdir FROM documents")}
+        for job_file in sorted(directory.glob("*/*/*/job.json")):
+            if str(job_file.parent.resolve()) in indexed:
+                continue
+            try:
+                with open(job_file, "r", encoding="utf-8") as f:
+                    self.index_record(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"读取任务信息失败 {job_file}: {e}")
+
+    def index_record(self, record):
+        for name in self.FILES:
+            with self._lock:
+                exists = self.connect().execute(
+                    "SELECT 1 FROM documents WHERE outdir = ? AND file = ?", (record["dir"], name)
+                ).fetchone()
+            if exists:
+                continue
+            tokens = set()
+            try:
+                with open_run_output(record["dir"], name) as f:
+                    for line in f:
+                        tokens.update(TOKEN_RE.findall(line.lower()))
+            except (OSError, KeyError, ValueError):
+                continue  # 没有该输出或已被清理
+            with self._lock:
+                conn = self.connect()
+                with conn:
+                    cursor = conn.execute("""
+                        INSERT INTO documents (run_id, tool_id, name, target, outdir, file, indexed)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (record.get("run"), record.get("tool"), record.get("name", ""), record.get("target", ""),
+                          record["dir"], name, time.time()))
+                    doc_id = cursor.lastrowid
+                    conn.executemany("INSERT OR IGNORE INTO postings (token, doc_id) VALUES (?, ?)",
+                                     ((token, doc_id) for token in tokens))
+
+    def forget(self, doc_id):
+        """删除已不存在的输出文件的索引"""
+        with self._lock:
+            conn = self.connect()
+            with conn:
+                conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+                conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+
+    def search(self, text, limit=200):
+        """查找包含 text（不区分大小写）的输出行，最近的运行在前
+
+        返回 [(文档信息字典, 行号, 行内容)]；text 中没有长度不小于 2 的词时返回空列表。
+        text 末尾的词按前缀匹配（边输入边搜索时词往往还没打完），在 postings 的主键上做范围查询。
+        """
+        needle = text.strip().lower().encode("utf-8")
+        words = TOKEN_RE.findall(needle)
+        if not words:
+            return []
+        prefix = words[-1] if needle.endswith(words[-1]) else None
+        exact = set(words) - {prefix}
+        conditions = ["SELECT doc_id FROM postings WHERE token = ?"] * len(exact)
+        params = list(exact)
+        if prefix is not None:
+            conditions.append("SELECT doc_id FROM postings WHERE token >= ? AND token < ?")
+            params += [prefix, prefix[:-1] + bytes([prefix[-1] + 1])]
+        with self._lock:
+            docs = self.connect().execute(f"""
+                SELECT id, run_id, tool_id, name, target, outdir, file FROM documents
+                WHERE id IN ({" INTERSECT ".join(conditions)})
+                ORDER BY indexed DESC
+            """, params).fetchall()
+        results = []
+        for doc_id, run_id, tool_id, name, target, outdir, file in docs:
+            doc = {"run": run_id, "tool": tool_id, "name": name, "target": target, "dir": outdir, "file": file}
+            try:
+                with open_run_output(outdir, file) as f:
+                    for lineno, line in enumerate(f, 1):
+                        if needle in line.lower():
+                            results.append((doc, lineno, line.rstrip().decode("utf-8", "replace")))
+                            if len(results) >= limit:
+                                return results
+            except (OSError, KeyError, ValueError):
+                self.forget(doc_id)
+        return results
+
+
+class OutputArchiver:
+    """运行输出的后台压缩与清理
+
+    保留最近 keep_uncompressed 次运行的原始目录，更早的运行压缩为同名 .zip；
+    超过 max_age_days 天或总大小超过 max_total_mb 的最旧归档被删除。
+    所有磁盘操作都在后台线程中执行，正在运行的批次不会被处理。
+    恢复的任务沿用原来的运行编号，可能在已压缩的运行中重新写出目录；再次压缩时与已有归档合并，而不是覆盖它。
+    """
+    DEFAULTS = {"keep_uncompressed": 20, "max_age_days": 90, "max_total_mb": 5120}
+
+    def __init__(self, directory=OUTPUT_DIR, policy=None):
+        self.directory = Path(directory)
+        self.policy = dict(self.DEFAULTS, **(policy or {}))
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def trigger(self, active_runs=()):
+        """在后台执行一次压缩和清理；已有清理在进行时忽略本次请求"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, args=(frozenset(active_runs),), daemon=True)
+            self._thread.start()
+
+    def _run(self, active_runs):
+        try:
+            self.compress_old_runs(active_runs)
+            self.prune()
+        except Exception as e:
+            print(f"清理运行输出失败: {e}")
+
+    def compress_old_runs(self, active_runs):
+        if not self.directory.exists():
+            return
+        run_dirs = sorted(p for p in self.directory.iterdir() if p.is_dir())
+        keep = self.policy["keep_uncompressed"]
+        for run_dir in run_dirs[:max(0, len(run_dirs) - keep)]:
+            if run_dir.name in active_runs:
+                continue
+            archive = run_dir.with_suffix(".zip")
+            tmp = run_dir.with_suffix(".zip.tmp")
+            files = {file.relative_to(run_dir).as_posix(): file for file in run_dir.rglob("*") if file.is_file()}
+            with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+                if archive.exists():
+                    self._copy_archive(archive, zf, skip=files)
+                for name, file in files.items():
+                    zf.write(file, name)
+            tmp.replace(archive)
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    @staticmethod
+    def _copy_archive(archive, zf, skip):
+        """把已有归档中的条目流式复制到 zf；skip 中的条目由目录中的新文件代替"""
+        with zipfile.ZipFile(archive) as old:
+            for info in old.infolist():
+                if info.filename in skip:
+                    continue
+                entry = zipfile.ZipInfo(info.filename, info.date_time)
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                with old.open(info) as src, zf.open(entry, "w", force_zip64=info.file_size > 2 ** 31) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+
+    def prune(self):
+        if not self.directory.exists():
+            return
+        archives = sorted(self.directory.glob("*.zip"))
+        cutoff = time.time() - self.policy["max_age_days"] * 86400
+        budget = self.policy["max_total_mb"] * 1024 * 1024
+        sizes = {p: p.stat().st_size for p in archives}
+        total = sum(sizes.values())
+        for archive in archives:
+            if archive.stat().st_mtime < cutoff or total > budget:
+                total -= sizes[archive]
+                archive.unlink()
+
+
+TOOL_CHECK_CACHE = "tool_checks.json"
+# shell 内置命令没有对应的可执行文件，不视为缺失
+SHELL_BUILTINS = frozenset(("echo", "cd", "set", "start", "call", "type", "dir", "for", "if", "exit", "export"))
+
+
+class ToolValidator(QObject):
+    """在后台线程池中检查工具能否启动
+
+    通过 PATH 或绝对路径解析工具的可执行文件并检查起始目录；设置了 version_args 的工具
+    还会以该参数运行一次程序，取输出的第一行作为版本。版本按可执行文件的修改时间和大小
+    缓存在 tool_checks.json 中，程序没有变化时不会重复运行。
+    结果 {"status": ok / missing / startdir / unknown, "exe", "version", "message"} 按工具 id 保存在 results 中，
+    另记检查时间（checked）和检查时的字段（fields），启动前的检查在 CHECK_TTL 秒内直接使用已有结果。
+    """
+    checked = pyqtSignal(str, dict)  # (工具 id, 结果)，由线程池发出
+    VERSION_TIMEOUT = 5
+    CHECK_TTL = 300
+    BROKEN = ("missing", "startdir")  # 肯定无法启动的状态
+
+    def __init__(self, parent=None, cache_path=TOOL_CHECK_CACHE):
+        super().__init__(parent)
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+        self.results = {}
+        self.cache_path = Path(cache_path)
+        self.versions = {}  # {可执行文件: {"key": [mtime, size, 参数], "version"}}
+        self._lock = threading.Lock()
+        self.checked.connect(self.results.__setitem__)
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                self.versions = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"读取工具检查缓存失败: {e}")
+
+    @staticmethod
+    def fields(tool):
+        """在主线程中取出检查需要的字段，线程池只读这份快照"""
+        return {name: tool.get(name) or "" for name in ("path", "command", "startdir", "version_args")}
+
+    def validate(self, tools):
+        """在后台检查一批工具，每个结果通过 checked 信号返回"""
+        for tool in tools:
+            self.pool.submit(self._run, tool.get("id"), self.fields(tool))
+
+    def _run(self, tool_id, fields):
+        try:
+            result = self.check(fields)
+        except Exception as e:
+            result = {"status": "unknown", "message": f"检查失败: {e}"}
+        result.update(checked=time.monotonic(), fields=fields)
+        self.checked.emit(tool_id, result)
+
+    def check_now(self, tools):
+        """在当前线程中检查（不获取版本），用于启动前的确认；返回 {工具 id: 结果}
+
+        有效期内、工具字段未变且能启动的结果直接使用，只重新检查没有结果、已过期或无法启动的工具。
+        """
+        results = {}
+        now = time.monotonic()
+        for tool in tools:
+            fields = self.fields(tool)
+            previous = self.results.get(tool.get("id"))
+            if (previous and previous["status"] not in self.BROKEN and previous.get("fields") == fields
+                    and now - previous.get("checked", -math.inf) < self.CHECK_TTL):
+                results[tool.get("id")] = previous
+                continue
+            result = self.check(fields, version=False)
+            if result["status"] == "ok" and previous and previous.get("exe") == result.get("exe"):
+                result = dict(previous)  # 保留已获取的版本
+            result.update(checked=now, fields=fields)
+            results[tool.get("id")] = self.results[tool.get("id")] = result
+        return results
+
+    def check(self, fields, version=True):
+        startdir = fields["startdir"].strip()
+        if startdir and not os.path.isdir(startdir):
+            return {"status": "startdir", "message": f"起始目录不存在: {startdir}"}
+        program = tool_program(fields).strip().strip('"')
+        if not program or "{" in program:
+            return {"status": "unknown", "message": "无法确定要执行的程序"}
+        if os.path.basename(program).lower() in SHELL_BUILTINS:
+            return {"status": "ok", "message": "shell 内置命令"}
+        if os.path.dirname(program):
+            exe = program if os.path.isabs(program) else os.path.join(startdir or os.getcwd(), program)
+            exe = exe if os.path.isfile(exe) else None
+        else:
+            # cmd 会先在当前目录（即起始目录）中查找程序
+            exe = shutil.which(program) or (shutil.which(program, path=startdir) if startdir else None)
+        if exe is None:
+            return {"status": "missing", "message": f"找不到程序: {program}"}
+        result = {"status": "ok", "exe": os.path.abspath(exe), "message": ""}
+        if version and fields["version_args"]:
+            result["version"] = self.probe_version(result["exe"], fields["version_args"])
+        return result
+
+    def probe_version(self, exe, args):
+        try:
+            stat = os.stat(exe)
+        except OSError:
+            return ""
+        key = [stat.st_mtime, stat.st_size, args]
+        with self._lock:
+            cached = self.versions.get(exe)
+            if cached and cached["key"] == key:
+                return cached["version"]
+        flags = subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+        try:
+            completed = subprocess.run([exe] + shlex.split(args, posix=sys.platform != 'win32'),
+                                       stdin=subprocess.DEVNULL, capture_output=True,
+                                       timeout=self.VERSION_TIMEOUT, creationflags=flags)
+            output = (completed.stdout.strip() or completed.stderr).decode("utf-8", "replace")
+            version = next((line.strip() for line in output.splitlines() if line.strip()), "")[:80]
+        except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+            print(f"获取版本失败 {exe}: {e}")
+            version = ""
+        with self._lock:
+            self.versions[exe] = {"key": key, "version": version}
+            try:
+                temp = self.cache_path.with_name(self.cache_path.name + ".tmp")
+                with open(temp, "w", encoding="utf-8") as f:
+                    json.dump(self.versions, f, ensure_ascii=False)
+                os.replace(temp, self.cache_path)
+            except OSError as e:
+                print(f"写入工具检查缓存失败: {e}")
+        return version
+
+
+ICON_CACHE_DIR = "icon_cache"
+ICON_SIZE = 32
+
+
+def extract_exe_icon(path, size=ICON_SIZE):
+    """从 Windows 可执行文件中取出第一个图标，返回 PNG 字节；没有图标时返回 None
+
+    只使用 GDI 和 QImage，可以在工作线程中调用（QPixmap / QFileIconProvider 只能在主线程使用）。
+    """
+    from ctypes import wintypes
+    shell32, user32, gdi32 = ctypes.windll.shell32, ctypes.windll.user32, ctypes.windll.gdi32
+    shell32.ExtractIconExW.argtypes = [wintypes.LPCWSTR, ctypes.c_int, ctypes.POINTER(wintypes.HICON),
+                                       ctypes.POINTER(wintypes.HICON), wintypes.UINT]
+    gdi32.CreateCompatibleDC.restype = wintypes.HDC
+    gdi32.CreateDIBSection.restype = wintypes.HBITMAP
+    gdi32.CreateDIBSection.argtypes = [wintypes.HDC, ctypes.c_void_p, wintypes.UINT,
+                                       ctypes.POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.DWORD]
+    gdi32.SelectObject.restype = wintypes.HGDIOBJ
+    gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+    user32.DrawIconEx.argtypes = [wintypes.HDC, ctypes.c_int, ctypes.c_int, wintypes.HICON, ctypes.c_int,
+                                  ctypes.c_int, wintypes.UINT, wintypes.HBRUSH, wintypes.UINT]
+
+    class BITMAPINFOHEADER(ctypes.Structure):
+        _fields_ = [("biSize", wintypes.DWORD), ("biWidth", wintypes.LONG), ("biHeight", wintypes.LONG),
+                    ("biPlanes", wintypes.WORD), ("biBitCount", wintypes.WORD), ("biCompression", wintypes.DWORD),
+                    ("biSizeImage", wintypes.DWORD), ("biXPelsPerMeter", wintypes.LONG),
+                    ("biYPelsPerMeter", wintypes.LONG), ("biClrUsed", wintypes.DWORD),
+                    ("biClrImportant", wintypes.DWORD)]
+
+    icon = wintypes.HICON()
+    if shell32.ExtractIconExW(str(path), 0, ctypes.byref(icon), None, 1) < 1 or not icon:
+        return None
+    try:
+        # 自上而下的 32 位 DIB，DrawIconEx 画入后逐像素读出 BGRA
+        header = BITMAPINFOHEADER(ctypes.sizeof(BITMAPINFOHEADER), size, -size, 1, 32, 0, 0, 0, 0, 0, 0)
+        bits = ctypes.c_void_p()
+        hdc = gdi32.CreateCompatibleDC(None)
+        dib = gdi32.CreateDIBSection(hdc, ctypes.byref(header), 0, ctypes.byref(bits), None, 0)
+        old = gdi32.SelectObject(hdc, dib)
+        user32.DrawIconEx(hdc, 0, 0, icon, size, size, 0, None, 3)  # DI_NORMAL
+        data = bytearray(ctypes.string_at(bits, size * size * 4))
+        gdi32.SelectObject(hdc, old)
+        gdi32.DeleteObject(dib)
+        gdi32.DeleteDC(hdc)
+    finally:
+        user32.DestroyIcon(icon)
+    if not any(data[3::4]):
+        data[3::4] = b"\xff" * (size * size)  # 没有 alpha 通道的旧式图标
+    image = QImage(bytes(data), size, size, QImage.Format_ARGB32)
+    return image_to_png(image)
+
+
+def glyph_params(name):
+    """字形图标的内容：名称的首字符和按名称取的色相"""
+    text = (name.strip()[:1] or "?").upper()
+    hue = hashlib.sha1(name.encode("utf-8")).digest()[0] * 360 // 256
+    return text, hue
+
+
+def render_glyph(name, size=ICON_SIZE):
+    """生成字形图标的 PNG：按名称着色的圆角方块上写首字符（可以在工作线程中调用）"""
+    text, hue = glyph_params(name)
+    image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(QColor.fromHsv(hue, 110, 235))
+    painter.drawRoundedRect(0, 0, size, size, size // 5, size // 5)
+    font = QFont()
+    font.setPixelSize(int(size * 0.55))
+    font.setBold(True)
+    painter.setFont(font)
+    painter.setPen(QColor("#1e1e2e"))
+    painter.drawText(image.rect(), Qt.AlignCenter, text)
+    painter.end()
+    return image_to_png(image)
+
+
+def image_to_png(image):
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+class IconCache(QObject):
+    """工具卡片的图标
+
+    Windows 上从工具的可执行文件中提取图标，其他情况（没有程序、不是 exe、提取失败）生成字形。
+    提取在工作线程中进行；PNG 以内容的 SHA-1 命名保存在 icon_cache/ 中，index.tsv 记录
+    "程序|修改时间|大小" 或字形参数到摘要的映射，同一个程序、同一种字形只处理一次。
+    界面只为滚动到可见区域的卡片请求图标，解码后的 QPixmap 按摘要缓存在内存中。
+    """
+    icon_ready = pyqtSignal(str)  # 工具 id
+    _loaded = pyqtSignal(str, str, bytes)  # (工具 id, 摘要, PNG)，由工作线程发出
+    MEMORY_LIMIT = 2000
+
+    def __init__(self, resolve, directory=ICON_CACHE_DIR, parent=None):
+        super().__init__(parent)
+        self.resolve = resolve  # 工具字段 -> 可执行文件路径或 None，在工作线程中调用
+        self.directory = Path(directory)
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.index = None  # {键: 摘要}，第一次使用时在工作线程中加载
+        self._lock = threading.Lock()
+        self.pixmaps = OrderedDict()  # {摘要: QPixmap}
+        self.tool_digests = {}  # {工具 id: 摘要}
+        self.pending = set()
+        self._loaded.connect(self._on_loaded)
+
+    def pixmap(self, tool_id):
+        """已在内存中的图标，没有时返回 None（不读磁盘）"""
+        digest = self.tool_digests.get(tool_id)
+        pixmap = self.pixmaps.get(digest) if digest else None
+        if pixmap is not None:
+            self.pixmaps.move_to_end(digest)
+        return pixmap
+
+    def request(self, tool):
+        tool_id = tool.get("id")
+        if tool_id in self.pending or self.pixmap(tool_id) is not None:
+            return
+        self.pending.add(tool_id)
+        fields = ToolValidator.fields(tool)
+        self.pool.submit(self._load, tool_id, tool.get("name", ""), fields)
+
+    def forget(self, tool_id):
+        """工具被编辑后重新获取图标"""
+        self.tool_digests.pop(tool_id, None)
+
+    def _load(self, tool_id, name, fields):
+        try:
+            exe = self.resolve(fields)
+            if exe and sys.platform == 'win32' and exe.lower().endswith((".exe", ".dll", ".ico")):
+                stat = os.stat(exe)
+                key = f"{exe}|{stat.st_mtime}|{stat.st_size}"
+                render = lambda: extract_exe_icon(exe) or render_glyph(name)
+            else:
+                key = "glyph|%s|%d" % glyph_params(name)
+                render = lambda: render_glyph(name)
+            digest, data = self._cached(key)
+            if data is None:
+                data = render()
+                digest = self._store(key, data)
+            self._loaded.emit(tool_id, digest, data)
+        except Exception as e:
+            print(f"加载图标失败 {name}: {e}")
+            self._loaded.emit(tool_id, "", b"")
+
+    def _ensure_index(self):
+        if self.index is not None:
+            return
+        self.index = {}
+        try:
+            with open(self.directory / "index.tsv", "r", encoding="utf-8") as f:
+                for line in f:
+                    key, _, digest = line.rstrip("\n").rpartition("\t")
+                    if key:
+                        self.index[key] = digest
+        except FileNotFoundError:
+            pass
+
+    def _cached(self, key):
+        with self._lock:
+            self._ensure_index()
+            digest = self.index.get(key)
+        if digest:
+            try:
+                return digest, (self.directory / f"{digest}.png").read_bytes()
+            except OSError:
+                pass
+        return None, None
+
+    def _store(self, key, data):
+        digest = hashlib.sha1(data).hexdigest()
+        path = self.directory / f"{digest}.png"
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if not path.exists():
+                temp = path.with_suffix(".tmp")
+                temp.write_bytes(data)
+                os.replace(temp, path)
+            self.index[key] = digest
+            with open(self.directory / "index.tsv", "a", encoding="utf-8") as f:
+                f.write(f"{key}\t{digest}\n")
+        return digest
+
+    def _on_loaded(self, tool_id, digest, data):
+        self.pending.discard(tool_id)
+        if not digest:
+            return
+        if digest not in self.pixmaps:
+            pixmap = QPixmap()
+            pixmap.loadFromData(data, "PNG")
+            self.pixmaps[digest] = pixmap
+            while len(self.pixmaps) > self.MEMORY_LIMIT:
+                self.pixmaps.popitem(last=False)
+        self.tool_digests[tool_id] = digest
+        self.icon_ready.emit(tool_id)
+
+
+class AddToolDialog(QDialog):
+    """添加/编辑工具对话框"""
+    FIELDS = ("name", "category", "path", "command", "startdir", "description", "capture", "parser",
+              "cache_ttl", "version_args", "tags")  # 对话框可编辑的字段
+    def __init__(self, parent=None, categories=None, tool_data=None):
+        super().__init__(parent)
+        self.categories = categories or ["默认"]
+        self.tool_data = tool_data
+        # 去掉问号图标
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.init_ui()
+        # 设置深色标题栏
+        self.set_dark_titlebar()
+
+    def set_dark_titlebar(self):
+        """Windows深色标题栏"""
+        if sys.platform == 'win32':
+            try:
+                hwnd = int(self.winId())
+                DWMWA_USE_IMMERSIVE_DARK_MODE = 20
+                DWMWA_CAPTION_COLOR = 35
+                ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                    hwnd, DWMWA_USE_IMMERSIVE_DARK_MODE,
+                    ctypes.byref(ctypes.c_int(1)), ctypes.sizeof(ctypes.c_int)
+                )
+                color = 0x002e1e1e  # BGR: #1e1e2e
+                ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                    hwnd, DWMWA_CAPTION_COLOR,
+                    ctypes.byref(ctypes.c_int(color)), ctypes.sizeof(ctypes.c_int)
+                )
+            except:
+                pass
+
+    def init_ui(self):
+        self.setWindowTitle("添加工具" if not self.tool_data else "编辑工具")
+        self.setMinimumWidth(500)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #1e1e2e;
+            }
+            QLabel {
+                color: #cdd6f4;
+                font-size: 18px;
+            }
+            QLineEdit, QComboBox, QTextEdit {
+                background-color: #313244;
+                color: #cdd6f4;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                padding: 10px;
+                font-size: 18px;
+            }
+            QLineEdit:focus, QTextEdit:focus {
+                border: 1px solid #89b4fa;
+            }
+            QPushButton {
+                background-color: #89b4fa;
+                color: #1e1e2e;
+                border: none;
+                border-radius: 5px;
+                padding: 12px 24px;
+                font-size: 18px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #b4befe;
+            }
+            QPushButton#cancelBtn {
+                background-color: #45475a;
+                color: #cdd6f4;
+            }
+        """)
+
+        layout = QFormLayout(self)
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        # 工具名称
+        self.name_edit = QLineEdit()
+        self.name_edit.setPlaceholderText("例如: Nmap")
+        layout.addRow("工具名称:", self.name_edit)
+
+        # 分类
+        self.category_combo = QComboBox()
+        self.category_combo.addItems(self.categories)
+        self.category_combo.setEditable(True)
+        layout.addRow("分类:", self.category_combo)
+
+        # 路径（工具可执行文件路径）
+        self.path_edit = QLineEdit()
+        self.path_edit.setPlaceholderText("工具可执行文件路径")
+        layout.addRow("路径:", self.path_edit)
+
+        # 参数
+        self.command_edit = QTextEdit()
+        self.command_edit.setPlaceholderText("参数，使用 {url} 作为目标占位符，{outdir} 作为本次运行的输出目录")
+        self.command_edit.setMaximumHeight(100)
+        layout.addRow("参数:", self.command_edit)
+
+        # 起始位置（工作目录）
+        self.startdir_edit = QLineEdit()
+        self.startdir_edit.setPlaceholderText("工具执行的起始目录")
+        layout.addRow("起始位置:", self.startdir_edit)
+
+        # 描述
+        self.desc_edit = QLineEdit()
+        self.desc_edit.setPlaceholderText("工具描述")
+        layout.addRow("描述:", self.desc_edit)
+
+        # 捕获输出
+        self.capture_check = QCheckBox("捕获输出到运行目录（不弹出窗口）")
+        self.capture_check.setStyleSheet("color: #cdd6f4; font-size: 16px;")
+        layout.addRow("", self.capture_check)
+
+        # 结果解析器（需要捕获输出）
+        self.parser_combo = QComboBox()
+        self.parser_combo.addItem("(无)", "")
+        for name in RESULT_PARSERS:
+            self.parser_combo.addItem(name, name)
+        self.parser_combo.currentIndexChanged.connect(self.sync_capture)
+        layout.addRow("结果解析:", self.parser_combo)
+
+        # 结果缓存有效期（需要捕获输出或 {outdir}），0 表示不缓存
+        self.cache_spin = QSpinBox()
+        self.cache_spin.setRange(0, 7 * 24 * 60)
+        self.cache_spin.setSuffix(" 分钟")
+        self.cache_spin.setSpecialValueText("不缓存")
+        self.cache_spin.setStyleSheet("""
+            QSpinBox {
+                background-color: #313244;
+                color: #cdd6f4;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                padding: 10px;
+                font-size: 18px;
+            }
+        """)
+        layout.addRow("结果缓存:", self.cache_spin)
+
+        # 获取版本的参数，后台检查工具时运行一次并显示在卡片上
+        self.version_edit = QLineEdit()
+        self.version_edit.setPlaceholderText("例如 --version，留空不获取版本")
+        layout.addRow("版本参数:", self.version_edit)
+
+        # 标签：工具可以带多个标签，按标签组合筛选，不受分类限制
+        self.tags_edit = QLineEdit()
+        self.tags_edit.setPlaceholderText("用逗号或空格分隔，例如 web, 被动")
+        layout.addRow("标签:", self.tags_edit)
+
+        # 按钮
+        btn_layout = QHBoxLayout()
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setObjectName("cancelBtn")
+        self.cancel_btn.clicked.connect(self.reject)
+        
+        self.save_btn = QPushButton("保存")
+        self.save_btn.clicked.connect(self.accept)
+        
+        btn_layout.addWidget(self.cancel_btn)
+        btn_layout.addWidget(self.save_btn)
+        layout.addRow(btn_layout)
+
+        # 如果是编辑模式，填充数据
+        if self.tool_data:
+            self.name_edit.setText(self.tool_data.get("name", ""))
+            self.category_combo.setCurrentText(self.tool_data.get("category", "默认"))
+            self.path_edit.setText(self.tool_data.get("path", ""))
+            self.command_edit.setText(self.tool_data.get("command", ""))
+            self.startdir_edit.setText(self.tool_data.get("startdir", "") or self.tool_data.get("workdir", ""))
+            self.desc_edit.setText(self.tool_data.get("description", ""))
+            self.capture_check.setChecked(bool(self.tool_data.get("capture")))
+            parser_index = self.parser_combo.findData(self.tool_data.get("parser") or "")
+            self.parser_combo.setCurrentIndex(max(parser_index, 0))
+            self.cache_spin.setValue(int(self.tool_data.get("cache_ttl") or 0))
+            self.version_edit.setText(self.tool_data.get("version_args") or "")
+            self.tags_edit.setText(", ".join(self.tool_data.get("tags") or ()))
+
+    def sync_capture(self):
+        """解析器读取捕获的输出：选择解析器时强制捕获输出"""
+        parser = bool(self.parser_combo.currentData())
+        if parser:
+            self.capture_check.setChecked(True)
+        self.capture_check.setEnabled(not parser)
+
+    def get_tool_data(self):
+        return ToolRecord({
+            "name": self.name_edit.text().strip(),
+            "category": self.category_combo.currentText().strip(),
+            "path": self.path_edit.text().strip(),
+            "command": self.command_edit.toPlainText().strip(),
+            "startdir": self.startdir_edit.text().strip(),
+            "description": self.desc_edit.text().strip(),
+            "capture": self.capture_check.isChecked() or bool(self.parser_combo.currentData()),
+            "parser": self.parser_combo.currentData(),
+            "cache_ttl": self.cache_spin.value(),
+            "version_args": self.version_edit.text().strip(),
+            "tags": normalize_tags(self.tags_edit.text())
+        })
+
+
+class DarkInputDialog(QDialog):
+    """深色主题输入对话框"""
+    def __init__(self, parent=None, title="", label="", text="", items=None):
+        super().__init__(parent)
+        self.items = items
+        self.result_text = ""
+        # 去掉问号图标
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.init_ui(title, label, text)
+        self.set_dark_titlebar()
+
+    def set_dark_titlebar(self):
+        """Windows深色标题栏"""
+        if sys.platform == 'win32':
+            try:
+                hwnd = int(self.winId())
+                DWMWA_USE_IMMERSIVE_DARK_MODE = 20
+                DWMWA_CAPTION_COLOR = 35
+                ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                    hwnd, DWMWA_USE_IMMERSIVE_DARK_MODE,
+                    ctypes.byref(ctypes.c_int(1)), ctypes.sizeof(ctypes.c_int)
+                )
+                color = 0x002e1e1e  # BGR: #1e1e2e
+                ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                    hwnd, DWMWA_CAPTION_COLOR,
+                    ctypes.byref(ctypes.c_int(color)), ctypes.sizeof(ctypes.c_int)
+                )
+            except:
+                pass
+
+    def init_ui(self, title, label, text):
+        self.setWindowTitle(title)
+        self.setMinimumWidth(350)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #1e1e2e;
+            }
+            QLabel {
+                color: #cdd6f4;
+                font-size: 16px;
+            }
+            QLineEdit, QComboBox {
+                background-color: #313244;
+                color: #cdd6f4;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                padding: 10px;
+                font-size: 16px;
+            }
+            QPushButton {
+                background-color: #89b4fa;
+                color: #1e1e2e;
+                border: none;
+                border-radius: 5px;
+                padding: 10px 20px;
+                font-size: 16px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #b4befe;
+            }
+            QPushButton#cancelBtn {
+                background-color: #45475a;
+                color: #cdd6f4;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        # 标签
+        lbl = QLabel(label)
+        layout.addWidget(lbl)
+
+        # 输入框或下拉框
+        if self.items:
+            self.input = QComboBox()
+            self.input.addItems(self.items)
+        else:
+            self.input = QLineEdit()
+            self.input.setText(text)
+        layout.addWidget(self.input)
+
+        # 按钮
+        btn_layout = QHBoxLayout()
+        cancel_btn = QPushButton("取消")
+        cancel_btn.setObjectName("cancelBtn")
+        cancel_btn.clicked.connect(self.reject)
+        
+        ok_btn = QPushButton("确定")
+        ok_btn.clicked.connect(self.accept)
+        
+        btn_layout.addWidget(cancel_btn)
+        btn_layout.addWidget(ok_btn)
+        layout.addLayout(btn_layout)
+
+    def get_text(self):
+        if self.items:
+            return self.input.currentText()
+        return self.input.text()
+
+
+class SortableTableItem(QTableWidgetItem):
+    """按 UserRole 中的原始值排序的表格项"""
+    def __lt__(self, other):
+        return self.data(Qt.UserRole) < other.data(Qt.UserRole)
+
+
+class RunHistoryDialog(QDialog):
+    """运行历史统计对话框"""
+    def __init__(self, parent=None, tools=None, history=None, store=None):
+        super().__init__(parent)
+        self.tools = tools or []
+        self.history = history
+        self.store = store
+        # 去掉问号图标
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.init_ui()
+        self.set_dark_titlebar()
+
+    def set_dark_titlebar(self):
+        """Windows深色标题栏"""
+        if sys.platform == 'win32':
+            try:
+                hwnd = int(self.winId())
+                DWMWA_USE_IMMERSIVE_DARK_MODE = 20
+                DWMWA_CAPTION_COLOR = 35
+                ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                    hwnd, DWMWA_USE_IMMERSIVE_DARK_MODE,
+                    ctypes.byref(ctypes.c_int(1)), ctypes.sizeof(ctypes.c_int)
+                )
+                color = 0x002e1e1e  # BGR: #1e1e2e
+                ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                    hwnd, DWMWA_CAPTION_COLOR,
+                    ctypes.byref(ctypes.c_int(color)), ctypes.sizeof(ctypes.c_int)
+                )
+            except:
+                pass
+
+    def init_ui(self):
+        self.setWindowTitle("运行历史")
+        self.resize(900, 600)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #1e1e2e;
+            }
+            QTableWidget {
+                background-color: #313244;
+                color: #cdd6f4;
+                gridline-color: #45475a;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                font-size: 15px;
+            }
+            QHeaderView::section {
+                background-color: #45475a;
+                color: #cdd6f4;
+                border: none;
+                padding: 6px;
+                font-size: 15px;
+                font-weight: bold;
+            }
+            QPushButton {
+                background-color: #89b4fa;
+                color: #1e1e2e;
+                border: none;
+                border-radius: 5px;
+                padding: 10px 20px;
+                font-size: 16px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #b4befe;
+            }
+            QPushButton:disabled {
+                background-color: #45475a;
+                color: #6c7086;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(15)
+
+        headers = ["工具", "分类", "运行次数", "P50 耗时", "P95 耗时", "失败率", "最近运行"]
+        self.table = QTableWidget(0, len(headers))
+        self.table.setHorizontalHeaderLabels(headers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        self.diff_btn = QPushButton("对比运行...")
+        self.diff_btn.setEnabled(False)
+        self.diff_btn.clicked.connect(self.show_diff)
+        self.table.itemSelectionChanged.connect(
+            lambda: self.diff_btn.setEnabled(bool(self.table.selectedItems()))
+        )
+        self.table.cellDoubleClicked.connect(lambda row, col: self.show_diff())
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.accept)
+        btn_layout = QHBoxLayout()
+        btn_layout.addWidget(self.diff_btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+        self.populate()
+
+    def populate(self):
+        self.history.ensure_loaded()
+        rows = []
+        known_ids = set()
+        for tool in self.tools:
+            tool_id = tool.get("id")
+            known_ids.add(tool_id)
+            if tool_id in self.history.runs:
+                rows.append((tool.get("name", ""), tool.get("category", ""), tool_id))
+        # 已删除工具的历史仍然显示
+        for tool_id in self.history.runs:
+            if tool_id not in known_ids:
+                rows.append((self.history.names.get(tool_id, tool_id), "(已删除)", tool_id))
+
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for row, (name, category, tool_id) in enumerate(rows):
+            runs, p50, p95, failure_rate = self.history.stats(tool_id)
+            last = self.history.last_run.get(tool_id)
+            cells = [
+                (name, name),
+                (category, category),
+                (str(runs), runs),
+                (format_duration(p50), p50 if p50 is not None else -1),
+                (format_duration(p95), p95 if p95 is not None else -1),
+                ("-" if failure_rate is None else f"{failure_rate:.0%}", failure_rate if failure_rate is not None else -1),
+                (time.strftime("%Y-%m-%d %H:%M", time.localtime(last)) if last else "-", last or 0),
+            ]
+            for col, (text, sort_value) in enumerate(cells):
+                item = SortableTableItem(text)
+                item.setData(Qt.UserRole, sort_value)
+                self.table.setItem(row, col, item)
+            self.table.item(row, 0).setData(Qt.UserRole + 1, tool_id)
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(4, Qt.DescendingOrder)
+
+    def show_diff(self):
+        """对比选中工具的两次运行"""
+        row = self.table.currentRow()
+        if row < 0:
+            return
+        item = self.table.item(row, 0)
+        dialog = RunDiffDialog(self, self.history, self.store, item.data(Qt.UserRole + 1), item.text())
+        dialog.exec_()
+
+
+class RunDiffDialog(QDialog):
+    """同一工具对同一目标的两次运行对比"""
+    CHANGE_COLORS = {"新增": "#a6e3a1", "消失": "#f38ba8", "变化": "#f9e2af"}
+    _diff_ready = pyqtSignal(object)  # 由后台对比线程发出
+
+    def __init__(self, parent=None, history=None, store=None, tool_id="", tool_name=""):
         super().__init__(parent)
-        self.categories = categories or ["默认"]
-        self.tool_data = tool_data
+        self.history = history
+        self.store = store
+        self.tool_id = tool_id
+        self.tool_name = tool_name
+        # 该工具留有输出目录的运行，按目标分组，新的在前
+        self.runs_by_target = {}
+        for record in self.history.iter_records():
+            if record.get("tool") == tool_id and record.get("dir"):
+                self.runs_by_target.setdefault(record.get("target", ""), []).insert(0, record)
+        self._diff_ready.connect(self.show_diff)
         # 去掉问号图标
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
         self.init_ui()
-        # 设置深色标题栏
         self.set_dark_titlebar()
 
     def set_dark_titlebar(self):
@@ -60,123 +3739,488 @@ class AddToolDialog(QDialog):
                 pass
 
     def init_ui(self):
-        self.setWindowTitle("添加工具" if not self.tool_data else "编辑工具")
-        self.setMinimumWidth(500)
+        self.setWindowTitle(f"运行对比 - {self.tool_name}")
+        self.resize(1000, 650)
         self.setStyleSheet("""
             QDialog {
                 background-color: #1e1e2e;
             }
-            QLabel {
+            QComboBox {
+                background-color: #313244;
                 color: #cdd6f4;
-                font-size: 18px;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                padding: 8px;
+                font-size: 15px;
             }
-            QLineEdit, QComboBox, QTextEdit {
+            QTableWidget {
                 background-color: #313244;
                 color: #cdd6f4;
+                gridline-color: #45475a;
                 border: 1px solid #45475a;
                 border-radius: 5px;
-                padding: 10px;
-                font-size: 18px;
+                font-size: 15px;
             }
-            QLineEdit:focus, QTextEdit:focus {
-                border: 1px solid #89b4fa;
+            QHeaderView::section {
+                background-color: #45475a;
+                color: #cdd6f4;
+                border: none;
+                padding: 6px;
+                font-size: 15px;
+                font-weight: bold;
+            }
+            QTabWidget::pane {
+                border: none;
+            }
+            QTabBar::tab {
+                background-color: #313244;
+                color: #cdd6f4;
+                padding: 8px 20px;
+                font-size: 15px;
+            }
+            QTabBar::tab:selected {
+                background-color: #45475a;
+            }
+            QLabel {
+                color: #a6adc8;
+                font-size: 14px;
             }
             QPushButton {
                 background-color: #89b4fa;
                 color: #1e1e2e;
                 border: none;
                 border-radius: 5px;
-                padding: 12px 24px;
-                font-size: 18px;
+                padding: 8px 20px;
+                font-size: 15px;
                 font-weight: bold;
             }
             QPushButton:hover {
                 background-color: #b4befe;
             }
-            QPushButton#cancelBtn {
+            QPushButton:disabled {
+                background-color: #45475a;
+                color: #6c7086;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
+
+        top_layout = QHBoxLayout()
+        self.target_combo = QComboBox()
+        self.target_combo.addItems(list(self.runs_by_target))
+        self.old_combo = QComboBox()
+        self.new_combo = QComboBox()
+        self.diff_btn = QPushButton("对比")
+        self.diff_btn.clicked.connect(self.start_diff)
+        top_layout.addWidget(QLabel("目标:"))
+        top_layout.addWidget(self.target_combo, 2)
+        top_layout.addWidget(QLabel("旧:"))
+        top_layout.addWidget(self.old_combo, 1)
+        top_layout.addWidget(QLabel("新:"))
+        top_layout.addWidget(self.new_combo, 1)
+        top_layout.addWidget(self.diff_btn)
+        layout.addLayout(top_layout)
+
+        self.tabs = QTabWidget()
+        self.findings_table = QTableWidget(0, 7)
+        self.findings_table.setHorizontalHeaderLabels(["变化", "类型", "主机", "端口", "服务", "路径", "详情"])
+        self.output_table = QTableWidget(0, 3)
+        self.output_table.setHorizontalHeaderLabels(["变化", "行号", "内容"])
+        for table, stretch in ((self.findings_table, 6), (self.output_table, 2)):
+            table.verticalHeader().setVisible(False)
+            table.setEditTriggers(QTableWidget.NoEditTriggers)
+            table.setSelectionBehavior(QTableWidget.SelectRows)
+            table.horizontalHeader().setSectionResizeMode(stretch, QHeaderView.Stretch)
+        self.tabs.addTab(self.findings_table, "发现")
+        self.tabs.addTab(self.output_table, "输出")
+        layout.addWidget(self.tabs)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.target_combo.currentIndexChanged.connect(self.populate_runs)
+        self.populate_runs()
+
+    def populate_runs(self):
+        runs = self.runs_by_target.get(self.target_combo.currentText(), [])
+        for combo in (self.old_combo, self.new_combo):
+            combo.clear()
+            for record in runs:
+                started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.get("start") or 0))
+                combo.addItem(started, record)
+        if len(runs) >= 2:
+            self.old_combo.setCurrentIndex(1)
+        self.diff_btn.setEnabled(len(runs) >= 2)
+        self.summary_label.setText("" if len(runs) >= 2 else "该目标至少需要两次留有输出的运行才能对比")
+
+    def start_diff(self):
+        old, new = self.old_combo.currentData(), self.new_combo.currentData()
+        if old is None or new is None or old is new:
+            return
+        self.diff_btn.setEnabled(False)
+        self.summary_label.setText("正在对比...")
+        threading.Thread(target=self._run_diff, args=(old, new), daemon=True).start()
+
+    def _run_diff(self, old, new):
+        try:
+            result = diff_runs(old, new, self.store)
+        except Exception as e:
+            print(f"对比运行失败: {e}")
+            result = None
+        self._diff_ready.emit(result)
+
+    def show_diff(self, result):
+        self.diff_btn.setEnabled(True)
+        if result is None:
+            self.summary_label.setText("对比失败：运行输出可能已被清理")
+            return
+        findings = result["findings"]
+        self.findings_table.setRowCount(len(findings))
+        for row, (change, finding) in enumerate(findings):
+            port = finding.get("port")
+            values = [change, finding.get("kind"), finding.get("host"), "" if port is None else str(port),
+                      finding.get("service"), finding.get("path"), finding.get("detail")]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value or "")
+                if col == 0:
+                    item.setForeground(QColor(self.CHANGE_COLORS[change]))
+                self.findings_table.setItem(row, col, item)
+
+        (added, added_lines), (removed, removed_lines) = result["added"], result["removed"]
+        lines = [("新增", n, text) for n, text in added_lines] + [("消失", n, text) for n, text in removed_lines]
+        self.output_table.setRowCount(len(lines))
+        for row, (change, lineno, text) in enumerate(lines):
+            for col, value in enumerate((change, str(lineno), text)):
+                item = QTableWidgetItem(value)
+                if col == 0:
+                    item.setForeground(QColor(self.CHANGE_COLORS[change]))
+                self.output_table.setItem(row, col, item)
+
+        summary = f"发现：{len(findings)} 处变化；"
+        if result["identical"]:
+            summary += "输出内容完全相同"
+        else:
+            summary += f"输出：新增 {added} 行，消失 {removed} 行"
+            if len(lines) < added + removed:
+                summary += f"（只显示前 {len(lines)} 行）"
+        self.summary_label.setText(summary)
+
+
+class FindingsDialog(QDialog):
+    """发现结果查询对话框"""
+    SEVERITY_COLORS = {"high": "#f38ba8", "medium": "#fab387", "low": "#f9e2af", "info": "#a6adc8"}
+
+    def __init__(self, parent=None, store=None):
+        super().__init__(parent)
+        self.store = store
+        # 去掉问号图标
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.init_ui()
+        self.set_dark_titlebar()
+
+    def set_dark_titlebar(self):
+        """Windows深色标题栏"""
+        if sys.platform == 'win32':
+            try:
+                hwnd = int(self.winId())
+                DWMWA_USE_IMMERSIVE_DARK_MODE = 20
+                DWMWA_CAPTION_COLOR = 35
+                ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                    hwnd, DWMWA_USE_IMMERSIVE_DARK_MODE,
+                    ctypes.byref(ctypes.c_int(1)), ctypes.sizeof(ctypes.c_int)
+                )
+                color = 0x002e1e1e  # BGR: #1e1e2e
+                ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                    hwnd, DWMWA_CAPTION_COLOR,
+                    ctypes.byref(ctypes.c_int(color)), ctypes.sizeof(ctypes.c_int)
+                )
+            except:
+                pass
+
+    def init_ui(self):
+        self.setWindowTitle("发现结果")
+        self.resize(1000, 650)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #1e1e2e;
+            }
+            QLineEdit {
+                background-color: #313244;
+                color: #cdd6f4;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                padding: 10px;
+                font-size: 16px;
+            }
+            QLineEdit:focus {
+                border: 1px solid #89b4fa;
+            }
+            QTableWidget {
+                background-color: #313244;
+                color: #cdd6f4;
+                gridline-color: #45475a;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                font-size: 15px;
+            }
+            QHeaderView::section {
                 background-color: #45475a;
                 color: #cdd6f4;
+                border: none;
+                padding: 6px;
+                font-size: 15px;
+                font-weight: bold;
+            }
+            QLabel {
+                color: #a6adc8;
+                font-size: 14px;
             }
         """)
 
-        layout = QFormLayout(self)
-        layout.setSpacing(15)
+        layout = QVBoxLayout(self)
         layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
 
-        # 工具名称
-        self.name_edit = QLineEdit()
-        self.name_edit.setPlaceholderText("例如: Nmap")
-        layout.addRow("工具名称:", self.name_edit)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("按主机、端口、服务、路径或详情筛选")
+        layout.addWidget(self.search_edit)
 
-        # 分类
-        self.category_combo = QComboBox()
-        self.category_combo.addItems(self.categories)
-        self.category_combo.setEditable(True)
-        layout.addRow("分类:", self.category_combo)
+        headers = ["类型", "主机", "端口", "服务", "路径", "等级", "详情", "次数", "最近发现"]
+        self.table = QTableWidget(0, len(headers))
+        self.table.setHorizontalHeaderLabels(headers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(6, QHeaderView.Stretch)
+        layout.addWidget(self.table)
 
-        # 路径（工具可执行文件路径）
-        self.path_edit = QLineEdit()
-        self.path_edit.setPlaceholderText("工具可执行文件路径")
-        layout.addRow("路径:", self.path_edit)
+        self.count_label = QLabel()
+        layout.addWidget(self.count_label)
 
-        # 参数
-        self.command_edit = QTextEdit()
-        self.command_edit.setPlaceholderText("参数，使用 {url} 作为目标占位符")
-        self.command_edit.setMaximumHeight(100)
-        layout.addRow("参数:", self.command_edit)
+        # 输入停顿后再查询
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.refresh)
+        self.search_edit.textChanged.connect(self.search_timer.start)
 
-        # 起始位置（工作目录）
-        self.startdir_edit = QLineEdit()
-        self.startdir_edit.setPlaceholderText("工具执行的起始目录")
-        layout.addRow("起始位置:", self.startdir_edit)
+        self.refresh()
 
-        # 描述
-        self.desc_edit = QLineEdit()
-        self.desc_edit.setPlaceholderText("工具描述")
-        layout.addRow("描述:", self.desc_edit)
+    def refresh(self):
+        rows = self.store.query(self.search_edit.text().strip())
+        self.table.setRowCount(len(rows))
+        for row, (kind, host, port, service, path, severity, detail, hits, last_seen) in enumerate(rows):
+            values = [kind, host, "" if port is None else str(port), service, path, severity, detail,
+                      str(hits), time.strftime("%Y-%m-%d %H:%M", time.localtime(last_seen))]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value or "")
+                if col == 5:
+                    item.setForeground(QColor(self.SEVERITY_COLORS.get(severity, "#cdd6f4")))
+                self.table.setItem(row, col, item)
+        self.count_label.setText(f"显示 {len(rows)} 条（最多 500 条）")
 
-        # 按钮
-        btn_layout = QHBoxLayout()
-        self.cancel_btn = QPushButton("取消")
-        self.cancel_btn.setObjectName("cancelBtn")
-        self.cancel_btn.clicked.connect(self.reject)
-        
-        self.save_btn = QPushButton("保存")
-        self.save_btn.clicked.connect(self.accept)
-        
-        btn_layout.addWidget(self.cancel_btn)
-        btn_layout.addWidget(self.save_btn)
-        layout.addRow(btn_layout)
 
-        # 如果是编辑模式，填充数据
-        if self.tool_data:
-            self.name_edit.setText(self.tool_data.get("name", ""))
-            self.category_combo.setCurrentText(self.tool_data.get("category", "默认"))
-            self.path_edit.setText(self.tool_data.get("path", ""))
-            self.command_edit.setText(self.tool_data.get("command", ""))
-            self.startdir_edit.setText(self.tool_data.get("startdir", "") or self.tool_data.get("workdir", ""))
-            self.desc_edit.setText(self.tool_data.get("description", ""))
+class OutputSearchDialog(QDialog):
+    """捕获输出的全文搜索对话框"""
+    CONTEXT_LINES = 100  # 查看匹配行时前后各显示的行数
+    _results_ready = pyqtSignal(int, list)  # (查询序号, 结果)，由后台查询线程发出
+    _context_ready = pyqtSignal(int, int, str)  # (读取序号, 匹配行在文本中的行号，失败时为 -1, 文本)
 
-    def get_tool_data(self):
-        return {
-            "name": self.name_edit.text().strip(),
-            "category": self.category_combo.currentText().strip(),
-            "path": self.path_edit.text().strip(),
-            "command": self.command_edit.toPlainText().strip(),
-            "startdir": self.startdir_edit.text().strip(),
-            "description": self.desc_edit.text().strip()
-        }
+    def __init__(self, parent=None, index=None):
+        super().__init__(parent)
+        self.index = index
+        self.generation = 0
+        self.context_generation = 0
+        self.results = []
+        self._results_ready.connect(self.show_results)
+        self._context_ready.connect(self.show_context_text)
+        # 去掉问号图标
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+        self.init_ui()
+        self.set_dark_titlebar()
+
+    def set_dark_titlebar(self):
+        """Windows深色标题栏"""
+        if sys.platform == 'win32':
+            try:
+                hwnd = int(self.winId())
+                DWMWA_USE_IMMERSIVE_DARK_MODE = 20
+                DWMWA_CAPTION_COLOR = 35
+                ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                    hwnd, DWMWA_USE_IMMERSIVE_DARK_MODE,
+                    ctypes.byref(ctypes.c_int(1)), ctypes.sizeof(ctypes.c_int)
+                )
+                color = 0x002e1e1e  # BGR: #1e1e2e
+                ctypes.windll.dwmapi.DwmSetWindowAttribute(
+                    hwnd, DWMWA_CAPTION_COLOR,
+                    ctypes.byref(ctypes.c_int(color)), ctypes.sizeof(ctypes.c_int)
+                )
+            except:
+                pass
+
+    def init_ui(self):
+        self.setWindowTitle("搜索输出")
+        self.resize(1100, 750)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: #1e1e2e;
+            }
+            QLineEdit {
+                background-color: #313244;
+                color: #cdd6f4;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                padding: 10px;
+                font-size: 16px;
+            }
+            QLineEdit:focus {
+                border: 1px solid #89b4fa;
+            }
+            QTableWidget, QTextEdit {
+                background-color: #313244;
+                color: #cdd6f4;
+                gridline-color: #45475a;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                font-size: 15px;
+            }
+            QTextEdit {
+                font-family: Consolas, monospace;
+                font-size: 14px;
+            }
+            QHeaderView::section {
+                background-color: #45475a;
+                color: #cdd6f4;
+                border: none;
+                padding: 6px;
+                font-size: 15px;
+                font-weight: bold;
+            }
+            QLabel {
+                color: #a6adc8;
+                font-size: 14px;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
 
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索所有捕获的输出，例如 banner、CVE 编号或路径")
+        layout.addWidget(self.search_edit)
 
-class DarkInputDialog(QDialog):
-    """深色主题输入对话框"""
-    def __init__(self, parent=None, title="", label="", text="", items=None):
+        splitter = QSplitter(Qt.Vertical)
+        headers = ["工具", "目标", "运行", "文件", "行号", "内容"]
+        self.table = QTableWidget(0, len(headers))
+        self.table.setHorizontalHeaderLabels(headers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SingleSelection)
+        self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.Stretch)
+        self.table.currentCellChanged.connect(lambda row, col, prev_row, prev_col: self.show_context(row))
+        splitter.addWidget(self.table)
+
+        # 选中结果后显示该运行输出中匹配行附近的内容
+        self.context_view = QTextEdit()
+        self.context_view.setReadOnly(True)
+        self.context_view.setLineWrapMode(QTextEdit.NoWrap)
+        splitter.addWidget(self.context_view)
+        splitter.setSizes([400, 300])
+        layout.addWidget(splitter)
+
+        self.count_label = QLabel()
+        layout.addWidget(self.count_label)
+
+        # 输入停顿后再查询
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.start_search)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+
+    def start_search(self):
+        text = self.search_edit.text().strip()
+        self.generation += 1
+        if len(text) < 2:
+            self.show_results(self.generation, [])
+            return
+        self.count_label.setText("正在搜索...")
+        threading.Thread(target=self._search, args=(self.generation, text), daemon=True).start()
+
+    def _search(self, generation, text):
+        try:
+            results = self.index.search(text)
+        except Exception as e:
+            print(f"搜索输出失败: {e}")
+            results = []
+        self._results_ready.emit(generation, results)
+
+    def show_results(self, generation, results):
+        if generation != self.generation:
+            return  # 已有更新的查询
+        self.results = results
+        self.table.setRowCount(len(results))
+        for row, (doc, lineno, text) in enumerate(results):
+            values = [doc["name"], doc["target"], doc["run"], doc["file"], str(lineno), text]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value or ""))
+        self.context_generation += 1  # 丢弃还在读取的旧结果的上下文
+        self.context_view.clear()
+        self.count_label.setText(f"找到 {len(results)} 行（最多 200 行）")
+
+    def show_context(self, row):
+        """在后台线程中读取匹配行附近的内容：输出可能有几百 MB 或需要从 zip 归档中解压"""
+        self.context_generation += 1
+        if not 0 <= row < len(self.results):
+            return
+        doc, lineno, _ = self.results[row]
+        self.context_view.setPlainText("正在读取...")
+        threading.Thread(target=self._load_context, args=(self.context_generation, doc, lineno),
+                         daemon=True).start()
+
+    def _load_context(self, generation, doc, lineno):
+        first = max(1, lineno - self.CONTEXT_LINES)
+        lines = []
+        try:
+            with open_run_output(doc["dir"], doc["file"]) as f:
+                for number, line in enumerate(f, 1):
+                    if number > lineno + self.CONTEXT_LINES or generation != self.context_generation:
+                        break  # 读够了，或已经选中了别的结果
+                    if number >= first:
+                        lines.append(f"{number:>7}  {line.rstrip().decode('utf-8', 'replace')}")
+        except (OSError, KeyError, ValueError) as e:
+            self._context_ready.emit(generation, -1, f"无法读取输出: {e}")
+            return
+        self._context_ready.emit(generation, lineno - first, "\n".join(lines))
+
+    def show_context_text(self, generation, line, text):
+        if generation != self.context_generation:
+            return  # 已选中别的结果
+        self.context_view.setPlainText(text)
+        if line < 0:
+            return
+        # 选中并滚动到匹配的行
+        block = self.context_view.document().findBlockByNumber(line)
+        cursor = QTextCursor(block)
+        cursor.select(QTextCursor.LineUnderCursor)
+        self.context_view.setTextCursor(cursor)
+        self.context_view.ensureCursorVisible()
+
+
+class CachedOutputDialog(QDialog):
+    """命中结果缓存的任务不再启动，在这里显示上次运行捕获的输出"""
+    MAX_BYTES = 1 << 20  # 只显示输出的最后 1 MiB
+
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.items = items
-        self.result_text = ""
+        self.jobs = []
         # 去掉问号图标
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
-        self.init_ui(title, label, text)
+        self.init_ui()
         self.set_dark_titlebar()
 
     def set_dark_titlebar(self):
@@ -198,86 +4242,86 @@ class DarkInputDialog(QDialog):
             except:
                 pass
 
-    def init_ui(self, title, label, text):
-        self.setWindowTitle(title)
-        self.setMinimumWidth(350)
+    def init_ui(self):
+        self.setWindowTitle("缓存结果")
+        self.resize(1000, 650)
         self.setStyleSheet("""
             QDialog {
                 background-color: #1e1e2e;
             }
-            QLabel {
-                color: #cdd6f4;
-                font-size: 16px;
-            }
-            QLineEdit, QComboBox {
+            QListWidget, QTextEdit {
                 background-color: #313244;
                 color: #cdd6f4;
                 border: 1px solid #45475a;
                 border-radius: 5px;
-                padding: 10px;
-                font-size: 16px;
+                font-size: 15px;
             }
-            QPushButton {
-                background-color: #89b4fa;
-                color: #1e1e2e;
-                border: none;
-                border-radius: 5px;
-                padding: 10px 20px;
-                font-size: 16px;
-                font-weight: bold;
+            QListWidget::item:selected {
+                background-color: #45475a;
             }
-            QPushButton:hover {
-                background-color: #b4befe;
+            QTextEdit {
+                font-family: Consolas, monospace;
+                font-size: 14px;
             }
-            QPushButton#cancelBtn {
-                background-color: #45475a;
-                color: #cdd6f4;
+            QLabel {
+                color: #a6adc8;
+                font-size: 14px;
             }
         """)
 
         layout = QVBoxLayout(self)
-        layout.setSpacing(15)
         layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
 
-        # 标签
-        lbl = QLabel(label)
-        layout.addWidget(lbl)
+        splitter = QSplitter(Qt.Horizontal)
+        self.job_list = QListWidget()
+        self.job_list.currentRowChanged.connect(self.show_job)
+        splitter.addWidget(self.job_list)
+        self.output_view = QTextEdit()
+        self.output_view.setReadOnly(True)
+        self.output_view.setLineWrapMode(QTextEdit.NoWrap)
+        splitter.addWidget(self.output_view)
+        splitter.setSizes([280, 720])
+        layout.addWidget(splitter)
 
-        # 输入框或下拉框
-        if self.items:
-            self.input = QComboBox()
-            self.input.addItems(self.items)
-        else:
-            self.input = QLineEdit()
-            self.input.setText(text)
-        layout.addWidget(self.input)
+        self.info_label = QLabel()
+        layout.addWidget(self.info_label)
 
-        # 按钮
-        btn_layout = QHBoxLayout()
-        cancel_btn = QPushButton("取消")
-        cancel_btn.setObjectName("cancelBtn")
-        cancel_btn.clicked.connect(self.reject)
-        
-        ok_btn = QPushButton("确定")
-        ok_btn.clicked.connect(self.accept)
-        
-        btn_layout.addWidget(cancel_btn)
-        btn_layout.addWidget(ok_btn)
-        layout.addLayout(btn_layout)
+    def add_job(self, job):
+        self.jobs.append(job)
+        self.job_list.addItem(f"{job.tool.get('name', '未知')} — {job.target}")
+        if self.job_list.currentRow() < 0:
+            self.job_list.setCurrentRow(0)
 
-    def get_text(self):
-        if self.items:
-            return self.input.currentText()
-        return self.input.text()
+    def show_job(self, row):
+        if not 0 <= row < len(self.jobs):
+            return
+        job = self.jobs[row]
+        age = format_duration(time.time() - job.end)
+        self.info_label.setText(f"{age} 前的运行（运行 {job.cached['run']}）：{job.outdir}")
+        try:
+            with open_run_output(job.outdir, "stdout.log") as f:
+                size = f.seek(0, io.SEEK_END)
+                f.seek(max(0, size - self.MAX_BYTES))
+                data = f.read()
+        except (OSError, KeyError, ValueError):
+            self.output_view.setPlainText(f"该工具没有捕获输出，结果在输出目录中：{job.outdir}")
+            return
+        text = data.decode("utf-8", "replace")
+        if size > self.MAX_BYTES:
+            text = f"……（只显示最后 {self.MAX_BYTES // 1024} KB）\n" + text.partition("\n")[2]
+        self.output_view.setPlainText(text)
 
 
 class SubCategoryHeader(QFrame):
     """子分类标题组件"""
     drag_started = pyqtSignal(object)  # 拖拽开始信号
+    collapse_toggled = pyqtSignal()  # 单击可折叠标题时发出
     
-    def __init__(self, title, parent=None):
+    def __init__(self, title, parent=None, collapsed=None):
         super().__init__(parent)
         self.title = title
+        self.collapsed = collapsed  # None 表示不可折叠
         self._drag_start_pos = None
         self.init_ui()
     
@@ -296,6 +4340,13 @@ class SubCategoryHeader(QFrame):
         layout = QHBoxLayout(self)
         layout.setContentsMargins(10, 5, 10, 5)
         
+        # 折叠指示箭头
+        if self.collapsed is not None:
+            self.arrow_label = QLabel("▶" if self.collapsed else "▼")
+            self.arrow_label.setStyleSheet("color: #6c7086; font-size: 14px; border: none;")
+            self.arrow_label.setFixedWidth(20)
+            layout.addWidget(self.arrow_label)
+        
         # 标题
         self.title_label = QLabel(self.title)
         self.title_label.setStyleSheet("color: #89b4fa; font-size: 18px; font-weight: bold; border: none;")
@@ -319,11 +4370,18 @@ class SubCategoryHeader(QFrame):
             drag.setPixmap(pixmap.scaled(300, 50, Qt.KeepAspectRatio, Qt.SmoothTransformation))
             drag.setHotSpot(event.pos())
             
+            self._drag_start_pos = None
             self.drag_started.emit(self)
             drag.exec_(Qt.MoveAction)
         super().mouseMoveEvent(event)
     
     def mouseReleaseEvent(self, event):
+        # 没有发生拖拽的单击用于折叠/展开
+        if (self.collapsed is not None and event.button() == Qt.LeftButton and self._drag_start_pos
+                and (event.pos() - self._drag_start_pos).manhattanLength() < 10):
+            self._drag_start_pos = None
+            self.collapse_toggled.emit()
+            return
         self._drag_start_pos = None
         super().mouseReleaseEvent(event)
 
@@ -373,6 +4431,10 @@ class ToolCard(QFrame):
         self.tool_data = tool_data
         self._selected = False
         self._drag_start_pos = None
+        self.check_result = None
+        self.has_icon = False
+        self.icon_callback = None  # 请求图标的回调，图标就绪后由 set_icon 设置
+        self.selection = None  # SelectionModel，点击时在其中切换选中状态
         self.init_ui()
 
     def init_ui(self):
@@ -383,10 +4445,30 @@ class ToolCard(QFrame):
         layout.setContentsMargins(12, 10, 12, 10)
         layout.setSpacing(5)
 
-        # 工具名称
+        # 工具名称，右侧为后台检查结果的标记
+        name_row = QHBoxLayout()
+        name_row.setSpacing(6)
+        self.icon_label = QLabel()
+        self.icon_label.setObjectName("icon_label")
+        self.icon_label.setFixedSize(ICON_SIZE, ICON_SIZE)
+        self.icon_label.setStyleSheet("background: transparent; padding: 0px;")
+        name_row.addWidget(self.icon_label)
         self.name_label = QLabel(self.tool_data.get("name", "未命名"))
         self.name_label.setStyleSheet("color: #cdd6f4; font-size: 20px; font-weight: bold;")
-        layout.addWidget(self.name_label)
+        name_row.addWidget(self.name_label)
+        name_row.addStretch()
+        self.badge_label = QLabel()
+        self.badge_label.setObjectName("badge_label")
+        self.badge_label.hide()
+        name_row.addWidget(self.badge_label)
+        layout.addLayout(name_row)
+
+        # 标签
+        self.tags_label = QLabel()
+        self.tags_label.setStyleSheet("color: #a6adc8; font-size: 13px;")
+        layout.addWidget(self.tags_label)
+        self.shown_tags = None
+        self.set_tags(self.tool_data.get("tags") or ())
 
         # 描述
         desc = self.tool_data.get("description", "")
@@ -409,7 +4491,7 @@ class ToolCard(QFrame):
             """)
             # 更新子标签颜色
             for child in self.findChildren(QLabel):
-                if child.objectName() != "cmd_label":
+                if child.objectName() not in ("cmd_label", "badge_label", "icon_label"):
                     child.setStyleSheet(child.styleSheet().replace("#cdd6f4", "#1e1e2e").replace("#a6adc8", "#313244"))
         else:
             self.setStyleSheet("""
@@ -422,6 +4504,10 @@ class ToolCard(QFrame):
                     background-color: #45475a;
                 }
             """)
+            # 恢复子标签颜色
+            for child in self.findChildren(QLabel):
+                if child.objectName() not in ("cmd_label", "badge_label", "icon_label"):
+                    child.setStyleSheet(child.styleSheet().replace("#1e1e2e", "#cdd6f4").replace("#313244", "#a6adc8"))
 
     def mousePressEvent(self, event):
         """点击卡片切换选中状态"""
@@ -434,7 +4520,10 @@ class ToolCard(QFrame):
         if event.button() == Qt.LeftButton and self._drag_start_pos:
             # 只有在没有拖拽的情况下才切换选中状态
             if (event.pos() - self._drag_start_pos).manhattanLength() < 10:
-                self.set_selected(not self._selected)
+                if self.selection is not None:
+                    self.set_selected(self.selection.toggle(self.tool_data.get("id")))
+                else:
+                    self.set_selected(not self._selected)
         self._drag_start_pos = None
         super().mouseReleaseEvent(event)
     
@@ -463,6 +4552,39 @@ class ToolCard(QFrame):
             drag.exec_(Qt.MoveAction)
         super().mouseMoveEvent(event)
 
+    def set_icon(self, pixmap):
+        self.icon_label.setPixmap(pixmap)
+        self.has_icon = True
+
+    def set_tags(self, tags):
+        self.shown_tags = tuple(tags)
+        self.tags_label.setText("  ".join(f"#{tag}" for tag in self.shown_tags))
+        self.tags_label.setVisible(bool(self.shown_tags))
+
+    def paintEvent(self, event):
+        """卡片第一次出现在可见区域时才请求图标"""
+        if not self.has_icon and self.icon_callback:
+            self.icon_callback(self.tool_data)
+        super().paintEvent(event)
+
+    def set_check(self, result):
+        """显示工具检查结果：无法启动时为红色警告，否则显示版本（有的话）"""
+        self.check_result = result
+        status = result.get("status") if result else None
+        if status in ("missing", "startdir"):
+            text = "⚠ 找不到程序" if status == "missing" else "⚠ 目录不存在"
+            style = "color: #1e1e2e; background-color: #f38ba8; font-size: 12px; border-radius: 4px; padding: 1px 6px;"
+        elif status == "ok" and result.get("version"):
+            text = result["version"] if len(result["version"]) <= 24 else result["version"][:23] + "…"
+            style = "color: #a6adc8; background-color: #45475a; font-size: 12px; border-radius: 4px; padding: 1px 6px;"
+        else:
+            self.badge_label.hide()
+            return
+        self.badge_label.setText(text)
+        self.badge_label.setToolTip(result.get("message") or result.get("version", ""))
+        self.badge_label.setStyleSheet(style)
+        self.badge_label.show()
+
     def is_selected(self):
         return self._selected
 
@@ -479,6 +4601,13 @@ class ToolCard(QFrame):
 
 class MainWindow(QMainWindow):
     """主窗口"""
+    LAZY_BLOCK_ROWS = 6  # "全部"视图中每个延迟渲染块的行数
+    LAZY_PREFETCH_BLOCKS = 4  # 启动后空闲时预渲染的块数
+    LAZY_KEEP_SCREENS = 3  # 离开可见区域超过这么多屏的块换回占位控件，卡片放回回收池
+    MAX_POOLED_CARDS = 200  # 滚动回收的卡片最多保留这么多张，更早回收的销毁
+    idle_tasks_done = pyqtSignal()  # 空闲任务队列清空时发出
+    target_preview_ready = pyqtSignal(str, tuple)  # (目标文件路径, 统计)，由后台统计线程发出
+    
     def __init__(self):
         super().__init__()
         self.tools = []
@@ -486,8 +4615,80 @@ class MainWindow(QMainWindow):
         self.subcategories = {}  # 子分类: {category: [subcategory_name, ...]}
         self.tool_cards = []
         self.subcategory_headers = []  # 子分类标题组件列表
+        self.card_pool = {}  # 回收待复用的卡片: {id(tool): ToolCard}
+        self.cards_by_id = {}  # 当前显示的卡片: {工具 id: ToolCard}，与 tool_cards 同步
+        self.lazy_sections = []  # "全部"视图中延迟渲染的卡片分组
+        self.collapsed_sections = set()  # 折叠的分组: {(category, subcategory)}，subcategory 为空表示整个分类
+        self.card_height_hint = 90  # 未渲染分组的预估卡片高度
+        self.tag_index = TagIndex()
+        self.tag_filter = []  # 当前筛选的标签，与分类筛选叠加
+        self.tag_filter_mode = "or"  # "or": 带任一标签，"and": 带全部标签
+        self._tools_by_id = None  # id → 工具，保存配置后重建
+        self.selection_presets = []  # 选择预设: [{"name", "tools": [id]}]
+        self.selection = SelectionModel(self)  # 选中的工具 id，卡片只是它的显示
+        self._materialize_pending = False
+        self.idle_tasks = deque()  # 推迟到事件循环空闲时执行的工作
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setInterval(0)  # 0 间隔定时器只在事件队列清空后触发
+        self.idle_timer.timeout.connect(self.run_idle_task)
+        self.max_concurrent_jobs = 0  # 同时运行的任务上限，0 表示不限制
+        self.output_retention = {}  # 运行输出保留策略，见 OutputArchiver.DEFAULTS
+        self.pipelines = []  # 流水线定义: [{"name", "max_concurrent", "stages": [{"tools": [id], "feed"}]}]
+        self.schedules = []  # 定时任务: [{"name", "tools": [id], "targets", "trigger", "enabled", "last_run"}]
+        self.api_config = dict(CONTROL_API_DEFAULTS)  # 本机控制接口，默认关闭
+        self.workers = []  # 工作节点: [{"address": "host:port", "token"}]
+        self.metrics_config = dict(METRICS_DEFAULTS)  # 指标导出，默认关闭
+        self.stall_threshold = 0.5  # 界面卡顿超过该秒数时写入诊断日志，0 表示关闭
+        self.lag_probe = None
+        self.watchdog = None
+        self.tool_validator = ToolValidator(self)
+        self.tool_validator.checked.connect(self.on_tool_checked)
+        self._badges_pending = False
+        self.icon_cache = IconCache(lambda fields: self.tool_validator.check(fields, version=False).get("exe"),
+                                    parent=self)
+        self.icon_cache.icon_ready.connect(self.on_icon_ready)
+        self._icons_ready = set()
+        self.control_api = None
+        self.cli_api_port = None  # 命令行 --api-port 指定的端口，优先于配置
         self.load_config()
+        self.run_history = RunHistory()
+        self.findings_store = FindingsStore()
+        self.job_journal = JobJournal()
+        self.scheduler = JobScheduler(self.run_history, self.findings_store, self.max_concurrent_jobs, self)
+        self.scheduler.journal = self.job_journal
+        self.worker_pool = WorkerPool(self.scheduler, lambda: self.tools, self)
+        self.scheduler.workers = self.worker_pool
+        self.scheduler.validator = self.tool_validator
+        self.scheduler.job_finished.connect(self.on_job_finished)
+        self.scheduler.findings_found.connect(self.on_findings_found)
+        self.pipeline_runs = []  # 正在执行的流水线
+        self.target_previews = {}  # {目标文件路径: (行数, 估计目标数, CIDR 网段数)}
+        self.target_preview_ready.connect(self.on_target_preview)
+        self.scan_scheduler = ScanScheduler(self.schedules, self.launch_schedule, self)
+        self.scan_scheduler.schedule_fired.connect(
+            lambda name, result: self.statusBar().showMessage(f"定时任务 {name}：{result}")
+        )
+        self.scan_scheduler.schedules_changed.connect(self.save_config)
+        self.scheduler.job_finished.connect(self.scan_scheduler.on_job_finished)
+        self.output_archiver = OutputArchiver(policy=self.output_retention)
+        self.output_index = OutputIndex()
+        self.interactive_runs = set()  # 从界面启动的运行：命中缓存时显示缓存的输出
+        self.cached_output_dialog = None
+        self.defer_until_idle(self.run_history.load)
+        self.defer_until_idle(lambda: self.output_archiver.trigger(self.active_run_ids()))
+        self.defer_until_idle(self.output_index.catch_up)
+        self.defer_until_idle(self.scan_scheduler.reschedule)
+        self.defer_until_idle(self.start_control_api)
+        self.defer_until_idle(lambda: self.worker_pool.set_workers(self.workers))
+        self.defer_until_idle(self.start_metrics)
+        self.defer_until_idle(self.start_watchdog)
+        self.defer_until_idle(lambda: self.tool_validator.validate(self.tools))
+        STARTUP.mark("加载配置")
         self.init_ui()
+        STARTUP.mark("构建面板")
+        self.selection.changed.connect(self.on_selection_changed)
+        # 初始显示所有工具（只创建标题和占位，首屏卡片在窗口显示后渲染）
+        self.filter_tools_by_category("全部")
 
     def init_ui(self):
         self.setWindowTitle("Stars_Falling")
@@ -524,6 +4725,10 @@ class MainWindow(QMainWindow):
             QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
                 height: 0px;
             }
+            QStatusBar {
+                color: #a6adc8;
+                font-size: 15px;
+            }
         """)
 
         # 主布局
@@ -553,9 +4758,6 @@ class MainWindow(QMainWindow):
 
         main_layout.addWidget(right_widget, 1)
 
-        # 初始显示所有工具
-        self.filter_tools_by_category("全部")
-
     def create_category_panel(self):
         """创建左侧分类面板"""
         panel = QFrame()
@@ -721,21 +4923,117 @@ class MainWindow(QMainWindow):
         layout.addWidget(url_label)
 
         self.url_input = QLineEdit()
-        self.url_input.setPlaceholderText("输入目标URL，例如: http://example.com 或 192.168.1.1")
+        self.url_input.setPlaceholderText("输入目标URL，例如: http://example.com 或 192.168.1.1，@文件路径 表示目标文件")
         self.url_input.setMinimumWidth(400)
+        self.url_input.editingFinished.connect(self.preview_target_file)
         layout.addWidget(self.url_input, 1)
 
+        # 选择目标文件
+        self.target_file_btn = QPushButton("📂")
+        self.target_file_btn.setToolTip("选择目标文件（每行一个主机、URL 或 CIDR 网段）")
+        self.target_file_btn.setStyleSheet("background-color: #6c7086;")
+        self.target_file_btn.clicked.connect(self.choose_target_file)
+        layout.addWidget(self.target_file_btn)
+
         # 全选/取消全选
         self.select_all_btn = QPushButton("全选")
         self.select_all_btn.setStyleSheet("background-color: #6c7086;")
         self.select_all_btn.clicked.connect(self.toggle_select_all)
         layout.addWidget(self.select_all_btn)
 
+        # 选择预设
+        self.preset_btn = QPushButton("预设")
+        self.preset_btn.setStyleSheet("background-color: #6c7086;")
+        self.preset_btn.setMenu(QMenu(self.preset_btn))
+        self.preset_btn.menu().aboutToShow.connect(self.show_preset_menu)
+        layout.addWidget(self.preset_btn)
+
         # 执行按钮
         self.execute_btn = QPushButton("▶️ 启动")
+        self.execute_btn.setToolTip("按住 Shift 点击可忽略结果缓存，强制重新运行")
         self.execute_btn.clicked.connect(self.execute_selected_tools)
         layout.addWidget(self.execute_btn)
 
+        # 定时任务
+        self.schedule_btn = QPushButton("定时")
+        self.schedule_btn.setStyleSheet("background-color: #6c7086;")
+        self.schedule_btn.setMenu(QMenu(self.schedule_btn))
+        self.schedule_btn.menu().setStyleSheet("""
+            QMenu {
+                background-color: #313244;
+                color: #cdd6f4;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                padding: 5px;
+            }
+            QMenu::item {
+                padding: 8px 20px;
+                border-radius: 3px;
+            }
+            QMenu::item:selected {
+                background-color: #45475a;
+            }
+        """)
+        self.schedule_btn.menu().aboutToShow.connect(self.show_schedule_menu)
+        layout.addWidget(self.schedule_btn)
+
+        self.worker_btn = QPushButton("节点")
+        self.worker_btn.setStyleSheet("background-color: #6c7086;")
+        self.worker_btn.setMenu(QMenu(self.worker_btn))
+        self.worker_btn.menu().setStyleSheet(self.schedule_btn.menu().styleSheet())
+        self.worker_btn.menu().aboutToShow.connect(self.show_worker_menu)
+        layout.addWidget(self.worker_btn)
+
+        # 标签筛选
+        self.tag_btn = QPushButton("标签")
+        self.tag_btn.setStyleSheet("background-color: #6c7086;")
+        self.tag_btn.setMenu(QMenu(self.tag_btn))
+        self.tag_btn.menu().setStyleSheet(self.schedule_btn.menu().styleSheet())
+        self.tag_btn.menu().aboutToShow.connect(self.show_tag_menu)
+        layout.addWidget(self.tag_btn)
+        self.preset_btn.menu().setStyleSheet(self.schedule_btn.menu().styleSheet())
+
+        # 流水线
+        self.pipeline_btn = QPushButton("流水线")
+        self.pipeline_btn.setStyleSheet("background-color: #6c7086;")
+        self.pipeline_btn.setMenu(QMenu(self.pipeline_btn))
+        self.pipeline_btn.menu().setStyleSheet("""
+            QMenu {
+                background-color: #313244;
+                color: #cdd6f4;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                padding: 5px;
+            }
+            QMenu::item {
+                padding: 8px 20px;
+                border-radius: 3px;
+            }
+            QMenu::item:selected {
+                background-color: #45475a;
+            }
+        """)
+        self.pipeline_btn.menu().aboutToShow.connect(self.show_pipeline_menu)
+        layout.addWidget(self.pipeline_btn)
+
+        # 运行历史
+        self.history_btn = QPushButton("历史")
+        self.history_btn.setStyleSheet("background-color: #6c7086;")
+        self.history_btn.clicked.connect(self.show_run_history)
+        layout.addWidget(self.history_btn)
+
+        # 发现结果
+        self.findings_btn = QPushButton("发现")
+        self.findings_btn.setStyleSheet("background-color: #6c7086;")
+        self.findings_btn.clicked.connect(self.show_findings)
+        layout.addWidget(self.findings_btn)
+
+        # 搜索捕获的输出
+        self.search_output_btn = QPushButton("搜索输出")
+        self.search_output_btn.setStyleSheet("background-color: #6c7086;")
+        self.search_output_btn.clicked.connect(self.show_output_search)
+        layout.addWidget(self.search_output_btn)
+
         return bar
 
     def create_tools_area(self):
@@ -764,6 +5062,10 @@ class MainWindow(QMainWindow):
             self.tools_layout.setColumnStretch(i, 1)
 
         scroll.setWidget(self.tools_container)
+        self.tools_scroll = scroll
+        # 滚动或尺寸变化时渲染新进入可见区域的分组
+        scroll.verticalScrollBar().valueChanged.connect(self.schedule_materialize)
+        scroll.verticalScrollBar().rangeChanged.connect(self.schedule_materialize)
         
         # 设置工具区域右键菜单
         self.tools_container.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -780,6 +5082,48 @@ class MainWindow(QMainWindow):
 
         return widget
 
+    def show_category(self, category):
+        """切换到指定分类，并同步分类按钮的选中状态"""
+        for btn in self.category_buttons:
+            btn.setChecked(btn.text() == category)
+        self.filter_tools_by_category(category)
+
+    def select_tools_by_name(self, names):
+        """按分类、子分类、标签或工具名称（不区分大小写）选中工具，返回选中的数量"""
+        wanted = {name.strip().lower() for name in names if name.strip()}
+        matched = [tool for tool in self.tools
+                   if any(str(tool.get(field, "")).lower() in wanted for field in ("category", "subcategory", "name"))
+                   or any(f"#{tag}".lower() in wanted for tag in tool.get("tags") or ())]
+        if not matched:
+            return 0
+        categories = {tool.get("category") for tool in matched}
+        self.show_category(categories.pop() if len(categories) == 1 else "全部")
+        # 尚未渲染的卡片在创建时按选中状态显示，不需要先渲染
+        ids = [tool.get("id") for tool in matched]
+        changed = set(self.selection).union(ids)
+        self.selection.replace(ids)
+        self.sync_card_selection(changed)
+        return len(matched)
+
+    def handle_remote_command(self, message):
+        """处理命令行参数：本实例启动时的参数，或后启动的实例转发过来的参数"""
+        parts = []
+        target = message.get("target")
+        if target:
+            self.url_input.setText(target)
+            self.preview_target_file()
+            parts.append(f"目标 {target}")
+        names = message.get("select") or []
+        if names:
+            parts.append(f"选中 {self.select_tools_by_name(names)} 个工具")
+        if message.get("forwarded"):
+            if self.isMinimized():
+                self.showNormal()
+            self.raise_()
+            self.activateWindow()
+        if parts:
+            self.statusBar().showMessage("命令行：" + "，".join(parts))
+
     def on_category_clicked(self, category):
         """分类点击事件"""
         for btn in self.category_buttons:
@@ -791,101 +5135,153 @@ class MainWindow(QMainWindow):
         
         self.filter_tools_by_category(category)
 
+    def create_tool_card(self, tool):
+        """创建工具卡片并绑定事件"""
+        card = ToolCard(tool)
+        card.setContextMenuPolicy(Qt.CustomContextMenu)
+        card.customContextMenuRequested.connect(lambda pos, t=tool, c=card: self.show_tool_context_menu(pos, t, c))
+        card.drag_started.connect(self.on_card_drag_started)
+        card.edit_callback = self.edit_tool
+        card.icon_callback = self.icon_cache.request
+        card.selection = self.selection
+        return card
+
+    def take_tool_card(self, tool):
+        """优先复用回收池中的卡片，没有时再新建"""
+        # 回收池中的卡片持有其工具数据的引用，因此 id(tool) 不会被复用
+        card = self.card_pool.pop(id(tool), None)
+        if card is None:
+            card = self.create_tool_card(tool)
+        else:
+            card.show()
+        self.cards_by_id[tool.get("id")] = card
+        result = self.tool_validator.results.get(tool.get("id"))
+        if card.check_result is not result:
+            card.set_check(result)
+        selected = tool.get("id") in self.selection
+        if card.is_selected() != selected:
+            card.set_selected(selected)
+        tags = tuple(tool.get("tags") or ())
+        if card.shown_tags != tags:
+            card.set_tags(tags)
+        if not card.has_icon:
+            pixmap = self.icon_cache.pixmap(tool.get("id"))
+            if pixmap is not None:
+                card.set_icon(pixmap)
+        return card
+
+    def on_icon_ready(self, tool_id):
+        if not self._icons_ready:
+            QTimer.singleShot(0, self.refresh_icons)
+        self._icons_ready.add(tool_id)
+
+    def refresh_icons(self):
+        ready, self._icons_ready = self._icons_ready, set()
+        for card in self.tool_cards:
+            tool_id = card.tool_data.get("id")
+            if tool_id in ready:
+                card.set_icon(self.icon_cache.pixmap(tool_id))
+
+    def on_tool_checked(self, tool_id, result):
+        """后台检查结果陆续返回，合并到下一次事件循环中统一更新卡片标记"""
+        if not self._badges_pending:
+            self._badges_pending = True
+            QTimer.singleShot(0, self.refresh_check_badges)
+
+    def refresh_check_badges(self):
+        self._badges_pending = False
+        results = self.tool_validator.results
+        for card in self.tool_cards:
+            result = results.get(card.tool_data.get("id"))
+            if card.check_result is not result:
+                card.set_check(result)
+
+    @METRICS.timed("stars_falling_ui_refresh_seconds", view="filter_tools_by_category")
     def filter_tools_by_category(self, category):
         """按分类筛选工具"""
         self.current_category = category  # 记录当前分类
         
-        # 清空现有卡片和子分类标题
+        # 回收现有卡片（工具数据未变化的卡片会被复用，只有新增的工具才创建卡片）
         for card in self.tool_cards:
-            card.setParent(None)
-            card.deleteLater()
+            self.tools_layout.removeWidget(card)
+            card.hide()
+            self.card_pool[id(card.tool_data)] = card
         self.tool_cards.clear()
+        self.cards_by_id.clear()
         
         for header in self.subcategory_headers:
             header.setParent(None)
             header.deleteLater()
         self.subcategory_headers.clear()
 
-        # 筛选工具
+        for section in self.lazy_sections:
+            if section["placeholder"] is not None:
+                section["placeholder"].setParent(None)
+                section["placeholder"].deleteLater()
+        self.lazy_sections.clear()
+
+        # 筛选工具（先按标签，再按分类）
+        tools = self.tag_filtered_tools()
         row, col = 0, 0
         max_cols = 4
         
         if category == "全部":
-            # 全部分类时按分类和子分类分组显示
+            # 全部分类时按分类和子分类分组显示；各分组可折叠，卡片在滚动到可见区域时才创建
+            tools_by_cat = {}
+            for tool in tools:
+                tools_by_cat.setdefault(tool.get("category"), []).append(tool)
+            
             for cat in self.categories:
-                cat_tools = [t for t in self.tools if t.get("category") == cat]
+                cat_tools = tools_by_cat.get(cat)
                 if not cat_tools:
                     continue
                 
                 # 添加分类标题
-                if col != 0:
-                    row += 1
-                    col = 0
-                cat_header = SubCategoryHeader(f"【{cat}】")
+                cat_collapsed = (cat, "") in self.collapsed_sections
+                cat_header = SubCategoryHeader(f"【{cat}】", collapsed=cat_collapsed)
                 cat_header.title_label.setStyleSheet("color: #f9e2af; font-size: 20px; font-weight: bold; border: none;")
+                cat_header.collapse_toggled.connect(lambda c=cat: self.toggle_section_collapsed(c, ""))
                 self.tools_layout.addWidget(cat_header, row, 0, 1, max_cols)
+                cat_header.show()
                 self.subcategory_headers.append(cat_header)
                 row += 1
+                if cat_collapsed:
+                    continue
                 
-                # 显示该分类下无子分类的工具
+                # 该分类下无子分类的工具
                 tools_without_subcat = [t for t in cat_tools if not t.get("subcategory")]
-                for tool in tools_without_subcat:
-                    card = ToolCard(tool)
-                    card.setContextMenuPolicy(Qt.CustomContextMenu)
-                    card.customContextMenuRequested.connect(lambda pos, t=tool, c=card: self.show_tool_context_menu(pos, t, c))
-                    card.drag_started.connect(self.on_card_drag_started)
-                    card.edit_callback = self.edit_tool
-                    self.tools_layout.addWidget(card, row, col)
-                    self.tool_cards.append(card)
-                    col += 1
-                    if col >= max_cols:
-                        col = 0
-                        row += 1
+                row = self.add_lazy_section(tools_without_subcat, row)
                 
-                # 显示该分类下的子分类及其工具
+                # 该分类下的子分类及其工具
                 subcats = self.subcategories.get(cat, [])
                 for subcat in subcats:
                     subcat_tools = [t for t in cat_tools if t.get("subcategory") == subcat]
                     if not subcat_tools:
                         continue
                     
-                    if col != 0:
-                        row += 1
-                        col = 0
-                    
-                    subcat_header = SubCategoryHeader(f"  {subcat}")
+                    subcat_collapsed = (cat, subcat) in self.collapsed_sections
+                    subcat_header = SubCategoryHeader(f"  {subcat}", collapsed=subcat_collapsed)
+                    subcat_header.collapse_toggled.connect(lambda c=cat, s=subcat: self.toggle_section_collapsed(c, s))
                     self.tools_layout.addWidget(subcat_header, row, 0, 1, max_cols)
+                    subcat_header.show()
                     self.subcategory_headers.append(subcat_header)
                     row += 1
-                    
-                    for tool in subcat_tools:
-                        card = ToolCard(tool)
-                        card.setContextMenuPolicy(Qt.CustomContextMenu)
-                        card.customContextMenuRequested.connect(lambda pos, t=tool, c=card: self.show_tool_context_menu(pos, t, c))
-                        card.drag_started.connect(self.on_card_drag_started)
-                        card.edit_callback = self.edit_tool
-                        self.tools_layout.addWidget(card, row, col)
-                        self.tool_cards.append(card)
-                        col += 1
-                        if col >= max_cols:
-                            col = 0
-                            row += 1
+                    if not subcat_collapsed:
+                        row = self.add_lazy_section(subcat_tools, row)
             
-            self.tools_count_label.setText(f"工具列表 ({len(self.tools)})")
+            self.trim_card_pool()
+            self.tools_count_label.setText(f"工具列表 ({len(tools)})")
+            self.schedule_materialize()
             return
         
         # 非全部分类
-        filtered_tools = [t for t in self.tools if t.get("category") == category]
+        filtered_tools = [t for t in tools if t.get("category") == category]
         subcats = self.subcategories.get(category, [])
 
         # 先显示没有子分类的工具
         tools_without_subcat = [t for t in filtered_tools if not t.get("subcategory")]
         for tool in tools_without_subcat:
-            card = ToolCard(tool)
-            card.setContextMenuPolicy(Qt.CustomContextMenu)
-            card.customContextMenuRequested.connect(lambda pos, t=tool, c=card: self.show_tool_context_menu(pos, t, c))
-            card.drag_started.connect(self.on_card_drag_started)
-            card.edit_callback = self.edit_tool
+            card = self.take_tool_card(tool)
             self.tools_layout.addWidget(card, row, col)
             self.tool_cards.append(card)
             col += 1
@@ -912,11 +5308,7 @@ class MainWindow(QMainWindow):
             # 显示该子分类下的工具
             subcat_tools = [t for t in filtered_tools if t.get("subcategory") == subcat]
             for tool in subcat_tools:
-                card = ToolCard(tool)
-                card.setContextMenuPolicy(Qt.CustomContextMenu)
-                card.customContextMenuRequested.connect(lambda pos, t=tool, c=card: self.show_tool_context_menu(pos, t, c))
-                card.drag_started.connect(self.on_card_drag_started)
-                card.edit_callback = self.edit_tool
+                card = self.take_tool_card(tool)
                 self.tools_layout.addWidget(card, row, col)
                 self.tool_cards.append(card)
                 col += 1
@@ -924,10 +5316,246 @@ class MainWindow(QMainWindow):
                     col = 0
                     row += 1
 
+        self.trim_card_pool()
         self.tools_count_label.setText(f"工具列表 ({len(filtered_tools)})")
 
+    def trim_card_pool(self):
+        """销毁回收池中不再需要的卡片，只保留尚未展开的分组会用到的卡片"""
+        pending = {id(tool) for section in self.lazy_sections if section["cards"] is None
+                   for tool in section["tools"]}
+        for key in [key for key in self.card_pool if key not in pending]:
+            card = self.card_pool.pop(key)
+            card.setParent(None)
+            card.deleteLater()
+
+    def add_lazy_section(self, tools, row):
+        """添加一个延迟渲染的卡片分组，返回下一行行号
+
+        分组按 LAZY_BLOCK_ROWS 行切成若干块，每块先用等高占位控件占住位置，
+        这样大分组也只会渲染进入可见区域的那几块。
+        """
+        max_cols = 4
+        block_size = self.LAZY_BLOCK_ROWS * max_cols
+        spacing = self.tools_layout.verticalSpacing()
+        for start in range(0, len(tools), block_size):
+            block = tools[start:start + block_size]
+            rows = (len(block) + max_cols - 1) // max_cols
+            placeholder = QWidget()
+            placeholder.setFixedHeight(rows * self.card_height_hint + (rows - 1) * spacing)
+            # 占位控件只放在块的第一行（跨行控件不会撑高网格），其余行号留给渲染后的卡片
+            self.tools_layout.addWidget(placeholder, row, 0, 1, max_cols)
+            placeholder.show()  # 立即参与布局，而不是等到下一轮事件循环
+            self.lazy_sections.append({"tools": block, "row": row, "placeholder": placeholder, "cards": None})
+            row += rows
+        return row
+
+    def schedule_materialize(self):
+        """合并同一轮事件中的多次请求，在事件循环空闲时渲染可见分组"""
+        if not self._materialize_pending:
+            self._materialize_pending = True
+            QTimer.singleShot(0, self.materialize_visible_sections)
+
+    def materialize_visible_sections(self):
+        """为进入可见区域（含上下各一屏预读）的分组创建卡片，远离可见区域的分组换回占位控件"""
+        self._materialize_pending = False
+        viewport = self.tools_scroll.viewport()
+        for _ in range(len(self.lazy_sections)):
+            self.settle_tools_layout()
+            top = self.tools_scroll.verticalScrollBar().value()
+            height = viewport.height()
+            visible = QRect(0, top - height, max(viewport.width(), 1), height * 3)
+            pending = [s for s in self.lazy_sections
+                       if s["cards"] is None and s["placeholder"].geometry().intersects(visible)]
+            if not pending:
+                break
+            for section in pending:
+                self.materialize_section(section)
+        # 保留范围比渲染范围大，来回小幅滚动时不会反复创建和回收
+        top = self.tools_scroll.verticalScrollBar().value()
+        height = viewport.height()
+        keep = QRect(0, top - height * self.LAZY_KEEP_SCREENS, max(viewport.width(), 1),
+                     height * (2 * self.LAZY_KEEP_SCREENS + 1))
+        for section in self.lazy_sections:
+            if section["cards"] and not self.section_geometry(section).intersects(keep):
+                self.dematerialize_section(section)
+
+    @staticmethod
+    def section_geometry(section):
+        cards = section["cards"]
+        return cards[0].geometry().united(cards[-1].geometry())
+
+    def settle_tools_layout(self):
+        """立即完成挂起的布局计算，并按最小高度撑开容器，使占位控件的位置可用于可见性判断"""
+        self.tools_layout.activate()
+        container = self.tools_container
+        min_height = container.minimumSizeHint().height()
+        if container.height() < min_height:
+            container.resize(container.width(), min_height)
+
+    def materialize_section(self, section):
+        """用真实卡片替换分组占位控件"""
+        max_cols = 4
+        placeholder = section["placeholder"]
+        self.tools_layout.removeWidget(placeholder)
+        placeholder.setParent(None)
+        placeholder.deleteLater()
+        section["placeholder"] = None
+
+        cards = []
+        for i, tool in enumerate(section["tools"]):
+            card = self.take_tool_card(tool)
+            self.tools_layout.addWidget(card, section["row"] + i // max_cols, i % max_cols)
+            card.show()
+            cards.append(card)
+        section["cards"] = cards
+        if cards:
+            self.card_height_hint = max(self.card_height_hint, cards[0].sizeHint().height())
+
+        # 保持 tool_cards 与界面顺序一致
+        index = 0
+        for other in self.lazy_sections:
+            if other is section:
+                break
+            if other["cards"] is not None:
+                index += len(other["cards"])
+        self.tool_cards[index:index] = cards
+
+    def dematerialize_section(self, section):
+        """把分组的卡片换回等高的占位控件，卡片放回回收池，滚动回来时复用"""
+        max_cols = 4
+        cards = section["cards"]
+        index = 0
+        for other in self.lazy_sections:
+            if other is section:
+                break
+            if other["cards"] is not None:
+                index += len(other["cards"])
+        del self.tool_cards[index:index + len(cards)]
+        for card in cards:
+            self.tools_layout.removeWidget(card)
+            card.hide()
+            self.card_pool[id(card.tool_data)] = card
+            self.cards_by_id.pop(card.tool_data.get("id"), None)
+        section["cards"] = None
+
+        rows = (len(section["tools"]) + max_cols - 1) // max_cols
+        spacing = self.tools_layout.verticalSpacing()
+        placeholder = QWidget()
+        placeholder.setFixedHeight(rows * self.card_height_hint + (rows - 1) * spacing)
+        self.tools_layout.addWidget(placeholder, section["row"], 0, 1, max_cols)
+        placeholder.show()
+        section["placeholder"] = placeholder
+
+        # 回收池按放入顺序淘汰最早的卡片
+        while len(self.card_pool) > self.MAX_POOLED_CARDS:
+            card = self.card_pool.pop(next(iter(self.card_pool)))
+            card.setParent(None)
+            card.deleteLater()
+
+    def defer_until_idle(self, task):
+        """把非首屏必需的工作排到事件循环空闲时逐个执行"""
+        self.idle_tasks.append(task)
+        if not self.idle_timer.isActive():
+            self.idle_timer.start()
+
+    def run_idle_task(self):
+        """每个空闲时刻只执行一个任务，避免阻塞界面响应"""
+        if not self.idle_tasks:
+            self.idle_timer.stop()
+            self.idle_tasks_done.emit()
+            return
+        task = self.idle_tasks.popleft()
+        try:
+            task()
+        except Exception as e:
+            print(f"后台任务失败: {e}")
+
+    def prefetch_lazy_sections(self, remaining=None):
+        """空闲时预先渲染紧随可见区域之后的若干分组块，使首次滚动无需等待"""
+        if remaining is None:
+            remaining = self.LAZY_PREFETCH_BLOCKS
+        for section in self.lazy_sections:
+            if section["cards"] is None:
+                self.materialize_section(section)
+                if remaining > 1:
+                    self.defer_until_idle(lambda: self.prefetch_lazy_sections(remaining - 1))
+                return
+
+    def toggle_section_collapsed(self, category, subcategory):
+        """折叠/展开"全部"视图中的分类或子分类分组，并持久化折叠状态"""
+        key = (category, subcategory)
+        if key in self.collapsed_sections:
+            self.collapsed_sections.discard(key)
+        else:
+            self.collapsed_sections.add(key)
+        self.save_config()
+        self.refresh_tools_view()
+
+    def refresh_tools_view(self):
+        """在当前分类下刷新工具视图"""
+        current_cat = getattr(self, 'current_category', '全部')
+        self.filter_tools_by_category(current_cat)
+
+    def tag_filtered_tools(self):
+        """按当前标签筛选工具；没有标签筛选时返回全部工具"""
+        if not self.tag_filter:
+            return self.tools
+        self.tag_index.ensure(self.tools)
+        return self.tag_index.members(self.tag_index.query(self.tag_filter, self.tag_filter_mode))
+
+    def show_tag_menu(self):
+        """列出所有标签，勾选后与分类筛选叠加"""
+        menu = self.tag_btn.menu()
+        menu.clear()
+        self.tag_index.ensure(self.tools)
+        if not self.tag_index.masks:
+            empty_action = menu.addAction("(没有标签，可在编辑工具时添加)")
+            empty_action.setEnabled(False)
+            return
+        for mode, text in (("or", "带任一选中标签"), ("and", "带全部选中标签")):
+            mode_action = menu.addAction(text)
+            mode_action.setCheckable(True)
+            mode_action.setChecked(self.tag_filter_mode == mode)
+            mode_action.triggered.connect(lambda checked, m=mode: self.set_tag_filter(self.tag_filter, m))
+        menu.addSeparator()
+        for tag in self.tag_index.masks:
+            tag_action = menu.addAction(f"#{tag} ({self.tag_index.count(tag)})")
+            tag_action.setCheckable(True)
+            tag_action.setChecked(tag in self.tag_filter)
+            tag_action.triggered.connect(lambda checked, t=tag: self.toggle_tag_filter(t))
+        if self.tag_filter:
+            menu.addSeparator()
+            clear_action = menu.addAction("清除标签筛选")
+            clear_action.triggered.connect(lambda: self.set_tag_filter([]))
+
+    def toggle_tag_filter(self, tag):
+        tags = list(self.tag_filter)
+        if tag in tags:
+            tags.remove(tag)
+        else:
+            tags.append(tag)
+        self.set_tag_filter(tags)
+
+    def set_tag_filter(self, tags, mode=None):
+        self.tag_filter = list(tags)
+        if mode:
+            self.tag_filter_mode = mode
+        if self.tag_filter:
+            joiner = " + " if self.tag_filter_mode == "and" else " / "
+            self.tag_btn.setText("标签: " + joiner.join(self.tag_filter))
+        else:
+            self.tag_btn.setText("标签")
+        self.refresh_tools_view()
+
     def show_tool_context_menu(self, pos, tool, card):
         """显示工具右键菜单"""
+        # 在已选中的卡片上右键且选中多个工具时，显示批量操作菜单
+        if card.is_selected():
+            selected = self.get_selected_tools()
+            if len(selected) > 1:
+                self.show_batch_context_menu(pos, selected, card)
+                return
+
         menu = QMenu(self)
         menu.setStyleSheet("""
             QMenu {
@@ -1005,6 +5633,88 @@ class MainWindow(QMainWindow):
 
         menu.exec_(card.mapToGlobal(pos))
     
+    def show_batch_context_menu(self, pos, tools, card):
+        """显示多选批量操作菜单"""
+        menu = QMenu(self)
+        menu.setStyleSheet("""
+            QMenu {
+                background-color: #313244;
+                color: #cdd6f4;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                padding: 5px;
+            }
+            QMenu::item {
+                padding: 8px 20px;
+                border-radius: 3px;
+            }
+            QMenu::item:selected {
+                background-color: #45475a;
+            }
+            QMenu::item:disabled {
+                color: #6c7086;
+            }
+        """)
+
+        title_action = menu.addAction(f"已选中 {len(tools)} 个工具")
+        title_action.setEnabled(False)
+        menu.addSeparator()
+
+        # 批量移动：有子分类的分类展开为二级菜单
+        move_menu = menu.addMenu("批量移动到")
+        for cat in self.categories:
+            subcats = self.subcategories.get(cat, [])
+            if subcats:
+                cat_menu = move_menu.addMenu(cat)
+                none_action = cat_menu.addAction("(无子分类)")
+                none_action.triggered.connect(lambda checked, c=cat: self.batch_move_tools(tools, c))
+                cat_menu.addSeparator()
+                for subcat in subcats:
+                    subcat_action = cat_menu.addAction(subcat)
+                    subcat_action.triggered.connect(lambda checked, c=cat, s=subcat: self.batch_move_tools(tools, c, s))
+            else:
+                cat_action = move_menu.addAction(cat)
+                cat_action.triggered.connect(lambda checked, c=cat: self.batch_move_tools(tools, c))
+
+        copy_menu = menu.addMenu("批量复制到")
+        for cat in self.categories:
+            cat_action = copy_menu.addAction(cat)
+            cat_action.triggered.connect(lambda checked, c=cat: self.batch_copy_tools(tools, c))
+
+        # 批量设置子分类：列出所涉及分类下已有的子分类
+        subcat_menu = menu.addMenu("批量设置子分类")
+        none_action = subcat_menu.addAction("(无子分类)")
+        none_action.triggered.connect(lambda: self.batch_set_subcategory(tools, ""))
+        subcat_menu.addSeparator()
+        known_subcats = []
+        for cat in dict.fromkeys(t.get("category", "") for t in tools):
+            for subcat in self.subcategories.get(cat, []):
+                if subcat not in known_subcats:
+                    known_subcats.append(subcat)
+        for subcat in known_subcats:
+            subcat_action = subcat_menu.addAction(subcat)
+            subcat_action.triggered.connect(lambda checked, s=subcat: self.batch_set_subcategory(tools, s))
+        new_subcat_action = subcat_menu.addAction("新建子分类...")
+        new_subcat_action.triggered.connect(lambda: self.batch_new_subcategory(tools))
+
+        add_tags_action = menu.addAction("批量添加标签...")
+        add_tags_action.triggered.connect(lambda: self.batch_add_tags(tools))
+        selected_tags = list(dict.fromkeys(tag for t in tools for tag in t.get("tags") or ()))
+        if selected_tags:
+            remove_tag_menu = menu.addMenu("批量移除标签")
+            for tag in selected_tags:
+                tag_action = remove_tag_menu.addAction(f"#{tag}")
+                tag_action.triggered.connect(lambda checked, t=tag: self.batch_remove_tag(tools, t))
+
+        delete_action = menu.addAction("批量删除")
+        delete_action.triggered.connect(lambda: self.batch_delete_tools(tools))
+
+        menu.addSeparator()
+        clear_action = menu.addAction("取消选择")
+        clear_action.triggered.connect(self.clear_selection)
+
+        menu.exec_(card.mapToGlobal(pos))
+
     def move_tool_to_subcategory(self, tool, subcategory):
         """移动工具到子分类"""
         tool["subcategory"] = subcategory
@@ -1033,6 +5743,7 @@ class MainWindow(QMainWindow):
                     self.categories.append(tool_data["category"])
                     self.refresh_category_panel()
                 self.save_config()
+                self.tool_validator.validate([tool_data])
                 # 保持在当前分类
                 current_cat = getattr(self, 'current_category', '全部')
                 self.filter_tools_by_category(current_cat)
@@ -1041,13 +5752,21 @@ class MainWindow(QMainWindow):
         """编辑工具"""
         dialog = AddToolDialog(self, self.categories, tool)
         if dialog.exec_() == QDialog.Accepted:
-            new_data = dialog.get_tool_data()
+            # 只覆盖对话框中的字段，保留 id、子分类等其他字段
+            new_data = tool.copy()
+            edited = dialog.get_tool_data()
+            for field in AddToolDialog.FIELDS:
+                new_data[field] = edited[field]
+            if new_data["category"] != tool.get("category"):
+                new_data["subcategory"] = ""
             idx = self.tools.index(tool)
             self.tools[idx] = new_data
             if new_data["category"] and new_data["category"] not in self.categories:
                 self.categories.append(new_data["category"])
                 self.refresh_category_panel()
             self.save_config()
+            self.tool_validator.validate([new_data])
+            self.icon_cache.forget(new_data.get("id"))
             # 保持在当前分类
             current_cat = getattr(self, 'current_category', '全部')
             self.filter_tools_by_category(current_cat)
@@ -1055,7 +5774,7 @@ class MainWindow(QMainWindow):
     def copy_tool_to_category(self, tool, category):
         """复制工具到指定分类"""
         # 创建工具副本
-        new_tool = tool.copy()
+        new_tool = tool.duplicate()
         new_tool["category"] = category
         new_tool["subcategory"] = ""  # 清除子分类
         self.tools.append(new_tool)
@@ -1066,9 +5785,18 @@ class MainWindow(QMainWindow):
 
     def delete_tool(self, tool):
         """删除工具"""
+        if self.confirm_dialog("确认删除", f"确定要删除工具 '{tool.get('name')}' 吗？"):
+            self.tools.remove(tool)
+            self.save_config()
+            # 保持在当前分类
+            current_cat = getattr(self, 'current_category', '全部')
+            self.filter_tools_by_category(current_cat)
+
+    def confirm_dialog(self, title, text):
+        """深色主题确认对话框，确认时返回 True"""
         msg_box = QMessageBox(self)
-        msg_box.setWindowTitle("确认删除")
-        msg_box.setText(f"确定要删除工具 '{tool.get('name')}' 吗？")
+        msg_box.setWindowTitle(title)
+        msg_box.setText(text)
         msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
         msg_box.setDefaultButton(QMessageBox.No)
         # 去掉问号图标
@@ -1113,12 +5841,123 @@ class MainWindow(QMainWindow):
             except:
                 pass
         
-        if msg_box.exec_() == QMessageBox.Yes:
-            self.tools.remove(tool)
-            self.save_config()
-            # 保持在当前分类
-            current_cat = getattr(self, 'current_category', '全部')
-            self.filter_tools_by_category(current_cat)
+        return msg_box.exec_() == QMessageBox.Yes
+
+    def get_selected_tools(self):
+        """获取选中的工具（按选中顺序，包括不在当前视图中的工具）"""
+        lookup = self.tools_by_id()
+        return [lookup[tool_id] for tool_id in self.selection if tool_id in lookup]
+
+    def sync_card_selection(self, tool_ids=None):
+        """按选中模型更新已创建卡片的显示；给出 tool_ids 时只更新这些工具的卡片"""
+        if tool_ids is None:
+            cards = self.tool_cards
+        else:
+            cards = [self.cards_by_id[tool_id] for tool_id in tool_ids if tool_id in self.cards_by_id]
+        for card in cards:
+            selected = card.tool_data.get("id") in self.selection
+            if card.is_selected() != selected:
+                card.set_selected(selected)
+
+    def on_selection_changed(self, count):
+        self.execute_btn.setText(f"▶️ 启动 ({count})" if count else "▶️ 启动")
+
+    def tools_by_id(self):
+        """id → 工具的索引，工具列表变化（保存配置）后重建"""
+        if self._tools_by_id is None:
+            self._tools_by_id = {tool.get("id"): tool for tool in self.tools}
+        return self._tools_by_id
+
+    def run_tools_transaction(self, tools, mutate):
+        """以单个事务执行批量修改：出错时整体回滚，成功后只保存一次、只刷新一次视图"""
+        tools_snapshot = [(tool, tool.copy()) for tool in tools]
+        lists_snapshot = (list(self.tools), list(self.categories),
+                          {cat: list(subs) for cat, subs in self.subcategories.items()})
+        try:
+            mutate()
+        except Exception as e:
+            for tool, data in tools_snapshot:
+                tool.clear()
+                tool.update(data)
+            self.tools, self.categories, self.subcategories = lists_snapshot
+            print(f"批量操作失败: {e}")
+            return False
+        self.save_config()
+        self.refresh_tools_view()
+        return True
+
+    def batch_move_tools(self, tools, category, subcategory=""):
+        """批量移动工具到指定分类/子分类"""
+        def mutate():
+            for tool in tools:
+                tool["category"] = category
+                tool["subcategory"] = subcategory
+        self.run_tools_transaction(tools, mutate)
+
+    def batch_copy_tools(self, tools, category):
+        """批量复制工具到指定分类"""
+        def mutate():
+            for tool in tools:
+                new_tool = tool.duplicate()
+                new_tool["category"] = category
+                new_tool["subcategory"] = ""  # 清除子分类
+                self.tools.append(new_tool)
+        self.run_tools_transaction(tools, mutate)
+
+    def batch_set_subcategory(self, tools, subcategory):
+        """批量设置子分类（各工具保持在原分类下，缺失的子分类会自动创建）"""
+        def mutate():
+            for tool in tools:
+                cat = tool.get("category", "")
+                if subcategory and subcategory not in self.subcategories.setdefault(cat, []):
+                    self.subcategories[cat].append(subcategory)
+                tool["subcategory"] = subcategory
+        self.run_tools_transaction(tools, mutate)
+
+    def batch_delete_tools(self, tools):
+        """批量删除工具"""
+        if not self.confirm_dialog("确认删除", f"确定要删除选中的 {len(tools)} 个工具吗？"):
+            return
+        doomed = {id(tool) for tool in tools}
+        def mutate():
+            self.tools = [t for t in self.tools if id(t) not in doomed]
+        self.run_tools_transaction(tools, mutate)
+
+    def batch_new_subcategory(self, tools):
+        """为选中工具新建并设置子分类"""
+        dialog = DarkInputDialog(self, "设置子分类", "子分类名称:")
+        if dialog.exec_() == QDialog.Accepted:
+            text = dialog.get_text().strip()
+            if text:
+                self.batch_set_subcategory(tools, text)
+
+    def batch_add_tags(self, tools):
+        """为选中工具添加标签"""
+        dialog = DarkInputDialog(self, "添加标签", "标签（逗号或空格分隔）:")
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        tags = normalize_tags(dialog.get_text())
+        if not tags:
+            return
+        def mutate():
+            for tool in tools:
+                tool["tags"] = normalize_tags(list(tool.get("tags") or ()) + tags)
+        self.run_tools_transaction(tools, mutate)
+
+    def batch_remove_tag(self, tools, tag):
+        """从选中工具中移除标签"""
+        def mutate():
+            for tool in tools:
+                if tag in (tool.get("tags") or ()):
+                    tool["tags"] = [t for t in tool["tags"] if t != tag]
+        self.run_tools_transaction(tools, mutate)
+
+    def clear_selection(self):
+        """取消所有选中"""
+        changed = list(self.selection)
+        self.selection.clear()
+        self.sync_card_selection(changed)
+        self.select_all_btn.setText("全选")
 
     def on_card_drag_started(self, card):
         """记录正在拖拽的卡片"""
@@ -1348,43 +6187,631 @@ class MainWindow(QMainWindow):
         event.acceptProposedAction()
 
     def toggle_select_all(self):
-        """全选/取消全选"""
-        all_selected = all(card.is_selected() for card in self.tool_cards) if self.tool_cards else False
-        for card in self.tool_cards:
-            card.set_selected(not all_selected)
+        """全选/取消全选当前视图中的工具（包括尚未渲染的分组），其他视图中的选中不受影响"""
+        ids = [card.tool_data.get("id") for card in self.tool_cards]
+        ids += [tool.get("id") for section in self.lazy_sections if section["cards"] is None
+                for tool in section["tools"]]
+        all_selected = bool(ids) and all(tool_id in self.selection for tool_id in ids)
+        self.selection.update(ids, not all_selected)
+        self.sync_card_selection()
         self.select_all_btn.setText("取消全选" if not all_selected else "全选")
 
-    def execute_selected_tools(self):
-        """执行选中的工具"""
+    def choose_target_file(self):
+        """选择目标文件，输入框中以 @路径 表示"""
+        path, _ = QFileDialog.getOpenFileName(self, "选择目标文件", "", "文本文件 (*.txt *.lst *.csv);;所有文件 (*)")
+        if path:
+            self.url_input.setText(f"@{path}")
+            self.preview_target_file()
+
+    def target_file_path(self):
+        """输入框中是目标文件时返回其路径，否则返回 None"""
+        text = self.url_input.text().strip()
+        return text[1:].strip() if text.startswith("@") else None
+
+    def preview_target_file(self):
+        """在后台快速统计目标文件的行数和目标数"""
+        path = self.target_file_path()
+        if not path or path in self.target_previews or not os.path.isfile(path):
+            return
+        def count():
+            try:
+                self.target_preview_ready.emit(path, TargetSource(path).preview())
+            except (OSError, ValueError) as e:
+                print(f"读取目标文件失败: {e}")
+        threading.Thread(target=count, daemon=True).start()
+
+    def on_target_preview(self, path, stats):
+        self.target_previews[path] = stats
+        lines, targets, networks = stats
+        message = f"目标文件 {os.path.basename(path)}：{lines} 行，约 {targets} 个目标"
+        if networks:
+            message += f"（含 {networks} 个 CIDR 网段）"
+        self.statusBar().showMessage(message)
+
+    def open_target_source(self):
+        """返回输入框对应的目标迭代器；目标文件按需读取。输入无效时提示并返回 None"""
         url = self.url_input.text().strip()
         if not url:
             QMessageBox.warning(self, "警告", "请输入目标URL")
+            return None
+        path = self.target_file_path()
+        if path is None:
+            return [url]
+        if not os.path.isfile(path):
+            QMessageBox.warning(self, "警告", f"目标文件不存在: {path}")
+            return None
+        source = TargetSource(path)
+        if path in self.target_previews:
+            source.estimate = self.target_previews[path][1]
+        return source
+
+    def execute_selected_tools(self):
+        """执行选中的工具"""
+        targets = self.open_target_source()
+        if targets is None:
             return
 
-        selected_tools = []
-        for card in self.tool_cards:
-            if card.is_selected():
-                selected_tools.append(card.tool_data)
+        selected_tools = self.get_selected_tools()
+        if not selected_tools:
+            QMessageBox.warning(self, "警告", "请至少选择一个工具")
+            return
 
+        selected_tools = self.skip_broken_tools(selected_tools)
         if not selected_tools:
+            return
+
+        # 按住 Shift 时忽略结果缓存
+        force = bool(QApplication.keyboardModifiers() & Qt.ShiftModifier)
+        run_id, _, message, _ = self.launch_tools(selected_tools, targets, force)
+        self.interactive_runs.add(run_id)
+        self.statusBar().showMessage(message)
+
+    def skip_broken_tools(self, tools):
+        """启动前再检查一次程序和起始目录，有无法启动的工具时询问是否跳过；取消时返回空列表"""
+        results = self.tool_validator.check_now(tools)
+        self.refresh_check_badges()
+        broken = [tool for tool in tools if results[tool.get("id")]["status"] in ToolValidator.BROKEN]
+        if not broken:
+            return tools
+        names = "\n".join(f"{tool.get('name', '未命名')}: {results[tool.get('id')]['message']}" for tool in broken[:20])
+        if len(broken) > 20:
+            names += f"\n……共 {len(broken)} 个"
+        if len(broken) == len(tools):
+            QMessageBox.warning(self, "警告", f"选中的工具都无法启动：\n\n{names}")
+            return []
+        if not self.confirm_dialog("工具无法启动", f"以下工具无法启动，跳过它们继续执行吗？\n\n{names}"):
+            return []
+        return [tool for tool in tools if tool not in broken]
+
+    def launch_tools(self, tools, targets, force=False):
+        """每个工具 × 目标生成一个任务，交给调度器按历史耗时排序并启动（界面和控制接口共用）
+
+        targets 为目标列表或 TargetSource。返回 (运行编号, 任务列表, 状态说明, 目标文件来源编号)；
+        目标文件的任务在调度器有空闲槽位时才生成，返回的任务列表为空，来源编号在持久化任务队列中。
+        """
+        run_id = new_run_id()
+        if isinstance(targets, TargetSource):
+            # 目标文件：调度器有空闲槽位时才读取下一个目标并生成任务
+            batches = ([Job(tool, target, run_id) for tool in tools] for target in targets)
+            try:
+                source_id = self.job_journal.add_source(run_id, targets.path.resolve(),
+                                                        [tool.get("id") for tool in tools], force)
+            except sqlite3.Error as e:
+                print(f"写入任务队列失败: {e}")
+                source_id = None
+            self.scheduler.submit_source(batches, force=force, source_id=source_id,
+                                         position=lambda: targets.position)
+            message = f"正在从目标文件提交任务（每个目标 {len(tools)} 个工具"
+            if targets.estimate is not None:
+                message += f"，约 {targets.estimate} 个目标"
+            return run_id, [], message + "）", source_id
+        jobs = [Job(tool, target, run_id) for target in targets for tool in tools]
+        fresh = self.scheduler.split_cached(jobs, force)
+        estimate = self.scheduler.estimate_completion(fresh)
+        cached = len(jobs) - len(fresh)
+        self.scheduler.submit(jobs, force=force, fresh=fresh)
+        message = f"已提交 {len(fresh)} 个任务"
+        if cached:
+            message += f"，{cached} 个使用缓存结果"
+        if estimate is not None:
+            message += f"，预计 {format_duration(estimate)} 后全部完成"
+        return run_id, jobs, message, None
+
+    def start_metrics(self):
+        """按配置导出指标（写文件或提供 /metrics），同时开始测量事件循环延迟"""
+        exporter = MetricsExporter(self.metrics_config, self)
+        if not exporter.enabled():
+            return
+        METRICS.set_function("stars_falling_jobs_queued", lambda: len(self.scheduler.queue))
+        METRICS.set_function("stars_falling_jobs_running", lambda: len(self.scheduler.running))
+        self.ensure_lag_probe()
+        exporter.start()
+        self.metrics_exporter = exporter
+
+    def ensure_lag_probe(self):
+        """指标和卡顿监视共用一个事件循环心跳"""
+        if self.lag_probe is None:
+            self.lag_probe = EventLoopLagProbe(self)
+            self.lag_probe.start()
+        return self.lag_probe
+
+    def start_watchdog(self):
+        """界面卡顿超过 stall_threshold 秒时把卡住的处理函数和调用栈写入 diagnostics.log"""
+        if not self.stall_threshold or self.watchdog is not None:
+            return
+        self.watchdog = StallWatchdog(self.ensure_lag_probe(), self.stall_threshold)
+        self.watchdog.start()
+
+    def start_control_api(self):
+        """按配置启动本机控制接口；命令行指定了 --api-port（cli_api_port）时以命令行的端口为准"""
+        port = self.cli_api_port
+        if self.control_api is not None or (port is None and not self.api_config.get("enabled")):
+            return
+        token = self.api_config.get("token")
+        if token:
+            where = f"token 见 {CONFIG_FILE} 的 api.token"
+        elif port is None:
+            # 控制接口可以启动任意工具，不允许无 token 运行：首次启用时生成并保存
+            token = self.api_config["token"] = secrets.token_urlsafe(24)
+            self.save_config()
+            where = f"token 见 {CONFIG_FILE} 的 api.token"
+        else:
+            # 只由命令行启动时不修改配置，token 只在本次运行中有效
+            token = secrets.token_urlsafe(24)
+            print(f"控制接口 token（仅本次运行有效）: {token}")
+            where = f"本次运行的 token: {token}"
+        api = ControlApi(self, port or self.api_config.get("port", 8765), token)
+        if api.start():
+            self.control_api = api
+            self.statusBar().showMessage(f"控制接口已启动: http://127.0.0.1:{api.port}（{where}）")
+
+    def offer_resume_jobs(self):
+        """启动后检查上次未完成的任务，询问是否继续执行"""
+        try:
+            jobs, sources = self.job_journal.unfinished()
+            if not jobs and not sources:
+                self.job_journal.prune()
+                return
+        except sqlite3.Error as e:
+            print(f"读取任务队列失败: {e}")
+            return
+        interrupted = sum(1 for row in jobs if row["state"] == "running")
+        text = f"上次退出时还有 {len(jobs)} 个任务未完成"
+        if interrupted:
+            text += f"（其中 {interrupted} 个在运行中被中断，将重新运行）"
+        if sources:
+            text += f"，{len(sources)} 个目标文件尚未读完"
+        text += "。\n已完成的任务会被跳过，是否继续执行？"
+        if self.confirm_dialog("恢复任务", text):
+            self.resume_jobs(jobs, sources)
+        else:
+            self.job_journal.abandon()
+
+    def resume_jobs(self, rows, sources):
+        """按持久化任务队列中的记录重新提交任务，沿用原来的运行编号"""
+        tools_by_id = {tool.get("id"): tool for tool in self.tools}
+        missing = []
+        jobs = {False: [], True: []}
+        for row in rows:
+            tool = tools_by_id.get(row["tool"])
+            if tool is None:
+                missing.append(row["id"])
+                continue
+            job = Job(tool, row["target"], row["run"])
+            job.journal_id = row["id"]
+            jobs[bool(row["force"])].append(job)
+        if missing:
+            self.job_journal.abandon(missing)
+        for force, batch in jobs.items():
+            if batch:
+                self.scheduler.submit(batch, force=force)
+        for source in sources:
+            tools = [tools_by_id[tool_id] for tool_id in source["tools"] if tool_id in tools_by_id]
+            if not tools or not os.path.isfile(source["path"]):
+                self.job_journal.finish_source(source["id"], "abandoned")
+                continue
+            # 已读取的目标对应的任务已经在上面恢复，从记录的位置继续
+            reader = TargetSource(source["path"])
+            if source["position"] is None and source["consumed"]:
+                targets = itertools.islice(reader, source["consumed"], None)  # 旧版本的记录
+            else:
+                targets = reader.iter_from(source["position"])
+            batches = ([Job(tool, target, source["run"]) for tool in tools] for target in targets)
+            self.scheduler.submit_source(batches, force=bool(source["force"]), source_id=source["id"],
+                                         position=lambda reader=reader: reader.position)
+        self.statusBar().showMessage(f"已恢复 {len(rows) - len(missing)} 个任务和 {len(sources)} 个目标文件")
+
+    def on_job_finished(self, job):
+        """任务结束后更新状态栏"""
+        if job.state != "cached" and job.tool.get("capture"):
+            self.output_index.enqueue(job.to_record())
+        if job.state == "cached" and job.run_id in self.interactive_runs:
+            self.show_cached_output(job)
+        if job.pipeline is not None:
+            pipeline = job.pipeline
+            pipeline.on_job_finished(job)
+            if pipeline.is_done() and pipeline in self.pipeline_runs:
+                self.pipeline_runs.remove(pipeline)
+                counts = " → ".join(str(n) for n in pipeline.stage_counts())
+                self.statusBar().showMessage(
+                    f"流水线 {pipeline.name} 完成：{pipeline.finished_jobs} 个任务，各阶段目标数 {counts}"
+                )
+                return
+        running = len(self.scheduler.running)
+        queued = len(self.scheduler.queue)
+        if job.state == "cached":
+            age = format_duration(time.time() - job.end)
+            state = f"使用 {age} 前的缓存结果 ({job.outdir})"
+        elif job.state == "cancelled":
+            state = "已取消"
+        else:
+            state = "完成" if job.state == "done" else f"失败 (退出码 {job.exit_code})"
+        self.statusBar().showMessage(
+            f"{job.tool.get('name', '未知')} {state}，运行中 {running} 个，排队 {queued} 个"
+        )
+        if not running and not queued:
+            # 一批任务全部结束后在后台压缩、清理旧的运行输出
+            self.output_archiver.trigger(self.active_run_ids())
+
+    def active_run_ids(self):
+        """不能压缩的运行：有任务排队、运行或尚待生成，或在任务队列中等待恢复"""
+        runs = {job.run_id for job in self.scheduler.queue}
+        runs.update(job.run_id for job in self.scheduler.running.values())
+        runs.update(pipeline.run_id for pipeline in self.pipeline_runs)
+        try:
+            runs.update(self.job_journal.active_runs())
+        except sqlite3.Error as e:
+            print(f"读取任务队列失败: {e}")
+        return runs
+
+    def show_cached_output(self, job):
+        """在非模态窗口中显示命中缓存的任务上次的输出，同一窗口累积多个任务"""
+        if self.cached_output_dialog is None:
+            self.cached_output_dialog = CachedOutputDialog(self)
+        self.cached_output_dialog.add_job(job)
+        self.cached_output_dialog.show()
+        self.cached_output_dialog.raise_()
+
+    def on_findings_found(self, job, findings):
+        """流水线任务的发现立即流入下一阶段"""
+        if job.pipeline is not None:
+            job.pipeline.on_findings(job, findings)
+
+    def launch_schedule(self, schedule):
+        """把定时任务的工具和目标提交到任务队列，返回 ScheduledRun；没有可执行内容时返回 None"""
+        tools_by_id = {tool.get("id"): tool for tool in self.tools}
+        tools = [tools_by_id[tool_id] for tool_id in schedule.get("tools", []) if tool_id in tools_by_id]
+        text = schedule.get("targets", "").strip()
+        if not tools or not text:
+            return None
+        source_id = None
+        run_id = new_run_id()
+        if text.startswith("@"):
+            path = text[1:].strip()
+            if not os.path.isfile(path):
+                return None
+            targets = TargetSource(path)
+            try:
+                source_id = self.job_journal.add_source(run_id, targets.path.resolve(),
+                                                        [tool.get("id") for tool in tools])
+            except sqlite3.Error as e:
+                print(f"写入任务队列失败: {e}")
+        else:
+            targets = [text]
+        run = ScheduledRun(schedule["name"])
+
+        def batches():
+            try:
+                for target in targets:
+                    jobs = [Job(tool, target, run_id) for tool in tools]
+                    for job in jobs:
+                        job.schedule = run
+                    run.outstanding += len(jobs)
+                    yield jobs
+            finally:
+                run.exhausted = True
+
+        self.scheduler.submit_source(batches(), source_id=source_id,
+                                     position=(lambda: targets.position) if source_id is not None else None)
+        return run
+
+    def show_schedule_menu(self):
+        """定时任务菜单：启用 / 立即运行 / 删除 / 新建"""
+        menu = self.schedule_btn.menu()
+        menu.clear()
+        for index, schedule in enumerate(self.schedules):
+            due = self.scan_scheduler.next_due(schedule) if schedule.get("enabled", True) else None
+            when = time.strftime("%m-%d %H:%M", time.localtime(due)) if due else "已停用"
+            sub_menu = menu.addMenu(f"{schedule['name']}（{schedule.get('trigger', '')}，下次 {when}）")
+            enabled_action = sub_menu.addAction("启用")
+            enabled_action.setCheckable(True)
+            enabled_action.setChecked(schedule.get("enabled", True))
+            enabled_action.toggled.connect(lambda checked, i=index: self.set_schedule_enabled(i, checked))
+            run_action = sub_menu.addAction("立即运行")
+            run_action.triggered.connect(
+                lambda checked, i=index: self.scan_scheduler.run_schedule(self.schedules[i])
+            )
+            delete_action = sub_menu.addAction("删除")
+            delete_action.triggered.connect(lambda checked, i=index: self.delete_schedule(i))
+        if self.schedules:
+            menu.addSeparator()
+        new_action = menu.addAction("用选中工具和当前目标新建定时任务...")
+        new_action.triggered.connect(self.create_schedule)
+
+    def create_schedule(self):
+        """以选中的工具和顶部输入的目标（或 @目标文件）新建定时任务"""
+        tools = self.get_selected_tools()
+        targets = self.url_input.text().strip()
+        if not tools:
+            QMessageBox.warning(self, "警告", "请至少选择一个工具")
+            return
+        if not targets:
+            QMessageBox.warning(self, "警告", "请输入目标URL")
+            return
+        dialog = DarkInputDialog(self, "新建定时任务", "名称:")
+        if dialog.exec_() != QDialog.Accepted or not dialog.get_text().strip():
+            return
+        name = dialog.get_text().strip()
+        if any(schedule["name"] == name for schedule in self.schedules):
+            QMessageBox.warning(self, "警告", "已存在同名的定时任务")
+            return
+        dialog = DarkInputDialog(self, "新建定时任务", "触发方式（如 30m、6h、1d，或 cron: 0 2 * * *）:", "1d")
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        trigger = dialog.get_text().strip()
+        try:
+            parse_trigger(trigger)
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", f"触发方式无效: {e}")
+            return
+        if targets.startswith("@"):
+            targets = "@" + os.path.abspath(targets[1:].strip())
+        self.schedules.append({
+            "name": name,
+            "tools": [tool.get("id") for tool in tools],
+            "targets": targets,
+            "trigger": trigger,
+            "enabled": True,
+            "catch_up": True,
+            "created": time.time(),
+        })
+        self.save_config()
+        self.scan_scheduler.reschedule()
+
+    def set_schedule_enabled(self, index, enabled):
+        self.schedules[index]["enabled"] = enabled
+        self.save_config()
+        self.scan_scheduler.reschedule()
+
+    def delete_schedule(self, index):
+        schedule = self.schedules[index]
+        if self.confirm_dialog("确认删除", f"确定要删除定时任务 '{schedule['name']}' 吗？"):
+            del self.schedules[index]
+            self.save_config()
+            self.scan_scheduler.reschedule()
+
+    def show_preset_menu(self):
+        """选择预设菜单：选中 / 启动 / 更新 / 删除 / 保存当前选中"""
+        menu = self.preset_btn.menu()
+        menu.clear()
+        lookup = self.tools_by_id()
+        for index, preset in enumerate(self.selection_presets):
+            available = sum(1 for tool_id in preset["tools"] if tool_id in lookup)
+            sub_menu = menu.addMenu(f"{preset['name']}（{available} 个工具）")
+            select_action = sub_menu.addAction("选中")
+            select_action.triggered.connect(lambda checked, i=index: self.apply_preset(i))
+            launch_action = sub_menu.addAction("启动")
+            launch_action.triggered.connect(lambda checked, i=index: self.launch_preset(i))
+            update_action = sub_menu.addAction("替换为当前选中的工具")
+            update_action.triggered.connect(lambda checked, i=index: self.update_preset(i))
+            delete_action = sub_menu.addAction("删除")
+            delete_action.triggered.connect(lambda checked, i=index: self.delete_preset(i))
+        if self.selection_presets:
+            menu.addSeparator()
+        save_action = menu.addAction("保存当前选中为预设...")
+        save_action.triggered.connect(self.create_preset)
+
+    def preset_tools(self, index):
+        """预设中仍然存在的工具，按预设中的顺序"""
+        lookup = self.tools_by_id()
+        return [lookup[tool_id] for tool_id in self.selection_presets[index]["tools"] if tool_id in lookup]
+
+    def create_preset(self):
+        tools = self.get_selected_tools()
+        if not tools:
+            QMessageBox.warning(self, "警告", "请至少选择一个工具")
+            return
+        dialog = DarkInputDialog(self, "保存选择预设", "名称:")
+        if dialog.exec_() != QDialog.Accepted or not dialog.get_text().strip():
+            return
+        name = dialog.get_text().strip()
+        if any(preset["name"] == name for preset in self.selection_presets):
+            QMessageBox.warning(self, "警告", "已存在同名的预设")
+            return
+        self.selection_presets.append({"name": name, "tools": [tool.get("id") for tool in tools]})
+        self.save_config()
+        self.statusBar().showMessage(f"已保存预设 {name}（{len(tools)} 个工具）")
+
+    def update_preset(self, index):
+        tools = self.get_selected_tools()
+        if not tools:
             QMessageBox.warning(self, "警告", "请至少选择一个工具")
             return
+        self.selection_presets[index]["tools"] = [tool.get("id") for tool in tools]
+        self.save_config()
 
-        # 为每个工具打开独立窗口
-        for tool in selected_tools:
-            path = tool.get("path", "").strip()  # 工具路径
-            params = tool.get("command", "").replace("{url}", url)  # 参数
-            startdir = tool.get("startdir", "") or None  # 起始位置
-            tool_name = tool.get("name", "未知")
-            
-            if path:
-                # 有路径时直接启动
-                full_command = f"{path} {params}".strip()
-                subprocess.Popen(full_command, shell=True, cwd=startdir)
+    def delete_preset(self, index):
+        preset = self.selection_presets[index]
+        if self.confirm_dialog("确认删除", f"确定要删除预设 '{preset['name']}' 吗？"):
+            del self.selection_presets[index]
+            self.save_config()
+
+    def apply_preset(self, index):
+        """选中预设中的工具：只更新选中模型和已显示的卡片，其余卡片创建时按模型显示"""
+        tools = self.preset_tools(index)
+        ids = [tool.get("id") for tool in tools]
+        changed = set(self.selection).union(ids)  # 原来选中的和预设中的工具，其余卡片不受影响
+        self.selection.replace(ids)
+        self.sync_card_selection(changed)
+        self.statusBar().showMessage(f"已选中预设 {self.selection_presets[index]['name']} 的 {len(tools)} 个工具")
+
+    def launch_preset(self, index):
+        """直接以当前目标启动预设中的工具，不需要先显示或选中它们"""
+        tools = self.preset_tools(index)
+        if not tools:
+            QMessageBox.warning(self, "警告", "预设中的工具都已被删除")
+            return
+        targets = self.open_target_source()
+        if targets is None:
+            return
+        tools = self.skip_broken_tools(tools)
+        if not tools:
+            return
+        force = bool(QApplication.keyboardModifiers() & Qt.ShiftModifier)
+        run_id, _, message, _ = self.launch_tools(tools, targets, force)
+        self.interactive_runs.add(run_id)
+        self.statusBar().showMessage(f"预设 {self.selection_presets[index]['name']}：{message}")
+
+    def show_worker_menu(self):
+        """工作节点菜单：各节点的连接状态 / 删除 / 添加"""
+        menu = self.worker_btn.menu()
+        menu.clear()
+        for index, worker in enumerate(self.worker_pool.workers):
+            if worker.ready:
+                state = f"运行 {len(worker.jobs)}/{worker.slots}，可用工具 {len(worker.tools)} 个"
             else:
-                # 路径为空时使用 cmd 窗口启动
-                cmd_command = f'start cmd /k "{params}"'
-                subprocess.Popen(cmd_command, shell=True, cwd=startdir)
+                state = f"未连接{'：' + worker.error if worker.error else ''}"
+            sub_menu = menu.addMenu(f"{worker.name}（{state}）")
+            delete_action = sub_menu.addAction("删除")
+            delete_action.triggered.connect(lambda checked, i=index: self.delete_worker(i))
+        if self.worker_pool.workers:
+            menu.addSeparator()
+        add_action = menu.addAction("添加工作节点...")
+        add_action.triggered.connect(self.add_worker)
+
+    def add_worker(self):
+        """登记一个运行 worker_agent.py 的节点"""
+        dialog = DarkInputDialog(self, "添加工作节点", f"地址（host:port，默认端口 {WORKER_DEFAULT_PORT}）:")
+        if dialog.exec_() != QDialog.Accepted or not dialog.get_text().strip():
+            return
+        address = dialog.get_text().strip()
+        if ":" not in address:
+            address = f"{address}:{WORKER_DEFAULT_PORT}"
+        if any(entry["address"] == address for entry in self.workers):
+            QMessageBox.warning(self, "警告", "该节点已登记")
+            return
+        dialog = DarkInputDialog(self, "添加工作节点", "token（节点未设置时留空）:")
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        self.workers.append({"address": address, "token": dialog.get_text().strip()})
+        self.save_config()
+        self.worker_pool.set_workers(self.workers)
+
+    def delete_worker(self, index):
+        worker = self.worker_pool.workers[index]
+        if self.confirm_dialog("确认删除", f"确定要删除工作节点 '{worker.name}' 吗？其上运行的任务会回到本机队列。"):
+            self.workers = [entry for entry in self.workers
+                            if (entry["address"], entry.get("token", "")) != (worker.address, worker.token)]
+            self.save_config()
+            self.worker_pool.set_workers(self.workers)
+
+    def show_pipeline_menu(self):
+        """流水线菜单：运行 / 新建 / 添加阶段 / 删除"""
+        menu = self.pipeline_btn.menu()
+        menu.clear()
+        for index, pipeline in enumerate(self.pipelines):
+            stages = len(pipeline.get("stages", []))
+            run_action = menu.addAction(f"运行 {pipeline['name']}（{stages} 个阶段）")
+            run_action.triggered.connect(lambda checked, i=index: self.run_pipeline(i))
+        if self.pipelines:
+            menu.addSeparator()
+        new_action = menu.addAction("用选中工具新建流水线...")
+        new_action.triggered.connect(self.create_pipeline)
+        if self.pipelines:
+            stage_menu = menu.addMenu("把选中工具添加为新阶段")
+            delete_menu = menu.addMenu("删除流水线")
+            for index, pipeline in enumerate(self.pipelines):
+                stage_action = stage_menu.addAction(pipeline["name"])
+                stage_action.triggered.connect(lambda checked, i=index: self.add_pipeline_stage(i))
+                delete_action = delete_menu.addAction(pipeline["name"])
+                delete_action.triggered.connect(lambda checked, i=index: self.delete_pipeline(i))
+
+    def create_pipeline(self):
+        """以当前选中的工具作为第一阶段新建流水线"""
+        tools = self.get_selected_tools()
+        if not tools:
+            QMessageBox.warning(self, "警告", "请至少选择一个工具")
+            return
+        dialog = DarkInputDialog(self, "新建流水线", "流水线名称:")
+        if dialog.exec_() == QDialog.Accepted:
+            name = dialog.get_text().strip()
+            if name:
+                self.pipelines.append({
+                    "name": name,
+                    "max_concurrent": 4,
+                    "stages": [{"tools": [t.get("id") for t in tools], "feed": "host"}],
+                })
+                self.save_config()
+
+    def add_pipeline_stage(self, index):
+        """把选中的工具作为流水线的下一阶段，上游发现按所选方式转换为目标"""
+        tools = self.get_selected_tools()
+        if not tools:
+            QMessageBox.warning(self, "警告", "请至少选择一个工具")
+            return
+        feeds = {"主机": "host", "主机:端口": "hostport", "URL": "url"}
+        dialog = DarkInputDialog(self, "添加阶段", "上游结果作为:", items=list(feeds))
+        if dialog.exec_() == QDialog.Accepted:
+            self.pipelines[index]["stages"].append({
+                "tools": [t.get("id") for t in tools],
+                "feed": feeds[dialog.get_text()],
+            })
+            self.save_config()
+
+    def delete_pipeline(self, index):
+        pipeline = self.pipelines[index]
+        if self.confirm_dialog("确认删除", f"确定要删除流水线 '{pipeline['name']}' 吗？"):
+            del self.pipelines[index]
+            self.save_config()
+
+    def run_pipeline(self, index):
+        """以顶部输入的目标（或目标文件）启动流水线"""
+        targets = self.open_target_source()
+        if targets is None:
+            return
+        tools_by_id = {tool.get("id"): tool for tool in self.tools}
+        pipeline = PipelineRun(self.pipelines[index], tools_by_id, self.scheduler)
+        if not any(tools for tools, _ in pipeline.stages):
+            QMessageBox.warning(self, "警告", "流水线中的工具已不存在")
+            return
+        # 非最后阶段的工具需要解析器才能把结果交给下游
+        silent = [tool.get("name") for tools, _ in pipeline.stages[:-1] for tool in tools
+                  if not (tool.get("capture") and tool.get("parser"))]
+        self.pipeline_runs.append(pipeline)
+        pipeline.start(targets)
+        if pipeline.is_done():
+            self.pipeline_runs.remove(pipeline)
+            self.statusBar().showMessage(f"流水线 {pipeline.name} 没有可执行的目标")
+            return
+        message = f"流水线 {pipeline.name} 已启动"
+        if silent:
+            message += f"（未配置捕获输出和结果解析，不会向下游输出: {', '.join(silent)}）"
+        self.statusBar().showMessage(message)
+
+    def show_findings(self):
+        """显示解析出的发现结果"""
+        dialog = FindingsDialog(self, self.findings_store)
+        dialog.exec_()
+
+    def show_output_search(self):
+        """全文搜索捕获的输出"""
+        dialog = OutputSearchDialog(self, self.output_index)
+        dialog.exec_()
+
+    def show_run_history(self):
+        """显示运行历史统计"""
+        dialog = RunHistoryDialog(self, self.tools, self.run_history, self.findings_store)
+        dialog.exec_()
 
     def show_category_context_menu(self, pos):
         """显示分类区域右键菜单（空白区域）"""
@@ -1468,6 +6895,10 @@ class MainWindow(QMainWindow):
                 # 更新子分类
                 if old_name in self.subcategories:
                     self.subcategories[new_name] = self.subcategories.pop(old_name)
+                # 更新折叠状态
+                self.collapsed_sections = {
+                    (new_name if cat == old_name else cat, sub) for cat, sub in self.collapsed_sections
+                }
                 self.refresh_category_panel()
                 self.save_config()
                 # 如果当前在该分类，更新显示
@@ -1514,6 +6945,9 @@ class MainWindow(QMainWindow):
 
         add_action = menu.addAction("添加工具")
         add_action.triggered.connect(self.add_tool)
+
+        import_action = menu.addAction("导入工具目录...")
+        import_action.triggered.connect(self.import_catalog)
         
         # 只有在非"全部"分类时才显示添加子分类选项
         if hasattr(self, 'current_category') and self.current_category != "全部":
@@ -1522,6 +6956,42 @@ class MainWindow(QMainWindow):
 
         menu.exec_(self.tools_container.mapToGlobal(pos))
     
+    def import_catalog(self):
+        """从 JSON / CSV / YAML 文件批量导入工具"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "导入工具目录", "",
+            "工具目录 (*.json *.jsonl *.ndjson *.csv *.yaml *.yml);;所有文件 (*)"
+        )
+        if not path:
+            return
+
+        importer = CatalogImporter(self.tools)
+        try:
+            new_tools = importer.run(path)
+        except Exception as e:
+            QMessageBox.warning(self, "导入失败", f"读取文件失败: {e}")
+            return
+
+        if new_tools:
+            # 一次性提交：补齐分类和子分类，只保存一次、只刷新一次
+            categories_changed = False
+            for tool in new_tools:
+                cat = tool["category"]
+                if cat not in self.categories:
+                    self.categories.append(cat)
+                    categories_changed = True
+                subcat = tool["subcategory"]
+                if subcat and subcat not in self.subcategories.setdefault(cat, []):
+                    self.subcategories[cat].append(subcat)
+            self.tools.extend(new_tools)
+            if categories_changed:
+                self.refresh_category_panel()
+            self.save_config()
+            self.refresh_tools_view()
+            self.tool_validator.validate(new_tools)
+
+        QMessageBox.information(self, "导入完成", importer.summary())
+
     def add_subcategory(self):
         """添加子分类"""
         if not hasattr(self, 'current_category') or self.current_category == "全部":
@@ -1582,6 +7052,7 @@ class MainWindow(QMainWindow):
                 tool_data["subcategory"] = subcategory  # 设置子分类
                 self.tools.append(tool_data)
                 self.save_config()
+                self.tool_validator.validate([tool_data])
                 self.filter_tools_by_category(self.current_category)
     
     def rename_subcategory(self, old_name):
@@ -1598,6 +7069,9 @@ class MainWindow(QMainWindow):
                 for tool in self.tools:
                     if tool.get("category") == self.current_category and tool.get("subcategory") == old_name:
                         tool["subcategory"] = new_name
+                if (self.current_category, old_name) in self.collapsed_sections:
+                    self.collapsed_sections.discard((self.current_category, old_name))
+                    self.collapsed_sections.add((self.current_category, new_name))
                 self.save_config()
                 self.filter_tools_by_category(self.current_category)
     
@@ -1659,29 +7133,700 @@ class MainWindow(QMainWindow):
             try:
                 with open(config_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    self.tools = data.get("tools", [])
+                    self.tools = [ToolRecord.from_dict(t) for t in data.get("tools", [])]
+                    # 手工编辑配置可能产生重复 id，重复的重新分配
+                    seen_ids = set()
+                    for tool in self.tools:
+                        if tool.id in seen_ids:
+                            tool.id = new_tool_id()
+                        seen_ids.add(tool.id)
                     saved_categories = data.get("categories", [])
                     if saved_categories:
                         self.categories = saved_categories
                     self.subcategories = data.get("subcategories", {})
+                    self.collapsed_sections = {tuple(key) for key in data.get("collapsed_sections", [])}
+                    self.max_concurrent_jobs = data.get("max_concurrent_jobs", 0)
+                    self.output_retention = data.get("output_retention", {})
+                    self.pipelines = data.get("pipelines", [])
+                    self.schedules = data.get("schedules", [])
+                    self.api_config.update(data.get("api", {}))
+                    self.workers = data.get("workers", [])
+                    self.metrics_config.update(data.get("metrics", {}))
+                    self.stall_threshold = data.get("stall_threshold", 0.5)
+                    self.selection_presets = data.get("selection_presets", [])
             except Exception as e:
                 print(f"加载配置失败: {e}")
 
+    @METRICS.timed("stars_falling_config_save_seconds")
     def save_config(self):
         """保存配置"""
+        # 所有对工具的修改最终都会保存配置
+        self.tag_index.invalidate()
+        self._tools_by_id = None
+        if len(self.selection):
+            self.selection.retain(self.tools_by_id())
         try:
             with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
                 json.dump({
-                    "tools": self.tools,
+                    "tools": [t.to_dict() for t in self.tools],
                     "categories": self.categories,
-                    "subcategories": self.subcategories
+                    "subcategories": self.subcategories,
+                    "collapsed_sections": sorted(list(key) for key in self.collapsed_sections),
+                    "max_concurrent_jobs": self.max_concurrent_jobs,
+                    "output_retention": self.output_retention,
+                    "pipelines": self.pipelines,
+                    "schedules": self.schedules,
+                    "api": self.api_config,
+                    "workers": self.workers,
+                    "metrics": self.metrics_config,
+                    "stall_threshold": self.stall_threshold,
+                    "selection_presets": self.selection_presets
                 }, f, ensure_ascii=False, indent=2)
+            METRICS.set("stars_falling_config_bytes", os.path.getsize(CONFIG_FILE))
         except Exception as e:
             print(f"保存配置失败: {e}")
 
 
+METRICS_DEFAULTS = {"file": "", "interval": 15, "port": 0}
+
+
+class EventLoopLagProbe(QObject):
+    """测量 Qt 事件循环的调度延迟：定时器实际触发的时间比预期晚了多久
+
+    last_beat 为最近一次触发的时间（perf_counter），供 StallWatchdog 在其他线程中读取。
+    """
+    INTERVAL = 250  # 毫秒
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(self.INTERVAL)
+        self.timer.timeout.connect(self._tick)
+        self.expected = None
+        self.last_beat = time.perf_counter()
+
+    def start(self):
+        self.last_beat = time.perf_counter()
+        self.expected = self.last_beat + self.INTERVAL / 1000
+        self.timer.start()
+
+    def _tick(self):
+        now = time.perf_counter()
+        METRICS.observe("stars_falling_event_loop_lag_seconds", max(0.0, now - self.expected))
+        self.expected = now + self.INTERVAL / 1000
+        self.last_beat = now
+
+
+DIAGNOSTICS_LOG = "diagnostics.log"
+
+
+class StallWatchdog:
+    """界面卡顿监视
+
+    EventLoopLagProbe 在主线程中定时更新心跳；辅助线程发现心跳停止超过 threshold 秒时，
+    每隔 SAMPLE_INTERVAL 秒采样一次主线程的 Python 调用栈，卡顿结束后把时长、正在执行的
+    处理函数（tools_drop、save_config、filter_tools_by_category 等）、采样中最常见的执行位置
+    和调用栈写入轮转的诊断日志。
+    """
+    SAMPLE_INTERVAL = 0.1
+    MAX_SAMPLES = 100
+    # 这些帧只是转发调用，不作为处理函数报告
+    PASS_THROUGH = {"<module>", "main", "<lambda>", "wrapper", "run_idle_task"}
+
+    def __init__(self, probe, threshold, path=DIAGNOSTICS_LOG):
+        self.probe = probe
+        self.threshold = threshold
+        self.logger = logging.getLogger("stars_falling.diagnostics")
+        if not self.logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=1024 * 1024, backupCount=3,
+                                                           encoding="utf-8", delay=True)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+            self.logger.propagate = False
+        self.source = os.path.normcase(os.path.abspath(__file__))
+        self.main_ident = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """在主线程中调用"""
+        self.main_ident = threading.get_ident()
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        interval = self.probe.INTERVAL / 1000
+        stalled_since = None
+        samples = []
+        while not self._stop.wait(self.SAMPLE_INTERVAL):
+            beat = self.probe.last_beat
+            if stalled_since is not None and beat > stalled_since:
+                # 心跳恢复：这次心跳比预期晚的时间就是卡顿时长
+                self._report(beat - stalled_since - interval, samples)
+                stalled_since = None
+                samples = []
+            elif time.perf_counter() - beat - interval > self.threshold:
+                stalled_since = beat
+                if len(samples) < self.MAX_SAMPLES:
+                    samples.append(self._sample())
+
+    def _sample(self):
+        """主线程当前的调用栈，最外层在前: [(文件, 行号, 函数), ...]"""
+        frame = sys._current_frames().get(self.main_ident)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, frame.f_lineno, getattr(code, "co_qualname", code.co_name)))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _own_frames(self, stack):
+        return [entry for entry in stack
+                if os.path.normcase(entry[0]) == self.source
+                and entry[2].rsplit(".", 1)[-1] not in self.PASS_THROUGH]
+
+    @staticmethod
+    def _describe(entry):
+        return f"{entry[2]} ({os.path.basename(entry[0])}:{entry[1]})"
+
+    def _report(self, duration, samples):
+        METRICS.inc("stars_falling_ui_stalls_total")
+        lines = [f"界面卡顿 {duration:.2f} s"]
+        if samples:
+            first = samples[0]
+            own = self._own_frames(first)
+            lines[0] += f"，处理函数 {self._describe(own[0] if own else first[-1])}"
+            # 每次采样取本程序中最内层的帧，出现最多的就是耗时所在
+            leaves = Counter((self._own_frames(stack) or stack)[-1] for stack in samples if stack)
+            if leaves:
+                (leaf, count), = leaves.most_common(1)
+                lines.append(f"  最常见位置: {self._describe(leaf)}（{count}/{len(samples)} 次采样）")
+            lines.append("  主线程调用栈:")
+            lines.extend(f'    File "{path}", line {lineno}, in {name}' for path, lineno, name in first)
+        try:
+            self.logger.warning("\n".join(lines))
+        except Exception as e:
+            print(f"写入诊断日志失败: {e}")
+
+
+class MetricsExporter(QObject):
+    """导出 METRICS：每隔 interval 秒写入文件（可供 node_exporter 的 textfile 收集器读取），
+    或者在 127.0.0.1:port 上提供 GET /metrics。两者都未配置时不做任何事
+    """
+
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self.config = dict(METRICS_DEFAULTS, **config)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.write_file)
+        self.server = None
+
+    def enabled(self):
+        return bool(self.config["file"] or self.config["port"])
+
+    def start(self):
+        if self.config["file"]:
+            self.write_file()
+            self.timer.start(max(1, int(self.config["interval"])) * 1000)
+        if self.config["port"]:
+            self.serve(int(self.config["port"]))
+
+    def write_file(self):
+        """先写临时文件再替换，读取方不会看到写了一半的内容"""
+        path = Path(self.config["file"])
+        temp = path.with_name(path.name + ".tmp")
+        try:
+            temp.write_text(METRICS.render(), encoding="utf-8")
+            os.replace(temp, path)
+        except OSError as e:
+            print(f"写入指标文件失败: {e}")
+
+    def serve(self, port):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = METRICS.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        except OSError as e:
+            print(f"启动指标接口失败: {e}")
+            return
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+CONTROL_API_DEFAULTS = {"enabled": False, "port": 8765, "token": ""}
+
+
+class ApiError(Exception):
+    """控制接口的请求错误，code 为 JSON-RPC 错误码"""
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class ControlApi(QObject):
+    """本机控制接口（默认关闭）
+
+    在后台线程中运行 asyncio HTTP 服务，只监听 127.0.0.1，大量客户端同时连接也不会阻塞 Qt 事件循环。
+    需要访问界面和调度器的操作通过信号交给主线程执行，结果经 Future 交还给 asyncio。
+
+        POST /rpc                JSON-RPC 2.0：list_tools / list_categories / submit / status / cancel
+        GET  /tools              工具列表（?category= 按分类筛选）
+        GET  /categories         分类和子分类
+        GET  /jobs               任务状态（?run= 按运行编号筛选）
+        GET  /jobs/<id>/output   以 chunked 方式持续输出任务的 stdout，任务结束后关闭
+        GET  /events             以 NDJSON 持续推送任务开始/结束事件
+
+    所有请求都需要携带 Authorization: Bearer <token>（首次启用时随机生成并保存在配置中）。
+    网页中的脚本也能向 127.0.0.1 发请求，因此带 Origin 头、Host 不是本机地址（DNS 重绑定）
+    或 /rpc 请求体不是 application/json 的请求一律拒绝。
+    """
+    LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+    MAX_JOBS = 1000  # 记住的任务数上限，超出时丢弃最早结束的任务
+    REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+               409: "Conflict", 415: "Unsupported Media Type"}
+    _call = pyqtSignal(object)  # 由 asyncio 线程发出，在主线程中执行
+
+    def __init__(self, window, port, token):
+        super().__init__(window)
+        if not token:
+            raise ValueError("控制接口必须设置 token")
+        self.window = window
+        self.port = port
+        self.token = token
+        self.jobs = OrderedDict()  # {job.id: job}
+        self.loop = None
+        self.server = None
+        self.subscribers = set()  # /events 客户端的 asyncio.Queue
+        self._subscribers_lock = threading.Lock()
+        self.rpc_methods = {
+            "list_tools": self.rpc_list_tools,
+            "list_categories": self.rpc_list_categories,
+            "submit": self.rpc_submit,
+            "status": self.rpc_status,
+            "cancel": self.rpc_cancel,
+        }
+        self._call.connect(lambda task: task())
+        window.scheduler.job_started.connect(lambda job: self._on_job_event("started", job))
+        window.scheduler.job_finished.connect(lambda job: self._on_job_event("finished", job))
+
+    # ---------- 主线程 ----------
+
+    @staticmethod
+    def job_info(job):
+        return {
+            "id": job.id,
+            "tool": job.tool.get("id"),
+            "name": job.tool.get("name", ""),
+            "target": job.target,
+            "run": job.run_id,
+            "state": job.state,
+            "exit": job.exit_code,
+            "start": job.start,
+            "end": job.end,
+            "dir": str(job.outdir) if job.uses_outdir() else None,
+        }
+
+    def _remember(self, job):
+        self.jobs[job.id] = job
+        self.jobs.move_to_end(job.id)
+        excess = len(self.jobs) - self.MAX_JOBS
+        for job_id in [job_id for job_id, old in self.jobs.items()
+                       if old.state not in ("queued", "running", "cancelling")][:max(0, excess)]:
+            del self.jobs[job_id]
+
+    def _on_job_event(self, event, job):
+        self._remember(job)
+        if self.loop is None:
+            return
+        with self._subscribers_lock:
+            subscribers = list(self.subscribers)
+        if subscribers:
+            data = {"event": event, "job": self.job_info(job)}
+            for subscriber in subscribers:
+                self.loop.call_soon_threadsafe(subscriber.put_nowait, data)
+
+    def rpc_list_tools(self, category=None):
+        return [{
+            "id": tool.get("id"),
+            "name": tool.get("name", ""),
+            "category": tool.get("category", ""),
+            "subcategory": tool.get("subcategory", ""),
+            "description": tool.get("description", ""),
+            "capture": bool(tool.get("capture")),
+            "parser": tool.get("parser") or None,
+        } for tool in self.window.tools if category is None or tool.get("category") == category]
+
+    def rpc_list_categories(self):
+        return {"categories": list(self.window.categories), "subcategories": dict(self.window.subcategories)}
+
+    def rpc_submit(self, tools, targets, force=False):
+        """提交 工具 × 目标；tools 为工具 id 或名称列表，targets 为目标列表、单个目标或 @目标文件
+
+        目标常常转发自其他工具的扫描数据，列表和单个目标必须能规范化且不含 shell 特殊字符，否则整个请求被拒绝。
+        """
+        by_id = {tool.get("id"): tool for tool in self.window.tools}
+        by_name = {tool.get("name", "").lower(): tool for tool in self.window.tools}
+        selected = [by_id.get(key) or by_name.get(str(key).lower()) for key in tools]
+        unknown = [key for key, tool in zip(tools, selected) if tool is None]
+        if unknown:
+            raise ApiError(-32602, f"未知的工具: {', '.join(map(str, unknown))}")
+        if isinstance(targets, str):
+            if targets.startswith("@"):
+                path = targets[1:].strip()
+                if not os.path.isfile(path):
+                    raise ApiError(-32602, f"目标文件不存在: {path}")
+                targets = TargetSource(path)
+            else:
+                targets = [targets]
+        if not isinstance(targets, TargetSource):
+            targets = [str(target).strip() for target in targets if str(target).strip()]
+            normalized = [normalize_target(target) for target in targets]
+            invalid = [target for target, clean in zip(targets, normalized)
+                       if not clean or UNSAFE_TARGET_RE.search(clean)]
+            if invalid:
+                raise ApiError(-32602, f"无效的目标: {', '.join(invalid[:10])}")
+            targets = normalized
+        if not selected or not targets:
+            raise ApiError(-32602, "工具和目标都不能为空")
+        run_id, jobs, message, source_id = self.window.launch_tools(selected, targets, bool(force))
+        for job in jobs:
+            self._remember(job)
+        self.window.statusBar().showMessage(f"控制接口：{message}")
+        # 目标文件的任务陆续生成，提交时还没有任务编号：用 status(run=...) 查询已生成的任务
+        return {"run": run_id, "jobs": [job.id for job in jobs], "source": source_id, "message": message}
+
+    def rpc_status(self, jobs=None, run=None):
+        if run is not None:
+            # 目标文件生成的任务在开始运行前只在调度器的队列中
+            for job in self.window.scheduler.queue:
+                if job.run_id == run and job.id not in self.jobs:
+                    self._remember(job)
+        if jobs is not None:
+            selected = [self.jobs[job_id] for job_id in jobs if job_id in self.jobs]
+        else:
+            selected = [job for job in self.jobs.values() if run is None or job.run_id == run]
+        return [self.job_info(job) for job in selected]
+
+    def rpc_cancel(self, jobs):
+        cancelled = [job_id for job_id in jobs
+                     if job_id in self.jobs and self.window.scheduler.cancel(self.jobs[job_id])]
+        return {"cancelled": cancelled}
+
+    # ---------- asyncio 线程 ----------
+
+    def start(self):
+        """在后台线程中启动服务，成功时返回 True"""
+        ready = threading.Event()
+        threading.Thread(target=self._serve, args=(ready,), daemon=True).start()
+        ready.wait(5)
+        return self.server is not None
+
+    def stop(self):
+        """关闭监听并结束后台事件循环"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop = None
+
+    def _serve(self, ready):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self.server = loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", self.port))
+        except OSError as e:
+            print(f"启动控制接口失败: {e}")
+            ready.set()
+            return
+        self.loop = loop
+        ready.set()
+        loop.run_forever()
+
+    async def call_main(self, fn, *args, **kwargs):
+        """在 Qt 主线程中执行 fn 并等待结果"""
+        future = concurrent.futures.Future()
+
+        def task():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+        self._call.emit(task)
+        return await asyncio.wrap_future(future)
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                await self._send_json(writer, 400, {"error": "无效的请求"})
+                return
+            method, path, query, headers, body = request
+            if "origin" in headers or not self._loopback_host(headers.get("host")):
+                await self._send_json(writer, 403, {"error": "不接受来自网页的请求"})
+                return
+            if not hmac.compare_digest(headers.get("authorization", "").encode("utf-8"),
+                                       f"Bearer {self.token}".encode("utf-8")):
+                await self._send_json(writer, 401, {"error": "需要有效的 token"})
+                return
+            if method == "POST" and headers.get("content-type", "").split(";")[0].strip() != "application/json":
+                await self._send_json(writer, 415, {"error": "请求体必须是 application/json"})
+                return
+            output = re.fullmatch(r"/jobs/(\d+)/output", path)
+            if method == "POST" and path == "/rpc":
+                await self._send_json(writer, 200, await self._rpc(body))
+            elif method == "GET" and path == "/tools":
+                await self._send_json(writer, 200, await self.call_main(self.rpc_list_tools, query.get("category")))
+            elif method == "GET" and path == "/categories":
+                await self._send_json(writer, 200, await self.call_main(self.rpc_list_categories))
+            elif method == "GET" and path == "/jobs":
+                await self._send_json(writer, 200, await self.call_main(self.rpc_status, run=query.get("run")))
+            elif method == "GET" and output:
+                await self._stream_output(writer, int(output.group(1)))
+            elif method == "GET" and path == "/events":
+                await self._stream_events(writer)
+            else:
+                await self._send_json(writer, 404, {"error": "未知的路径"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # 客户端已断开
+        except Exception as e:
+            print(f"控制接口请求失败: {e}")
+        finally:
+            writer.close()
+
+    def _loopback_host(self, host):
+        """Host 头必须是本机地址（可带端口）；没有 Host 头的请求不是浏览器发出的"""
+        if host is None:
+            return True
+        host = host.strip().lower()
+        return any(host == name or host == f"{name}:{self.port}" for name in self.LOOPBACK_HOSTS)
+
+    async def _read_request(self, reader):
+        """读取一个 HTTP 请求，返回 (方法, 路径, 查询参数, 请求头, 请求体)；格式错误时返回 None"""
+        parts = (await reader.readline()).decode("latin-1").split()
+        if len(parts) != 3:
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) > 100:
+                return None
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > 1024 * 1024:
+            return None
+        body = await reader.readexactly(length) if length else b""
+        url = urllib.parse.urlsplit(parts[1])
+        query = {key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()}
+        return parts[0].upper(), url.path, query, headers, body
+
+    async def _rpc(self, body):
+        try:
+            request = json.loads(body or b"null")
+        except ValueError:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "无法解析 JSON"}}
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "无效的请求"}}
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        method = self.rpc_methods.get(request["method"])
+        if method is None:
+            response["error"] = {"code": -32601, "message": f"未知的方法: {request['method']}"}
+            return response
+        params = request.get("params") or {}
+        try:
+            if isinstance(params, list):
+                response["result"] = await self.call_main(method, *params)
+            else:
+                response["result"] = await self.call_main(method, **params)
+        except ApiError as e:
+            response["error"] = {"code": e.code, "message": str(e)}
+        except TypeError as e:
+            response["error"] = {"code": -32602, "message": f"参数错误: {e}"}
+        return response
+
+    async def _send_json(self, writer, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {self.REASONS[status]}\r\n"
+                     f"Content-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+
+    async def _start_stream(self, writer, content_type):
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n"
+                     f"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+
+    async def _send_chunk(self, writer, data):
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await writer.drain()
+
+    async def _stream_output(self, writer, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            await self._send_json(writer, 404, {"error": "未知的任务"})
+            return
+        if not job.tool.get("capture"):
+            await self._send_json(writer, 409, {"error": "该任务没有捕获输出"})
+            return
+        await self._start_stream(writer, "text/plain; charset=utf-8")
+        position = 0
+        while True:
+            finished = job.state not in ("queued", "running", "cancelling")
+            try:
+                with open_run_output(job.outdir, "stdout.log") as f:
+                    f.seek(position)
+                    data = f.read(65536)
+            except (OSError, KeyError, ValueError):
+                data = b""
+            if data:
+                position += len(data)
+                await self._send_chunk(writer, data)
+            elif finished:
+                break
+            else:
+                await asyncio.sleep(0.25)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _stream_events(self, writer):
+        queue = asyncio.Queue()
+        with self._subscribers_lock:
+            self.subscribers.add(queue)
+        try:
+            await self._start_stream(writer, "application/x-ndjson")
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), 15)
+                except asyncio.TimeoutError:
+                    event = {"event": "ping"}  # 保持连接，同时发现已断开的客户端
+                await self._send_chunk(writer, (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+        finally:
+            with self._subscribers_lock:
+                self.subscribers.discard(queue)
+
+
+class SingleInstance(QObject):
+    """单实例锁和本地 IPC 通道
+
+    第一个实例持有锁文件并监听本地套接字（Windows 上为命名管道）；之后启动的实例在创建
+    QApplication 之前连接该通道，把命令行参数以一行 JSON 转发给已运行的窗口后立即退出。
+    名称由配置文件的绝对路径得出，不同目录下的两份程序互不影响。
+    """
+    message_received = pyqtSignal(dict)
+
+    def __init__(self, config_path=CONFIG_FILE):
+        super().__init__()
+        digest = hashlib.sha1(os.path.abspath(config_path).encode("utf-8")).hexdigest()[:12]
+        self.name = f"stars_falling_{digest}"
+        self.lock = QLockFile(os.path.join(QDir.tempPath(), f"{self.name}.lock"))
+        self.server = None
+
+    def acquire(self):
+        """尝试成为主实例；锁由仍在运行的进程持有时返回 False（进程已退出的残留锁会被自动清除）"""
+        return self.lock.tryLock(0)
+
+    def send(self, message, timeout=2000):
+        """把消息转发给主实例，收到确认时返回 True；主实例可能还在启动，连接失败时在超时前重试"""
+        data = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        deadline = time.time() + timeout / 1000
+        while True:
+            socket = QLocalSocket()
+            socket.connectToServer(self.name)
+            if socket.waitForConnected(200):
+                socket.write(data)
+                socket.flush()
+                acknowledged = socket.waitForReadyRead(timeout) and bytes(socket.readLine()).strip() == b"ok"
+                socket.disconnectFromServer()
+                return acknowledged
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def listen(self):
+        """主实例开始接收转发的命令行参数（需要在创建 QApplication 之后调用）"""
+        QLocalServer.removeServer(self.name)  # 清除崩溃后残留的套接字文件
+        self.server = QLocalServer(self)
+        if not self.server.listen(self.name):
+            print(f"启动单实例通道失败: {self.server.errorString()}")
+            return
+        self.server.newConnection.connect(self._on_new_connection)
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda s=socket: self._on_ready_read(s))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def _on_ready_read(self, socket):
+        if not socket.canReadLine():
+            return
+        try:
+            message = json.loads(bytes(socket.readLine()).decode("utf-8"))
+        except ValueError:
+            socket.disconnectFromServer()
+            return
+        socket.write(b"ok\n")
+        socket.flush()
+        if isinstance(message, dict):
+            self.message_received.emit(message)
+
+
+def parse_args(argv):
+    """解析命令行参数，未识别的参数原样交给 Qt"""
+    parser = argparse.ArgumentParser(description="Stars_Falling 渗透测试工具启动器")
+    parser.add_argument("--bench-memory", type=int, nargs="?", const=50000, metavar="N",
+                        help="对比 dict 与 ToolRecord 加载 N 个工具的内存占用后退出")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="启动完成后打印各阶段耗时")
+    parser.add_argument("--target", metavar="TARGET",
+                        help="填入目标（可以是 @目标文件）；已有实例在运行时转发给该实例")
+    parser.add_argument("--select", action="append", default=[], metavar="NAME",
+                        help="选中该分类、子分类或名称下的工具（#标签 选中带该标签的工具），可重复指定")
+    parser.add_argument("--new-instance", action="store_true",
+                        help="不转发给已运行的实例，总是打开新窗口")
+    parser.add_argument("--api-port", type=int, metavar="PORT",
+                        help="在 127.0.0.1:PORT 上启动本机控制接口，优先于配置中的端口；不修改配置，"
+                             "配置中没有 token 时生成只在本次运行有效的 token 并打印")
+    return parser.parse_known_args(argv)
+
+
 def main():
-    app = QApplication(sys.argv)
+    STARTUP.mark("导入模块")
+    args, qt_args = parse_args(sys.argv[1:])
+    if args.bench_memory:
+        benchmark_tool_memory(args.bench_memory)
+        return
+
+    # 已有实例在运行时把参数转发过去后直接退出，不再创建界面
+    command = {"target": args.target, "select": args.select}
+    instance = SingleInstance()
+    if not args.new_instance and not instance.acquire():
+        if instance.send(dict(command, forwarded=True)):
+            return
+        print("已有实例在运行，但无法连接到该实例")
+        sys.exit(1)
+
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setStyle('Fusion')
     
     # 设置深色主题
@@ -1699,9 +7844,16 @@ def main():
     palette.setColor(QPalette.Highlight, QColor(137, 180, 250))
     palette.setColor(QPalette.HighlightedText, QColor(30, 30, 46))
     app.setPalette(palette)
+    STARTUP.mark("创建应用")
 
     window = MainWindow()
+    instance.message_received.connect(window.handle_remote_command)
+    if not args.new_instance:
+        instance.listen()
     window.show()
+    # 窗口显示后布局尺寸才确定，此时只渲染可见区域内的卡片
+    window.materialize_visible_sections()
+    STARTUP.mark("首屏渲染")
     
     # Windows 深色标题栏
     if sys.platform == 'win32':
@@ -1722,6 +7874,21 @@ def main():
             )
         except:
             pass
+
+    if args.target or args.select:
+        window.handle_remote_command(command)
+
+    # 其余非首屏工作推迟到事件循环空闲时完成
+    window.defer_until_idle(window.prefetch_lazy_sections)
+    window.defer_until_idle(window.offer_resume_jobs)
+    # 空闲任务还没有执行，控制接口启动时使用命令行的端口而不是配置中的端口
+    window.cli_api_port = args.api_port
+    if args.startup_report:
+        def report_startup():
+            STARTUP.mark("空闲任务")
+            print(STARTUP.report())
+            window.idle_tasks_done.disconnect(report_startup)
+        window.idle_tasks_done.connect(report_startup)
     
     sys.exit(app.exec_())
 
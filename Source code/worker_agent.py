@@ -0,0 +1,249 @@
+"""
+Stars Falling 工作节点
+
+在其他 Linux 主机上运行，接受启动器分发的任务（只依赖标准库）：
+
+    python3 worker_agent.py --host 0.0.0.0 --port 9700 --slots 8 --token <token>
+
+节点会把收到的命令交给 shell 执行，能连上端口并通过 token 校验的人就能在节点上运行任意命令。
+默认只监听 127.0.0.1；监听其他地址时必须设置 token。连接没有加密，token 和任务输出都以明文传输，
+只应在可信网络中使用，跨不可信网络时请通过 SSH 隧道或 VPN 连接。
+
+协议为 TCP 上逐行的 JSON 消息：
+    启动器 → 节点  hello {version, token, tools: {工具id: 程序}}   probe {tools}
+                   run {job, command, capture}                   cancel {job}
+    节点 → 启动器  ready {name, slots, tools: [可用的工具id]}       tools {tools}
+                   started {job}   output {job, stream, data}     file {job, name, offset, data}
+                   exit {job, code}   busy {job}                  error {message}
+data 为 base64 编码。命令中的 {outdir} 展开为节点上该任务的临时目录，任务结束后
+目录中的文件传回启动器，再删除临时目录。启动器断开时结束它提交的所有任务。
+槽位由所有启动器共享，启动器看到的空闲槽位可能已过期：没有空闲槽位时回复 busy，由启动器重新排队。
+"""
+import argparse
+import asyncio
+import base64
+import hmac
+import ipaddress
+import json
+import os
+import shutil
+import shlex
+import signal
+import socket
+import tempfile
+from pathlib import Path
+
+PROTOCOL_VERSION = 1
+CHUNK_SIZE = 65536
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def tool_available(program):
+    """程序是否能在本机运行：绝对路径检查文件，否则在 PATH 中查找"""
+    if not program:
+        return False
+    if os.sep in program:
+        return os.path.isfile(program) and os.access(program, os.X_OK)
+    return shutil.which(program) is not None
+
+
+class WorkerAgent:
+    """工作节点：所有启动器连接共享 slots 个并发槽位"""
+
+    def __init__(self, name, slots, token="", workdir=None):
+        self.name = name
+        self.slots = slots
+        self.token = token
+        self.workdir = Path(workdir or tempfile.gettempdir()) / "stars_falling_worker"
+        self.running = 0
+        self.connections = set()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port, limit=16 * 1024 * 1024)
+        print(f"工作节点 {self.name} 已在 {host}:{port} 上启动，{self.slots} 个并发槽位")
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        async with server:
+            await stop.wait()
+        # 退出前结束所有任务的进程树，不留下孤儿进程
+        for connection in list(self.connections):
+            connection.close()
+            connection.writer.close()
+        await asyncio.sleep(0.1)  # 让各连接的处理协程读到 EOF 后正常结束
+
+    async def handle(self, reader, writer):
+        connection = Connection(self, writer)
+        self.connections.add(connection)
+        peer = writer.get_extra_info("peername")
+        try:
+            hello = json.loads(await reader.readline() or b"null")
+            if not isinstance(hello, dict) or hello.get("type") != "hello":
+                return
+            if self.token and not hmac.compare_digest(str(hello.get("token", "")), self.token):
+                await connection.send({"type": "error", "message": "token 无效"})
+                return
+            print(f"启动器已连接: {peer}")
+            await connection.send({
+                "type": "ready",
+                "version": PROTOCOL_VERSION,
+                "name": self.name,
+                "slots": self.slots,
+                "tools": self.available(hello.get("tools", {})),
+            })
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                kind = message.get("type")
+                if kind == "run":
+                    connection.start(message)
+                elif kind == "cancel":
+                    connection.cancel(message.get("job"))
+                elif kind == "probe":
+                    await connection.send({"type": "tools", "tools": self.available(message.get("tools", {}))})
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError) as e:
+            print(f"连接异常 {peer}: {e}")
+        finally:
+            self.connections.discard(connection)
+            connection.close()
+            writer.close()
+            print(f"启动器已断开: {peer}")
+
+    @staticmethod
+    def available(tools):
+        return [tool_id for tool_id, program in tools.items() if tool_available(program)]
+
+
+class Connection:
+    """一个启动器连接及其提交的任务"""
+
+    def __init__(self, agent, writer):
+        self.agent = agent
+        self.writer = writer
+        self.lock = asyncio.Lock()
+        self.processes = {}  # {job: 进程}
+        self.cancelled = set()  # 进程启动前就收到取消的任务
+        self.tasks = set()
+
+    async def send(self, message):
+        async with self.lock:
+            self.writer.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+            await self.writer.drain()
+
+    def start(self, message):
+        task = asyncio.ensure_future(self.run(message))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run(self, message):
+        job = message.get("job")
+        if self.agent.running >= self.agent.slots:
+            await self.send({"type": "busy", "job": job})
+            return
+        self.agent.running += 1
+        outdir = Path(tempfile.mkdtemp(prefix=f"job{job}-", dir=self.agent.workdir))
+        try:
+            command = message.get("command", "").replace("{outdir}", shlex.quote(str(outdir)))
+            try:
+                process = await asyncio.create_subprocess_shell(
+                    command, cwd=str(outdir), stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                    start_new_session=True,
+                )
+            except OSError as e:
+                await self.send({"type": "exit", "job": job, "code": -1, "error": str(e)})
+                return
+            self.processes[job] = process
+            if job in self.cancelled:
+                self.cancel(job)
+            await self.send({"type": "started", "job": job})
+            await asyncio.gather(self.pump(job, process.stdout, "stdout"),
+                                 self.pump(job, process.stderr, "stderr"))
+            code = await process.wait()
+            self.processes.pop(job, None)
+            await self.send_files(job, outdir)
+            await self.send({"type": "exit", "job": job, "code": code})
+        except ConnectionError:
+            pass  # 启动器已断开，进程由 close() 结束
+        finally:
+            self.agent.running -= 1
+            shutil.rmtree(outdir, ignore_errors=True)
+
+    async def pump(self, job, stream, name):
+        while True:
+            chunk = await stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            await self.send({"type": "output", "job": job, "stream": name,
+                             "data": base64.b64encode(chunk).decode("ascii")})
+
+    async def send_files(self, job, outdir):
+        """把工具写入 {outdir} 的文件分块传回启动器"""
+        for path in sorted(outdir.rglob("*")):
+            if not path.is_file():
+                continue
+            name = path.relative_to(outdir).as_posix()
+            offset = 0
+            with open(path, "rb") as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk and offset:
+                        break
+                    await self.send({"type": "file", "job": job, "name": name, "offset": offset,
+                                     "data": base64.b64encode(chunk).decode("ascii")})
+                    offset += len(chunk)
+                    if not chunk:
+                        break
+
+    def cancel(self, job):
+        process = self.processes.get(job)
+        if process is None:
+            self.cancelled.add(job)
+        else:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError as e:
+                print(f"结束进程失败 {job}: {e}")
+
+    def close(self):
+        """启动器断开：结束该连接的所有进程（启动器会把这些任务重新排队）"""
+        for job in list(self.processes):
+            self.cancel(job)
+        self.processes.clear()
+        for task in self.tasks:
+            task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stars Falling 工作节点")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1，监听其他地址时必须设置 token）")
+    parser.add_argument("--port", type=int, default=9700, help="监听端口（默认 9700）")
+    parser.add_argument("--slots", type=int, default=os.cpu_count() or 4, help="同时运行的任务数（默认 CPU 核数）")
+    parser.add_argument("--token", default=os.environ.get("STARS_FALLING_TOKEN", ""),
+                        help="启动器连接时需要提供的 token（默认读取 STARS_FALLING_TOKEN）")
+    parser.add_argument("--name", default=socket.gethostname(), help="节点名称（默认主机名）")
+    parser.add_argument("--workdir", help="任务临时目录的上级目录（默认系统临时目录）")
+    args = parser.parse_args()
+    if not args.token and not is_loopback(args.host):
+        parser.error(f"监听非本机地址 {args.host} 时必须设置 --token（或 STARS_FALLING_TOKEN），否则任何人都能在本机执行命令")
+    agent = WorkerAgent(args.name, max(1, args.slots), args.token, args.workdir)
+    agent.workdir.mkdir(parents=True, exist_ok=True)
+    try:
+        asyncio.run(agent.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""在 127.0.0.1 上测试本机控制接口：token 和浏览器请求的拒绝、submit → status、cancel"""
+import concurrent.futures
+import http.client
+import json
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+SOURCE_DIR = Path(__file__).resolve().parent.parent / "Source code"
+sys.path.insert(0, str(SOURCE_DIR))
+
+pytest.importorskip("PyQt5")
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="测试工具使用 POSIX shell 命令")
+
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import main  # noqa: E402
+
+TOKEN = "secret"
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until(app, condition, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        app.processEvents()
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def api(app, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    window = main.MainWindow()
+    window.tools = [
+        main.ToolRecord({"name": "echo", "category": "test", "command": "echo {url}", "capture": True}),
+        main.ToolRecord({"name": "sleeper", "category": "test", "command": "sleep 30; echo {url}", "capture": True}),
+    ]
+    control = main.ControlApi(window, free_port(), TOKEN)
+    assert control.start()
+    yield app, control
+    control.stop()
+    for job in list(window.scheduler.running.values()):
+        window.scheduler.cancel(job)
+    window.deleteLater()
+
+
+class Client:
+    """在线程池中发请求，同时在主线程处理 Qt 事件（RPC 在主线程中执行）"""
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def __init__(self, app, control):
+        self.app = app
+        self.port = control.port
+
+    def request(self, method, path, body=None, headers=None):
+        def send():
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                return response.status, response.read()
+            finally:
+                conn.close()
+        future = self.executor.submit(send)
+        assert wait_until(self.app, future.done)
+        return future.result()
+
+    def rpc(self, method, **params):
+        body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+        status, data = self.request("POST", "/rpc", body, {"Authorization": f"Bearer {TOKEN}",
+                                                           "Content-Type": "application/json"})
+        assert status == 200
+        return json.loads(data)
+
+
+def test_rejects_missing_token_and_browser_requests(api):
+    client = Client(*api)
+    assert client.request("GET", "/tools")[0] == 401
+    assert client.request("GET", "/tools", headers={"Authorization": "Bearer wrong"})[0] == 401
+    auth = {"Authorization": f"Bearer {TOKEN}"}
+    assert client.request("GET", "/tools", headers=dict(auth, Origin="http://evil.example"))[0] == 403
+    assert client.request("GET", "/tools", headers=dict(auth, Host="evil.example"))[0] == 403
+    assert client.request("POST", "/rpc", "{}", dict(auth, **{"Content-Type": "text/plain"}))[0] == 415
+    status, data = client.request("GET", "/tools", headers=auth)
+    assert status == 200
+    assert [tool["name"] for tool in json.loads(data)] == ["echo", "sleeper"]
+
+
+def test_submit_then_status(api):
+    app, control = api
+    client = Client(app, control)
+    result = client.rpc("submit", tools=["echo"], targets=["Example.COM", "127.0.0.1:8080"])["result"]
+    assert len(result["jobs"]) == 2
+
+    def states():
+        return [job["state"] for job in client.rpc("status", run=result["run"])["result"]]
+    assert wait_until(app, lambda: states() == ["done", "done"])
+    jobs = client.rpc("status", jobs=result["jobs"])["result"]
+    assert sorted(job["target"] for job in jobs) == ["127.0.0.1:8080", "example.com"]
+    assert all(job["exit"] == 0 for job in jobs)
+
+
+def test_submit_rejects_unsafe_targets(api):
+    app, control = api
+    client = Client(app, control)
+    response = client.rpc("submit", tools=["echo"], targets=["example.com", "example.com;touch pwned"])
+    assert response["error"]["code"] == -32602
+    assert not control.jobs
+    assert not Path("pwned").exists()
+
+
+def test_cancel_running_job(api):
+    app, control = api
+    client = Client(app, control)
+    job_id = client.rpc("submit", tools=["sleeper"], targets="example.com")["result"]["jobs"][0]
+
+    def state():
+        return client.rpc("status", jobs=[job_id])["result"][0]["state"]
+    assert wait_until(app, lambda: state() == "running")
+    assert client.rpc("cancel", jobs=[job_id])["result"] == {"cancelled": [job_id]}
+    assert wait_until(app, lambda: state() == "cancelled")
@@ -0,0 +1,153 @@
+"""在本机用多个 worker_agent.py 进程测试任务分发：按空闲槽位分配、工具探测、busy 和断开后重新排队"""
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+SOURCE_DIR = Path(__file__).resolve().parent.parent / "Source code"
+sys.path.insert(0, str(SOURCE_DIR))
+
+pytest.importorskip("PyQt5")
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="工作节点只支持 POSIX")
+
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+import main  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until(app, condition, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        app.processEvents()
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class Agent:
+    def __init__(self, tmp_path, slots, name):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, str(SOURCE_DIR / "worker_agent.py"), "--port", str(self.port),
+             "--slots", str(slots), "--name", name, "--token", "t", "--workdir", str(tmp_path)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("工作节点没有启动")
+
+    @property
+    def entry(self):
+        return {"address": f"127.0.0.1:{self.port}", "token": "t"}
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(10)
+
+
+@pytest.fixture
+def agents(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    started = []
+
+    def start(slots, name):
+        agent = Agent(tmp_path, slots, name)
+        started.append(agent)
+        return agent
+
+    yield start
+    for agent in started:
+        agent.stop()
+
+
+def make_pool(app, tools, entries):
+    scheduler = main.JobScheduler(main.RunHistory(), max_concurrent=0)
+    pool = main.WorkerPool(scheduler, lambda: tools)
+    scheduler.workers = pool
+    pool.set_workers(entries)
+    assert wait_until(app, lambda: all(worker.ready for worker in pool.workers))
+    return scheduler, pool
+
+
+def sleeper(name="sleeper", seconds=1):
+    return main.ToolRecord({"name": name, "category": "test", "command": f"sleep {seconds}; echo {{url}}",
+                            "capture": True})
+
+
+def test_probe_reports_available_tools(app, agents):
+    present = sleeper()
+    missing = main.ToolRecord({"name": "missing", "category": "test", "capture": True,
+                               "command": "stars-falling-no-such-program {url}"})
+    tools = [present, missing]
+    _, pool = make_pool(app, tools, [agents(2, "a").entry])
+    worker = pool.workers[0]
+    assert worker.tools == {present.id}
+
+    # 连接之后新增的工具在第一次分配时询问节点
+    added = sleeper("added")
+    tools.append(added)
+    assert not worker.can_run(main.Job(added, "x"))
+    assert wait_until(app, lambda: added.id in worker.tools)
+
+
+def test_jobs_placed_by_free_slot_ratio(app, agents):
+    tool = sleeper(seconds=2)
+    small, large = agents(1, "small"), agents(3, "large")
+    scheduler, pool = make_pool(app, [tool], [small.entry, large.entry])
+    jobs = scheduler.submit([main.Job(tool, f"t{i}") for i in range(4)])
+    by_name = {worker.name: worker for worker in pool.workers}
+    assert len(by_name["small"].jobs) == 1
+    assert len(by_name["large"].jobs) == 3
+    assert wait_until(app, lambda: all(job.state == "done" for job in jobs))
+    assert all(job.exit_code == 0 for job in jobs)
+
+
+def test_disconnect_requeues_jobs(app, agents):
+    tool = sleeper(seconds=3)
+    keep, lost = agents(1, "keep"), agents(2, "lost")
+    scheduler, pool = make_pool(app, [tool], [keep.entry, lost.entry])
+    jobs = scheduler.submit([main.Job(tool, f"t{i}") for i in range(3)])
+    lost_worker = next(worker for worker in pool.workers if worker.name == "lost")
+    moved = [job for job in jobs if job.worker is lost_worker]
+    assert len(moved) == 2
+    lost.stop()
+    assert wait_until(app, lambda: not lost_worker.ready)
+    assert all(job.worker is not lost_worker and job.state in ("queued", "running") for job in moved)
+    assert wait_until(app, lambda: all(job.state == "done" for job in jobs), timeout=20)
+
+
+def test_busy_node_requeues_instead_of_failing(app, agents):
+    tool = sleeper(seconds=2)
+    agent = agents(1, "shared")
+    first, _ = make_pool(app, [tool], [agent.entry])
+    second, second_pool = make_pool(app, [tool], [agent.entry])
+    taken = first.submit([main.Job(tool, "a")])
+    assert wait_until(app, lambda: taken[0].state == "running")
+    # 第二个启动器认为节点仍有空闲槽位，节点回复 busy，任务重新排队后在本机运行
+    jobs = second.submit([main.Job(tool, "b")])
+    assert jobs[0].worker is second_pool.workers[0]
+    assert wait_until(app, lambda: jobs[0].state == "done" and taken[0].state == "done", timeout=20)
+    assert jobs[0].exit_code == 0